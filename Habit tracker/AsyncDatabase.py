@@ -0,0 +1,268 @@
+from LogArchive import attach_empty_archive, return_attached_databases
+from DatabaseAnalyzer import DatabaseAnalyzer
+from ConnectionPool import ConnectionPool
+from QueryCache import QueryCache
+from Clock import SystemClock
+from Database import Database
+from Habit import Habit
+
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import asyncio
+import copy
+
+"""
+This module provides an asyncio interface to the database. SQLite calls block, so they are run
+in threads: all writes go through a single writer thread, which serializes them, and queries run
+in a pool of reader threads over read-only connections. Coroutines only wait for the results,
+so the event loop is never blocked by the database.
+
+Example:
+    async with AsyncDatabase("AppDatabase.db") as database:
+        analyzer = database.return_analyzer()
+        await database.check_off_habit(habit)
+        habits = await analyzer.return_currently_tracked_habits()"""
+
+
+
+def run_in_writer(method_name: str):
+    """
+    Returns a coroutine method of AsyncDatabase that runs the Database method with the given name
+    in the writer thread.
+
+    Parameters:
+        method_name: str
+            Name of the Database method."""
+    @functools.wraps(getattr(Database, method_name))
+    async def method(self, *args, **kwargs):
+        return await self.run_write(getattr(self.database, method_name), *args, **kwargs)
+    return method
+
+def run_in_reader(method_name: str):
+    """
+    Returns a coroutine method of AsyncDatabaseAnalyzer that runs the DatabaseAnalyzer method with the given name
+    in a reader thread.
+
+    Parameters:
+        method_name: str
+            Name of the DatabaseAnalyzer method."""
+    @functools.wraps(getattr(DatabaseAnalyzer, method_name))
+    async def method(self, *args, **kwargs):
+        return await self.run_read(getattr(self.analyzer, method_name), *args, **kwargs)
+    return method
+
+
+
+class AsyncDatabase:
+    """
+    A class to represent the database with coroutine methods. Every Database method that changes
+    the database has a coroutine counterpart with the same name and parameters.
+    Open the database with open() or \'async with\' before use.
+
+    Attributes:
+        name: str
+            Name of the database.
+        group_commit_latency: float
+            See Database.group_commit_latency.
+        group_commit_size: int
+            See Database.group_commit_size.
+        writer: ThreadPoolExecutor
+            The single thread that runs all writes.
+        database: Database
+            The wrapped database or None if it isn't open."""
+    def __init__(self, name: str = "AppDatabase.db", group_commit_latency: float = None,
+                 group_commit_size: int = 1000) -> None:
+        """
+        Parameters:
+            name: str, optional
+                Name of the database. Defaults to \'AppDatabase.db\'.
+            group_commit_latency: float, optional
+                See Database. Defaults to committing every write at once.
+            group_commit_size: int, optional
+                See Database. Defaults to 1000."""
+        self.name = name
+        self.group_commit_latency = group_commit_latency
+        self.group_commit_size = group_commit_size
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="DatabaseWriter")
+        self.database = None
+
+    async def run_write(self, function, *args, **kwargs):
+        """
+        Runs a function in the writer thread and returns its result. Functions run one at a time
+        in the order they were submitted.
+
+        Parameters:
+            function: callable
+                Function to be run.
+            *args, **kwargs
+                Arguments of the function."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.writer, functools.partial(function, *args, **kwargs))
+
+    async def open(self) -> "AsyncDatabase":
+        """
+        Connects to the database (and upgrades its structure if needed) in the writer thread.
+
+        No parameters."""
+        if self.database is None:
+            self.database = await self.run_write(Database, self.name, self.group_commit_latency,
+                                                 self.group_commit_size)
+        return self
+
+    async def close(self) -> None:
+        """
+        Commits pending writes, disconnects from the database and stops the writer thread.
+        The thread is joined in the default executor, so the event loop isn't blocked.
+
+        No parameters."""
+        if self.database is not None:
+            await self.run_write(self.database.disconnect_database)
+            self.database = None
+        await asyncio.get_running_loop().run_in_executor(None, self.writer.shutdown)
+
+    async def __aenter__(self) -> "AsyncDatabase":
+        return await self.open()
+
+    async def __aexit__(self, *exception_info) -> None:
+        await self.close()
+
+    def return_analyzer(self, readers: int = 4, cache_capacity: int = None) -> "AsyncDatabaseAnalyzer":
+        """
+        Returns an analyzer of the database that shares its pool of read-only connections.
+
+        Parameters:
+            readers: int, optional
+                Number of reader threads (and connections). Defaults to 4.
+            cache_capacity: int, optional
+                Capacity of the query result cache (see Database.return_query_cache). Defaults to no cache."""
+        cache = None if cache_capacity is None else self.database.return_query_cache(cache_capacity)
+        return AsyncDatabaseAnalyzer(self.name, self.database.return_read_pool(readers), cache, readers,
+                                      self.database.clock)
+
+    async def check_off_habit(self, habit: Habit) -> None:
+        """
+        Checks off the habit and stores the result (see Habit.check_off_habit and
+        Database.check_off_habit_in_database). The habit is updated at once and a snapshot of it is written,
+        so concurrent check-offs of the same habit are stored in the order they were made.
+
+        Parameters:
+            habit: Habit
+                Habit to be checked off."""
+        habit.check_off_habit(self.database.clock)
+        await self.check_off_habit_in_database(copy.copy(habit))
+
+    clean_tables_in_database = run_in_writer("clean_tables_in_database")
+    rebuild_streak_leaderboard = run_in_writer("rebuild_streak_leaderboard")
+    rebuild_rollups = run_in_writer("rebuild_rollups")
+    archive_log_rows = run_in_writer("archive_log_rows")
+    commit_pending_writes = run_in_writer("commit_pending_writes")
+    insert_habit_to_database = run_in_writer("insert_habit_to_database")
+    update_habit_characteristic_in_database = run_in_writer("update_habit_characteristic_in_database")
+    update_habit_logs = run_in_writer("update_habit_logs")
+    check_off_habit_in_database = run_in_writer("check_off_habit_in_database")
+    delete_habit_from_database = run_in_writer("delete_habit_from_database")
+    insert_rows_to_database = run_in_writer("insert_rows_to_database")
+
+
+
+class AsyncDatabaseAnalyzer:
+    """
+    A class to represent the database analyzer with coroutine methods. Every DatabaseAnalyzer query
+    has a coroutine counterpart with the same name and parameters. Queries run concurrently
+    in a pool of reader threads.
+
+    Attributes:
+        analyzer: DatabaseAnalyzer
+            The wrapped analyzer.
+        readers: ThreadPoolExecutor
+            Threads that run queries.
+        owns_pool: bool
+            Whether the pool of connections has been created by the analyzer and should be closed together with it."""
+    def __init__(self, database_name: str, pool: ConnectionPool = None, cache: QueryCache = None,
+                 readers: int = 4, clock: SystemClock = None) -> None:
+        """
+        Parameters:
+            database_name: str
+                Name of the database to be analyzed.
+            pool: ConnectionPool, optional
+                Pool of read-only connections, see DatabaseAnalyzer. Should have at least as many connections
+                as there are reader threads. Defaults to a new pool with a connection per reader thread.
+            cache: QueryCache, optional
+                Cache of query results, see DatabaseAnalyzer. Defaults to no cache.
+            readers: int, optional
+                Number of reader threads. Defaults to 4.
+            clock: SystemClock, optional
+                Clock of the analyzed database, see DatabaseAnalyzer. Defaults to the system clock."""
+        self.owns_pool = pool is None
+        if pool is None:
+            pool = ConnectionPool(database_name, readers, attached_databases=return_attached_databases(database_name),
+                                  setup=attach_empty_archive)
+        self.analyzer = DatabaseAnalyzer(database_name, pool, cache, clock)
+        self.readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="DatabaseReader")
+
+    async def run_read(self, function, *args, **kwargs):
+        """
+        Runs a function in a reader thread and returns its result.
+
+        Parameters:
+            function: callable
+                Function to be run.
+            *args, **kwargs
+                Arguments of the function."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.readers, functools.partial(function, *args, **kwargs))
+
+    async def close(self) -> None:
+        """
+        Stops the reader threads and closes connections of the analyzer. A shared pool is left open.
+        The threads are joined in the default executor, so the event loop isn't blocked by running reads.
+
+        No parameters."""
+        await asyncio.get_running_loop().run_in_executor(None, self.readers.shutdown)
+        if self.owns_pool:
+            self.analyzer.pool.close()
+
+    async def __aenter__(self) -> "AsyncDatabaseAnalyzer":
+        return self
+
+    async def __aexit__(self, *exception_info) -> None:
+        await self.close()
+
+    async def stream_habit_history(self, habit_name: str, chunk_size: int = 1000):
+        """
+        Asynchronous generator that yields every completion event of a certain habit, from the latest
+        to the earliest (see DatabaseAnalyzer.stream_habit_history).
+
+        Parameters:
+            habit_name: str
+                Name of the habit whose history to be returned.
+            chunk_size: int, optional
+                Number of events read from the database at once. Defaults to 1000."""
+        page_token = None
+        while True:
+            history, page_token, _ = await self.return_habit_history_page(habit_name, chunk_size, page_token)
+            for event in history:
+                yield event
+            if page_token is None:
+                return
+
+    return_currently_tracked_habits = run_in_reader("return_currently_tracked_habits")
+    return_habits_with_the_same_periodicity = run_in_reader("return_habits_with_the_same_periodicity")
+    return_longest_streak_of_all_habits = run_in_reader("return_longest_streak_of_all_habits")
+    return_top_habits_by_streak = run_in_reader("return_top_habits_by_streak")
+    return_longest_streaks_of_given_habit = run_in_reader("return_longest_streaks_of_given_habit")
+    return_due_habits = run_in_reader("return_due_habits")
+    return_overdue_habits = run_in_reader("return_overdue_habits")
+    return_habits_at_risk = run_in_reader("return_habits_at_risk")
+    return_developed_habits = run_in_reader("return_developed_habits")
+    return_detailed_information_about_habit = run_in_reader("return_detailed_information_about_habit")
+    return_habit_history = run_in_reader("return_habit_history")
+    return_habit_history_page = run_in_reader("return_habit_history_page")
+    return_habit = run_in_reader("return_habit")
+    return_habit_names = run_in_reader("return_habit_names")
+    return_number_of_habits = run_in_reader("return_number_of_habits")
+    return_habit_streaks = run_in_reader("return_habit_streaks")
+    return_check_off_log = run_in_reader("return_check_off_log")
+    return_completion_series = run_in_reader("return_completion_series")
+    return_number_of_completions = run_in_reader("return_number_of_completions")
+    return_check_off_columns = run_in_reader("return_check_off_columns")
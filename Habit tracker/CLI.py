@@ -1,12 +1,17 @@
 # Importing necessary classes and modules for the app to work
+from DeadlineScheduler import DeadlineScheduler
 from DatabaseAnalyzer import DatabaseAnalyzer
-from PredefinedHabits import predefine_habits, generate_habit_history
-from Habit import Habit
+from HabitContainer import HabitContainer
+from Habit import Habit, HabitTable
+from Clock import SystemClock
 from Database import Database
 
+from PeriodIndex import return_period_indices, return_period_label, return_datetime
+
 from sqlite3 import IntegrityError
 from tabulate import tabulate
 import questionary as q
+import queue
 
 
 
@@ -19,31 +24,50 @@ class CommandLineInterface:
             Database to be used for application.
         analyzer: DatabaseAnalyzer
             Analyzes the application database.
-        habit_container: dict[str, Habit]
-            Contains all ever defined habits."""
-    def __init__(self, database_name: str = "AppDatabase.db") -> None:
-        """"""
-        self.database = Database(database_name)
-        self.analyzer = DatabaseAnalyzer(self.database.name)
-        self.habit_container: dict[str, Habit] = {}
-        self.upload_existing_habits(self.analyzer)
-
-    def upload_existing_habits(self, analyzer: DatabaseAnalyzer) -> None:
+        habit_container: HabitContainer
+            Contains all ever defined habits. Habits are loaded from database on demand.
+        scheduler: DeadlineScheduler
+            Resets streaks of broken habits in the background while the application runs.
+        reset_habit_names: queue.SimpleQueue
+            Names of habits reset by the scheduler that are still kept in the habit_container."""
+    def __init__(self, database_name: str = "AppDatabase.db", clock: SystemClock = None) -> None:
+        """
+        Parameters:
+            database_name: str, optional
+                Name of the database. Defaults to 'AppDatabase.db'.
+            clock: SystemClock, optional
+                Clock that tells the time of check-offs and views. Defaults to the system clock."""
+        self.database = Database(database_name, clock=clock)
+        self.analyzer = DatabaseAnalyzer(self.database.name, self.database.return_read_pool(),
+                                         self.database.return_query_cache(), self.database.clock)
+        self.habit_container = HabitContainer(self.analyzer)
+        self.reset_habit_names = queue.SimpleQueue()
+        self.scheduler = DeadlineScheduler(self.database, on_reset=self.forget_habits)
+        self.scheduler.start()
+
+    def forget_habits(self, names: list) -> None:
         """
-        Uploads already created habits from database to the habit_container for the application to work.
+        Queues habits kept in memory to be forgotten, e.g., after their streaks have been reset by the scheduler.
+        It is called on the thread of the scheduler, while the habit_container is only used by the menu,
+        so the habits are discarded by discard_reset_habits before the next menu action.
 
         Parameters:
-            analyzer: DatabaseAnalyzer
-                Analyzer that retrieves habits from database."""
-        tracked_habits = analyzer.return_currently_tracked_habits()
-        for habit in tracked_habits:
-            habit = Habit(*habit)
-            self.habit_container[habit.name] = habit
+            names: list
+                Names of the habits."""
+        for name in names:
+            self.reset_habit_names.put(name)
+
+    def discard_reset_habits(self) -> None:
+        """
+        Discards habits queued by forget_habits from the habit_container, so they are read from the database again.
 
-        developed_habits = analyzer.return_developed_habits()
-        for habit in developed_habits:
-            habit = Habit(*habit)
-            self.habit_container[habit.name] = habit
+        No parameters."""
+        while True:
+            try:
+                name = self.reset_habit_names.get_nowait()
+            except queue.Empty:
+                return
+            self.habit_container.discard(name)
 
 
 
@@ -55,6 +79,7 @@ class CommandLineInterface:
 
         No parameters."""
         choice_handler = {
+            "View due habits": self.show_due_habits,
             "Add, update, or delete habit": self.habit_handler,
             "Check-off habit": self.check_off_habit, 
             "View habit history": self.view_habit_history,
@@ -65,6 +90,7 @@ class CommandLineInterface:
         question = q.select(
             "What do you want to do?",
             choices = [
+                "View due habits",
                 "Add, update, or delete habit", 
                 "Check-off habit",
                 "View habit history", 
@@ -73,6 +99,7 @@ class CommandLineInterface:
                 "Quit"
                 ]
         ).ask()
+        self.discard_reset_habits()
         choice_handler[question]()
 
     def back_to_start_menu(self) -> None:
@@ -85,6 +112,29 @@ class CommandLineInterface:
 
 
     # Functions to work with habits and database
+    def show_due_habits(self) -> None:
+        """
+        Displays habits that need a check-off in the current period: overdue habits (whose streak is lost) first,
+        then habits in the order their streaks would be lost. Habits whose streak is lost within a day are at risk.
+
+        No parameters."""
+        now = self.database.clock.return_current_timestamp()
+        habits = self.analyzer.return_due_habits(now)
+        if habits == []:
+            print("All your habits are checked off for now!")
+            return
+        rows = []
+        for name, periodicity, current_streak, next_due, breaks_at in sorted(
+                habits, key=lambda habit: (habit[4] is None, habit[4] or 0, habit[0])):
+            if breaks_at is None:
+                status, deadline = "Due", "-"
+            else:
+                status = "Overdue" if breaks_at <= now else "At risk" if breaks_at <= now + 24 * 3600 else "Due"
+                deadline = return_datetime(breaks_at).strftime("%Y-%m-%d %H:%M")
+            rows.append((name, periodicity, current_streak, status, deadline))
+        columns = ("Name", "Periodicity", "Current streak", "Status", "Streak is lost at")
+        print(tabulate(rows, headers = columns, tablefmt="github"))
+
     def habit_handler(self) -> None:
         """
         Based on the user's response, this function calls another one to perform the corresponding action.
@@ -106,6 +156,7 @@ class CommandLineInterface:
                 "Return back"
             ]
         ).ask()
+        self.discard_reset_habits()
         choice_handler[question]()
 
     def add_habit(self) -> None:
@@ -136,7 +187,7 @@ class CommandLineInterface:
             except ValueError:
                 print("You require to enter a whole number!")
         try:
-            new_habit = Habit(name, periodicity, time_span)
+            new_habit = Habit(name, periodicity, time_span, clock=self.database.clock)
             self.database.insert_habit_to_database(new_habit)
             self.habit_container[new_habit.name] = new_habit
             print(f"Habit \"{new_habit.name}\" added successfully!")
@@ -194,23 +245,16 @@ class CommandLineInterface:
                         choices = choices).ask()
         if name == "Return back": return
         habit = self.habit_container[name]
-        habit.check_off_habit()
+        habit.check_off_habit(self.database.clock)
         print(f"Habit \"{habit.name}\" shecked-off successfully!")
-        self.database.update_habit_characteristic_in_database(habit, 
-                                                              ["end_time", "end_date"], 
-                                                              [habit.end_time, habit.end_date])
         if habit.complete_habit():
-            self.database.update_habit_characteristic_in_database(habit, ["state"], [habit.state])
             print("You've developed your habit successfully! Congratulations!")
-        self.database.update_habit_characteristic_in_database(habit, 
-                                                              ["current_streak", "longest_streak"], 
-                                                              [habit.current_streak, habit.longest_streak])
-        self.database.update_habit_logs(habit)
+        self.database.check_off_habit_in_database(habit)
 
     def view_habit_history(self) -> None:
         """
         Displays history of a certain habit. This function displays the data 
-        upon habit creation and the history of 10 successful habit completions.
+        upon habit creation and the history of habit completions, 10 completions per page.
         
         No parameters."""
         try:
@@ -225,10 +269,23 @@ class CommandLineInterface:
             columns =  ("Name", "Periodicity", "Time span", "Start time", "Start date")
             print(tabulate([details], headers = columns, tablefmt="github"), '\n')
 
-            history = self.analyzer.return_habit_history(name)
-            if history == []: return
+            history, next_token, previous_token = self.analyzer.return_habit_history_page(name)
             columns =  ("Name", "Current streak", "Longest streak", "End time", "End date")
-            print(tabulate(history, headers = columns, tablefmt="github"))
+            while history != []:
+                print(tabulate(history, headers = columns, tablefmt="github"), '\n')
+                choices = []
+                if next_token is not None: choices.append("Next page")
+                if previous_token is not None: choices.append("Previous page")
+                if choices == []: return
+                choices.append("Return back")
+                action = q.select("Select the page of the history: ", choices = choices).ask()
+                if action == "Next page":
+                    history, next_token, previous_token = self.analyzer.return_habit_history_page(
+                        name, page_token = next_token, direction = "next")
+                elif action == "Previous page":
+                    history, next_token, previous_token = self.analyzer.return_habit_history_page(
+                        name, page_token = previous_token, direction = "previous")
+                else: return
         except ValueError:
             print("You don't have any trackable habits!")
 
@@ -241,8 +298,8 @@ class CommandLineInterface:
             name = q.select("Select a habit you want to delete: ",
                             choices = list(self.habit_container.keys())).ask()
             habit = self.habit_container[name]
+            self.habit_container.discard(name)
             self.database.delete_habit_from_database(habit.name)
-            del self.habit_container[name]
             print(f"Habit \"{habit.name}\" deleted successfully!")
         except ValueError:
             print("You don't have any trackable habits!")
@@ -262,6 +319,8 @@ class CommandLineInterface:
             "Show me all habits with the same periodicity": self.show_habits_with_the_same_periodicity,
             "Show me the longest streak among all defined habits": self.show_longest_streak_of_all_habits,
             "Show me the longest streak of a certain habit": self.show_longest_streaks_of_given_habit,
+            "Show me the streak leaderboard": self.show_streak_leaderboard,
+            "Show me the trends of my habits": self.show_habit_trends,
             "Show the whole information of a certain habit": self.show_detailed_info,
             "Return back" : self.back_to_start_menu
 
@@ -274,10 +333,13 @@ class CommandLineInterface:
                 "Show me all habits with the same periodicity",
                 "Show me the longest streak among all defined habits",
                 "Show me the longest streak of a certain habit",
+                "Show me the streak leaderboard",
+                "Show me the trends of my habits",
                 "Show the whole information of a certain habit",
                 "Return back"
             ]
         ).ask()
+        self.discard_reset_habits()
         choice_handler[question]()
    
     def show_currently_tracked_habits(self) -> None:
@@ -287,12 +349,9 @@ class CommandLineInterface:
 
         No parameters."""
         habits = self.analyzer.return_currently_tracked_habits()
-        details = []
         if habits != []:
-            for habit in habits:
-                habit = Habit(*habit)
-                details.append((habit.name, habit.periodicity, habit.time_span,
-                                habit.state, habit.start_time, habit.start_date))
+            details = HabitTable(habits).return_rows(["name", "periodicity", "time_span", 
+                                                      "state", "start_time", "start_date"])
             columns = ("Name", "Periodicity", "Time span", "State", "Start time", "Start date")
             print(tabulate(details, headers = columns, tablefmt="github"))
         else: 
@@ -304,11 +363,8 @@ class CommandLineInterface:
         
         No parameters."""
         habits = self.analyzer.return_developed_habits()
-        details = []
         if habits != []:
-            for habit in habits:
-                habit = Habit(*habit)
-                details.append([habit.name, habit.periodicity, habit.time_span, habit.state])
+            details = HabitTable(habits).return_rows(["name", "periodicity", "time_span", "state"])
             columns = ("Name", "Periodicity", "Time span", "State")
             print(tabulate(details, headers = columns, tablefmt="github"))
         else: 
@@ -330,11 +386,8 @@ class CommandLineInterface:
             ]
         ).ask()        
         habits = self.analyzer.return_habits_with_the_same_periodicity(periodicity)
-        details = []
         if habits != []:
-            for habit in habits:
-                habit = Habit(*habit)
-                details.append([habit.name, habit.periodicity, habit.time_span, habit.state])
+            details = HabitTable(habits).return_rows(["name", "periodicity", "time_span", "state"])
             columns = ("Name", "Periodicity", "Time span", "State")
             print(tabulate(details, headers = columns, tablefmt="github"))
         else: 
@@ -366,6 +419,22 @@ class CommandLineInterface:
         except ValueError:
             print("You don't have any trackable habits!")
 
+    def show_streak_leaderboard(self) -> None:
+        """
+        Displays 10 habits with the longest streaks (and habits that share the streak of the last one)
+        or with the longest current streaks.
+
+        No parameters."""
+        streak = q.select("Which streaks do you want to compare?",
+                          choices = ["Longest streaks", "Current streaks"]).ask()
+        streak = "longest_streak" if streak == "Longest streaks" else "current_streak"
+        top_habits = self.analyzer.return_top_habits_by_streak(10, streak, include_ties = True)
+        if top_habits != []:
+            columns = ("Name", "Current streak", "Longest streak")
+            print(tabulate(top_habits, headers = columns, tablefmt="github"))
+        else: 
+            print("You don't have any trackable habits!")
+
     def show_detailed_info(self) -> None:
         """
         Displays detailed information about the habit.
@@ -382,6 +451,96 @@ class CommandLineInterface:
 
 
 
+    def show_habit_trends(self) -> None:
+        """
+        Displays trends computed from the whole history of all habits or of a certain habit:
+        numbers of check-offs per period, completion rates per period, heatmaps of check-offs, streak lengths or the time streaks last before they break.
+
+        No parameters."""
+        names = list(self.habit_container.keys())
+        if names == []:
+            print("You don't have any trackable habits!")
+            return
+        name = q.select("Which habits do you want to analyze?", choices = ["All habits"] + names).ask()
+        trend = q.select(
+            "What do you want to see?",
+            choices = [
+                "Check-offs per period",
+                "Completion rates",
+                "Check-off heatmap",
+                "Streak lengths",
+                "Time to break a streak"
+            ]
+        ).ask()
+        habit_name = None if name == "All habits" else name
+        if trend == "Check-offs per period":
+            self.show_check_offs_per_period(habit_name)
+            return
+
+        # HabitAnalytics imports numpy, which is only needed here
+        import HabitAnalytics as analytics
+        columns = analytics.return_check_off_columns(self.analyzer, None if habit_name is None else [habit_name])
+
+        if trend == "Completion rates":
+            bucket = q.select("Show completion rates per: ", choices = analytics.BUCKETS).ask()
+            rates = analytics.compute_completion_rates(columns, bucket)
+            # The last 6 buckets, e.g., months, up to the current one
+            bucket_starts = rates["bucket_starts"][-6:]
+            unit = {"Day": "D", "Week": "D", "Month": "M", "Year": "Y"}[bucket]
+            labels = [str(start.astype("datetime64[s]").astype(f"datetime64[{unit}]")) for start in bucket_starts]
+            rows = [[habit_name, periodicity, f"{overall:.0%}"] +
+                    ["-" if rate != rate else f"{rate:.0%}" for rate in habit_rates[-6:]]
+                    for habit_name, periodicity, overall, habit_rates in
+                    zip(columns["names"], columns["periodicities"], rates["overall"], rates["rates"])]
+            print(tabulate(rows, headers = ["Name", "Periodicity", "Overall"] + labels, tablefmt="github"))
+        elif trend == "Check-off heatmap":
+            heatmaps = analytics.compute_heatmaps(columns)
+            weekday_hour = heatmaps["weekday_hour"]
+            shades = " ░▒▓█"
+            scale = max(int(weekday_hour.max()), 1)
+            print("Check-offs by hour of the day (0-23):")
+            for weekday, counts in zip(analytics.WEEKDAYS, weekday_hour):
+                print(f"{weekday:<10}" + "".join(shades[-(-int(count) * (len(shades) - 1) // scale)] * 2
+                                                 for count in counts) + f" {int(counts.sum())}")
+            print(tabulate([heatmaps["month"]], headers = analytics.MONTHS, tablefmt="github"))
+        elif trend == "Streak lengths":
+            histogram = analytics.compute_streak_histogram(analytics.compute_streak_lengths(columns))
+            rows = analytics.bin_streak_histogram(histogram)
+            largest = max([count for _, count in rows] + [1])
+            rows = [(bound, count, "█" * -(-count * 40 // largest)) for bound, count in rows]
+            print(tabulate(rows, headers = ["Streak length", "Streaks", ""], tablefmt="github"))
+        else:
+            time_to_break = analytics.compute_time_to_break(analytics.compute_streak_lengths(columns))
+            if len(time_to_break["days"]) == 0:
+                print("None of the streaks has been broken yet!")
+                return
+            rows = [(f"{percentile}%", f"{days:.1f}") for percentile, days in time_to_break["percentiles"].items()]
+            print(f"Broken streaks: {len(time_to_break['days'])}. Share of them that broke within:")
+            print(tabulate(rows, headers = ["Streaks", "Days"], tablefmt="github"))
+
+
+
+    def show_check_offs_per_period(self, habit_name: str = None) -> None:
+        """
+        Displays the number of check-offs in each of the last 12 days, weeks, months or years
+        and the number of all check-offs. Reads only the rollups of the periods.
+
+        Parameters:
+            habit_name: str, optional
+                Name of the habit. Defaults to all habits together."""
+        periodicity = q.select("Show check-offs per: ", choices = ["Day", "Week", "Month", "Year"]).ask()
+        column = ["Day", "Week", "Month", "Year"].index(periodicity) + 1
+        current_index = return_period_indices(self.database.clock.return_current_timestamp())[column]
+        series = dict(self.analyzer.return_completion_series(habit_name, periodicity, current_index - 11, current_index))
+        rows = [(return_period_label(periodicity, index), series.get(index, 0))
+                for index in range(current_index - 11, current_index + 1)]
+        largest = max([number for _, number in rows] + [1])
+        rows = [(label, number, "█" * -(-number * 40 // largest)) for label, number in rows]
+        print(tabulate(rows, headers = [periodicity, "Check-offs", ""], tablefmt="github"))
+        print("Check-offs of all time:", self.analyzer.return_number_of_completions(habit_name))
+
+
+
     # Additional option functions
     def additional_options(self) -> None:
         """
@@ -392,6 +551,10 @@ class CommandLineInterface:
             "Upload predefined habits" : self.upload_predefined_habits,
             "Delete predefined habits" : self.delete_predefined_habits,
             "Delete all habits": self.delete_all_habits,
+            "Rebuild streak leaderboard": self.rebuild_streak_leaderboard,
+            "Rebuild check-off rollups": self.rebuild_rollups,
+            "Archive old check-offs": self.archive_old_check_offs,
+            "Verify habits against their history": self.verify_habits,
             "Return back": self.back_to_start_menu
         }
         question = q.select(
@@ -400,9 +563,14 @@ class CommandLineInterface:
                 "Upload predefined habits",
                 "Delete predefined habits",
                 "Delete all habits",
+                "Rebuild streak leaderboard",
+                "Rebuild check-off rollups",
+                "Archive old check-offs",
+                "Verify habits against their history",
                 "Return back"
                 ]
         ).ask()
+        self.discard_reset_habits()
         choice_handler[question]()
 
     def upload_predefined_habits(self) -> None:
@@ -410,11 +578,13 @@ class CommandLineInterface:
         Uploads predefined habits to the database and to the habit_container.
 
         No parameters."""
+        # PredefinedHabits imports numpy, which is only needed here
+        from PredefinedHabits import predefine_habits, generate_habit_history
         try:
             habits = predefine_habits()
             for habit in habits:
-                self.habit_container[habit.name] = habit
                 self.database.insert_habit_to_database(habit)
+                self.habit_container[habit.name] = habit
                 generate_habit_history(habit, self.database)
             print("All predefined habits added successfully!")
         except IntegrityError:
@@ -426,10 +596,13 @@ class CommandLineInterface:
         
         No parameters."""
         def perform_action() -> None:
+            from PredefinedHabits import predefine_habits
             try:
                 habits = predefine_habits()
                 for habit in habits:
-                    del self.habit_container[habit.name]
+                    if habit.name not in self.habit_container:
+                        raise KeyError(habit.name)
+                    self.habit_container.discard(habit.name)
                     self.database.delete_habit_from_database(habit.name)
                 print("All predefined habits deleted successfully!")
             except KeyError:
@@ -446,6 +619,7 @@ class CommandLineInterface:
                 "No"
             ]
         ).ask()
+        self.discard_reset_habits()
         choice_handler[question]()
 
     def delete_all_habits(self) -> None:
@@ -468,9 +642,61 @@ class CommandLineInterface:
                 "No"
             ]
         ).ask()
+        self.discard_reset_habits()
         choice_handler[question]()
         print("All defined habits deleted successfully!")
-        
+
+    def rebuild_streak_leaderboard(self) -> None:
+        """
+        Rebuilds the streak leaderboard of the database.
+
+        No parameters."""
+        self.database.rebuild_streak_leaderboard()
+        print("Streak leaderboard rebuilt successfully!")
+
+    def rebuild_rollups(self) -> None:
+        """
+        Recounts the check-offs per day, week, month and year from the history of the database.
+
+        No parameters."""
+        self.database.rebuild_rollups()
+        print("Check-off rollups rebuilt successfully!")
+
+    def archive_old_check_offs(self) -> None:
+        """
+        Moves check-offs older than the given number of days to the archive. They still appear in the history
+        and in the analysis of habits.
+
+        No parameters."""
+        while True:
+            try:
+                retention_days = int(q.text("Check-offs of how many recent days to keep in the main log?\nWrite a number: ").ask())
+                if retention_days >= 0:
+                    break
+            except ValueError:
+                pass
+            print("You require to enter a whole number!")
+        moved_rows = self.database.archive_log_rows(retention_days)
+        print(f"{moved_rows} check-offs moved to the archive.")
+
+    def verify_habits(self) -> None:
+        """
+        Recomputes streaks and states of habits from their history, shows habits that differ from it
+        and repairs them if the user agrees.
+
+        No parameters."""
+        # HistoryReplay imports numpy, which is only needed here
+        from HistoryReplay import replay_habits, repair_habits, return_discrepancy_description
+        discrepancies = replay_habits(self.database)
+        if discrepancies == []:
+            print("All habits agree with their history!")
+            return
+        for discrepancy in discrepancies:
+            print(return_discrepancy_description(discrepancy))
+        if q.confirm(f"Repair {len(discrepancies)} habits using their history?").ask():
+            repaired = repair_habits(self.database, discrepancies)
+            self.habit_container.clear()
+            print(f"{repaired} habits repaired successfully!")
 
 
     # Exiting the application
@@ -480,6 +706,7 @@ class CommandLineInterface:
 
         No parameters."""
         def perform_action():
+            self.scheduler.stop()
             self.database.disconnect_database()
             quit()
 
@@ -494,4 +721,5 @@ class CommandLineInterface:
                 "No"
             ]
         ).ask()
+        self.discard_reset_habits()
         choice_handler[question]()
@@ -0,0 +1,85 @@
+from PeriodIndex import return_timestamp
+
+from datetime import datetime, timedelta
+
+"""
+This module tells the application what time it is. Habit, Database, HabitService, DeadlineScheduler
+and the command line interface take the current moment from a clock instead of reading the system time directly,
+so the same code can run on the system clock or on a simulated one, e.g., to check off habits over months
+of simulated time in seconds (see TimeSimulator.py).
+
+Example:
+    clock = SimulatedClock(datetime(2024, 1, 1))
+    service = HabitService("SimulatedDatabase.db", clock=clock)
+    service.add_habit("Read books", "Day", 30)
+    clock.advance(hours=20)
+    service.check_off_habit("Read books")"""
+
+
+
+class SystemClock:
+    """
+    A class to represent the clock of the system: the current local date and time."""
+    def return_current_datetime(self) -> datetime:
+        """
+        Returns the current date and time without microseconds, as habits store them.
+
+        No parameters."""
+        return datetime.now().replace(microsecond=0)
+
+    def return_current_timestamp(self) -> int:
+        """
+        Returns the timestamp of the current moment (see PeriodIndex.py).
+
+        No parameters."""
+        return return_timestamp(self.return_current_datetime())
+
+
+
+class SimulatedClock(SystemClock):
+    """
+    A class to represent a clock whose time is set by the program. Time doesn't pass by itself,
+    and it never goes back, since streaks assume that check-offs are made in time order.
+
+    Attributes:
+        moment: datetime
+            The current simulated date and time."""
+    def __init__(self, moment: datetime) -> None:
+        """
+        Parameters:
+            moment: datetime
+                The initial simulated date and time."""
+        self.moment = moment.replace(microsecond=0)
+
+    def return_current_datetime(self) -> datetime:
+        """
+        Returns the current simulated date and time.
+
+        No parameters."""
+        return self.moment
+
+    def move_to(self, moment: datetime) -> None:
+        """
+        Sets the simulated date and time.
+
+        Parameters:
+            moment: datetime
+                New date and time. Must not be earlier than the current one."""
+        moment = moment.replace(microsecond=0)
+        if moment < self.moment:
+            raise ValueError("The simulated time can't go back.")
+        self.moment = moment
+
+    def advance(self, **duration) -> None:
+        """
+        Moves the simulated time forward.
+
+        Parameters:
+            duration: int
+                Arguments of datetime.timedelta, e.g., hours=5 or seconds=30."""
+        self.move_to(self.moment + timedelta(**duration))
+
+
+
+# Clock used wherever no other clock is given
+SYSTEM_CLOCK = SystemClock()
@@ -0,0 +1,187 @@
+from contextlib import contextmanager
+
+import threading
+import sqlite3
+import time
+import os
+
+
+
+def return_read_only_uri(database_name: str) -> str:
+    """
+    Returns the URI that opens a database file read-only.
+
+    Parameters:
+        database_name: str
+            Name of the database file."""
+    path = os.path.abspath(database_name).replace(os.sep, "/")
+    # SQLite decodes %HH escapes in the path and ends it at ? or #. Only these characters are escaped,
+    # since urllib.parse.quote costs about 10 ms of startup to import.
+    path = path.replace("%", "%25").replace("?", "%3f").replace("#", "%23")
+    # Windows paths (C:/...) need a leading slash: file:///C:/...
+    return f"file://{'' if path.startswith('/') else '/'}{path}?mode=ro"
+
+
+
+class ConnectionPool:
+    """
+    A class to represent a bounded pool of long-lived read-only connections to the database.
+    Connections are opened on demand, up to the pool size, and are reused by consecutive queries.
+    Every connection keeps its own cache of prepared statements.
+
+    Attributes:
+        database_name: str
+            Name of the database the connections are opened to.
+        size: int
+            The maximal number of open connections.
+        cached_statements: int
+            Number of prepared statements cached by every connection.
+        attached_databases: dict[str, str]
+            Names of databases attached read-only to every connection by their schema names.
+        setup: callable
+            Function called with every new connection after the databases are attached, or None.
+        idle_connections: list[sqlite3.Connection]
+            Connections that are not used at the moment. The most recently used connection is reused first.
+        connections: list[sqlite3.Connection]
+            All opened connections.
+        retired_connections: set[sqlite3.Connection]
+            Busy connections opened before a database was attached, closed once they are released.
+            They count towards the pool size until then.
+        closed: bool
+            Whether the pool has been closed.
+        available: threading.Condition
+            Condition of the lock of the pool, notified when a connection is released or closed."""
+    def __init__(self, database_name: str, size: int = 4, cached_statements: int = 128,
+                 attached_databases: dict = None, setup=None) -> None:
+        """
+        Parameters:
+            database_name: str
+                Name of the database the connections are opened to. The database must exist.
+            size: int, optional
+                The maximal number of open connections. Defaults to 4.
+            cached_statements: int, optional
+                Number of prepared statements cached by every connection. Defaults to 128.
+            attached_databases: dict, optional
+                Names of databases to be attached to every connection by their schema names, e.g.,
+                {'archive': 'AppDatabase.db-archive'}. The databases must exist.
+                Defaults to no attached databases.
+            setup: callable, optional
+                Function called with every new connection after the databases are attached,
+                e.g., LogArchive.attach_empty_archive. Defaults to None."""
+        self.database_name = database_name
+        self.size = size
+        self.cached_statements = cached_statements
+        self.attached_databases = {} if attached_databases is None else attached_databases
+        self.setup = setup
+        self.idle_connections: list[sqlite3.Connection] = []
+        self.connections: list[sqlite3.Connection] = []
+        self.retired_connections: set[sqlite3.Connection] = set()
+        self.closed = False
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+
+    def open_connection(self) -> sqlite3.Connection:
+        """
+        Opens a new read-only connection to the database and attaches the attached databases to it.
+
+        No parameters."""
+        connection = sqlite3.connect(return_read_only_uri(self.database_name), uri=True, check_same_thread=False,
+                                     cached_statements=self.cached_statements)
+        for schema_name, database_name in self.attached_databases.items():
+            connection.execute(f"ATTACH DATABASE ? AS {schema_name}", (return_read_only_uri(database_name),))
+        if self.setup is not None:
+            self.setup(connection)
+        return connection
+
+    def attach_database(self, schema_name: str, database_name: str) -> None:
+        """
+        Attaches a database to connections opened from now on, e.g., an archive created after the pool.
+        Open connections are closed: idle ones at once, busy ones once they are released.
+
+        Parameters:
+            schema_name: str
+                Schema name of the database in queries.
+            database_name: str
+                Name of the database file. The database must exist."""
+        with self.available:
+            self.attached_databases = {**self.attached_databases, schema_name: database_name}
+            for connection in self.idle_connections:
+                self.connections.remove(connection)
+                connection.close()
+            self.idle_connections.clear()
+            self.retired_connections.update(self.connections)
+            self.connections.clear()
+            self.available.notify_all()
+
+    def acquire_connection(self, timeout: float = None) -> sqlite3.Connection:
+        """
+        Takes a connection from the pool. Opens a new one if all connections are busy and the pool isn't full,
+        otherwise waits until another user releases a connection or a retired connection is closed.
+
+        Parameters:
+            timeout: float, optional
+                The maximal number of seconds to wait. Defaults to waiting without limit."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.available:
+            while True:
+                if self.closed:
+                    raise sqlite3.ProgrammingError("Cannot use a closed connection pool.")
+                if self.idle_connections:
+                    return self.idle_connections.pop()
+                if len(self.connections) + len(self.retired_connections) < self.size:
+                    connection = self.open_connection()
+                    self.connections.append(connection)
+                    return connection
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("All connections of the pool are busy.")
+                self.available.wait(remaining)
+
+    def release_connection(self, connection: sqlite3.Connection) -> None:
+        """
+        Returns a connection to the pool.
+
+        Parameters:
+            connection: sqlite3.Connection
+                Connection taken by acquire_connection."""
+        with self.available:
+            if self.closed or connection in self.retired_connections:
+                self.retired_connections.discard(connection)
+                connection.close()
+            else:
+                self.idle_connections.append(connection)
+            self.available.notify()
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        """
+        Context manager that takes a connection from the pool and returns it back afterwards.
+        Example: with pool.connection() as connection: connection.execute(...)
+
+        Parameters:
+            timeout: float, optional
+                The maximal number of seconds to wait for a connection. Defaults to waiting without limit."""
+        connection = self.acquire_connection(timeout)
+        try:
+            yield connection
+        finally:
+            self.release_connection(connection)
+
+    def close(self) -> None:
+        """
+        Closes all connections of the pool. Connections that are in use are closed once they are released.
+
+        No parameters."""
+        with self.available:
+            self.closed = True
+            for connection in self.idle_connections:
+                connection.close()
+            self.idle_connections.clear()
+            self.connections.clear()
+            self.available.notify_all()
+
+    def __enter__(self) -> "ConnectionPool":
+        return self
+
+    def __exit__(self, *exception_info) -> None:
+        self.close()
@@ -0,0 +1,339 @@
+from PeriodIndex import RANGE_CODES, return_period_indices
+from DatabaseAnalyzer import DatabaseAnalyzer
+from LogArchive import return_log_union
+from Database import Database
+
+import argparse
+import json
+import csv
+import os
+
+"""
+This module exports the habits and habits_log tables to CSV and JSON Lines files and imports them back.
+Both directions stream the data: rows are read and written in chunks, so memory use doesn't depend
+on the size of the tables. Imported rows are validated and loaded in large transactions.
+
+Time and date are exported as timestamps (see PeriodIndex.py). Period indices of log rows aren't exported,
+they are computed again on import. The exported habits_log includes check-offs moved to the archive
+(see LogArchive.py), and all of them are imported back into habits_log.
+
+Example:
+    python DataTransfer.py export habits_log history.csv
+    python DataTransfer.py import habits habits.jsonl --upsert"""
+
+
+
+# Exported columns of every table, in the order they are stored in the database
+TABLE_COLUMNS = {
+    "habits": ("name", "periodicity", "time_span", "state", "current_streak", "longest_streak",
+               "start_timestamp", "end_timestamp"),
+    "habits_log": ("name", "current_streak", "longest_streak", "end_timestamp")
+}
+
+HABIT_STATES = ("In progress", "Completed", "Dropped")
+
+FILE_FORMATS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl"
+}
+
+
+
+def return_file_format(file_name: str, file_format: str = None) -> str:
+    """
+    Returns the format of a file: \'csv\' or \'jsonl\'. The format is taken from the file extension
+    unless it is given explicitly.
+
+    Parameters:
+        file_name: str
+            Name of the file.
+        file_format: str, optional
+            Format of the file. Defaults to the format of the file extension."""
+    if file_format is None:
+        file_format = FILE_FORMATS.get(os.path.splitext(file_name)[1].lower())
+    if file_format not in FILE_FORMATS.values():
+        raise ValueError(f"Unknown format of the file {file_name}. Use .csv or .jsonl files.")
+    return file_format
+
+def return_table_columns(table_name: str) -> tuple:
+    """
+    Returns the exported columns of a table.
+
+    Parameters:
+        table_name: str
+            \'habits\' or \'habits_log\'."""
+    if table_name not in TABLE_COLUMNS:
+        raise ValueError(f"Unknown table {table_name}. Use \'habits\' or \'habits_log\'.")
+    return TABLE_COLUMNS[table_name]
+
+
+
+# Export
+def stream_table_rows(analyzer: DatabaseAnalyzer, table_name: str, chunk_size: int = 10000):
+    """
+    Generator that yields every row of a table in the order the rows were added.
+    Rows of habits_log include archived check-offs.
+    Rows are fetched in chunks within a single read transaction, so the result is a consistent snapshot
+    even if the database is changed meanwhile.
+
+    Parameters:
+        analyzer: DatabaseAnalyzer
+            Analyzer of the database.
+        table_name: str
+            \'habits\' or \'habits_log\'.
+        chunk_size: int, optional
+            Number of rows fetched at once. Defaults to 10000."""
+    columns = return_table_columns(table_name)
+    with analyzer.pool.connection() as connection:
+        cursor = connection.cursor()
+        try:
+            if table_name == "habits_log":
+                log_query = return_log_union(f"SELECT {', '.join(columns)}, log_id FROM {{log}}")
+                cursor.execute(f"SELECT {', '.join(columns)} FROM ({log_query}) ORDER BY log_id")
+            else:
+                cursor.execute(f"SELECT {', '.join(columns)} FROM {table_name} ORDER BY rowid")
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if rows == []:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
+
+def export_table(analyzer: DatabaseAnalyzer, table_name: str, file_name: str,
+                 file_format: str = None, chunk_size: int = 10000) -> int:
+    """
+    Writes every row of a table to a CSV file (with a header row) or to a JSON Lines file
+    (an object per row). Missing values are written as empty CSV fields or JSON nulls.
+    Returns the number of written rows.
+
+    Parameters:
+        analyzer: DatabaseAnalyzer
+            Analyzer of the database.
+        table_name: str
+            \'habits\' or \'habits_log\'.
+        file_name: str
+            Name of the file to be written.
+        file_format: str, optional
+            \'csv\' or \'jsonl\'. Defaults to the format of the file extension.
+        chunk_size: int, optional
+            Number of rows fetched from the database at once. Defaults to 10000."""
+    file_format = return_file_format(file_name, file_format)
+    columns = return_table_columns(table_name)
+    rows_amount = 0
+    with open(file_name, "w", newline="", encoding="utf-8") as file:
+        if file_format == "csv":
+            writer = csv.writer(file)
+            writer.writerow(columns)
+        for row in stream_table_rows(analyzer, table_name, chunk_size):
+            if file_format == "csv":
+                writer.writerow(row)
+            else:
+                file.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+                file.write("\n")
+            rows_amount += 1
+    return rows_amount
+
+
+
+# Import
+def read_records(file_name: str, file_format: str = None):
+    """
+    Generator that yields (line number, record) for every row of a CSV or JSON Lines file.
+    A record is a dictionary from column names to values. Empty lines of JSON Lines files are skipped.
+
+    Parameters:
+        file_name: str
+            Name of the file to be read.
+        file_format: str, optional
+            \'csv\' or \'jsonl\'. Defaults to the format of the file extension."""
+    file_format = return_file_format(file_name, file_format)
+    with open(file_name, newline="", encoding="utf-8") as file:
+        if file_format == "csv":
+            reader = csv.DictReader(file)
+            for record in reader:
+                yield reader.line_num, record
+            return
+        for line_number, line in enumerate(file, 1):
+            if line.strip() == "":
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as error:
+                raise ValueError(f"{file_name}, line {line_number}: invalid JSON ({error.msg}).") from None
+            if not isinstance(record, dict):
+                raise ValueError(f"{file_name}, line {line_number}: a JSON object is expected.")
+            yield line_number, record
+
+def return_integer(record: dict, column: str, minimum: int = None, optional: bool = False) -> int:
+    """
+    Returns an integer value of a record. CSV values are converted from text, empty values are None.
+
+    Parameters:
+        record: dict
+            Record read from a file.
+        column: str
+            Name of the column.
+        minimum: int, optional
+            The minimal allowed value. Defaults to no limit.
+        optional: bool, optional
+            Whether the value may be missing. Defaults to False."""
+    value = record.get(column)
+    if value is None or value == "":
+        if optional:
+            return None
+        raise ValueError(f"\'{column}\' is missing.")
+    if isinstance(value, str):
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValueError(f"\'{column}\' must be an integer, got {value!r}.") from None
+    elif isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"\'{column}\' must be an integer, got {value!r}.")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"\'{column}\' must be at least {minimum}, got {value}.")
+    return value
+
+def return_text(record: dict, column: str, allowed_values: tuple = None) -> str:
+    """
+    Returns a non-empty text value of a record.
+
+    Parameters:
+        record: dict
+            Record read from a file.
+        column: str
+            Name of the column.
+        allowed_values: tuple, optional
+            Values the text may take. Defaults to any text."""
+    value = record.get(column)
+    if not isinstance(value, str) or value == "":
+        raise ValueError(f"\'{column}\' must be a non-empty text, got {value!r}.")
+    if allowed_values is not None and value not in allowed_values:
+        raise ValueError(f"\'{column}\' must be one of {', '.join(allowed_values)}, got {value!r}.")
+    return value
+
+def return_habit_row(record: dict) -> tuple:
+    """
+    Validates a record of the habits table and returns it in the order of the Database.INSERT_HABIT_ROW columns.
+
+    Parameters:
+        record: dict
+            Record read from a file."""
+    row = (return_text(record, "name"),
+           return_text(record, "periodicity", tuple(RANGE_CODES)),
+           return_integer(record, "time_span", minimum=1),
+           return_text(record, "state", HABIT_STATES),
+           return_integer(record, "current_streak", minimum=0),
+           return_integer(record, "longest_streak", minimum=0),
+           return_integer(record, "start_timestamp"),
+           return_integer(record, "end_timestamp", optional=True))
+    if row[4] > row[5]:
+        raise ValueError("\'current_streak\' can\'t be greater than \'longest_streak\'.")
+    return row
+
+def return_log_row(record: dict) -> tuple:
+    """
+    Validates a record of the habits_log table and returns it in the order of the Database.INSERT_LOG_ROW
+    columns, together with the period indices of its end timestamp.
+
+    Parameters:
+        record: dict
+            Record read from a file."""
+    end_timestamp = return_integer(record, "end_timestamp", optional=True)
+    return (return_text(record, "name"),
+            return_integer(record, "current_streak", minimum=0),
+            return_integer(record, "longest_streak", minimum=0),
+            end_timestamp,
+            *return_period_indices(end_timestamp))
+
+ROW_VALIDATORS = {
+    "habits": return_habit_row,
+    "habits_log": return_log_row
+}
+
+def stream_valid_rows(table_name: str, file_name: str, file_format: str = None):
+    """
+    Generator that yields validated rows of a file ready to be inserted into a table.
+    Raises ValueError with the line number at the first invalid row.
+
+    Parameters:
+        table_name: str
+            \'habits\' or \'habits_log\'.
+        file_name: str
+            Name of the file to be read.
+        file_format: str, optional
+            \'csv\' or \'jsonl\'. Defaults to the format of the file extension."""
+    return_table_columns(table_name)
+    validate = ROW_VALIDATORS[table_name]
+    for line_number, record in read_records(file_name, file_format):
+        try:
+            yield validate(record)
+        except ValueError as error:
+            raise ValueError(f"{file_name}, line {line_number}: {error}") from None
+
+def import_table(database: Database, table_name: str, file_name: str, file_format: str = None,
+                 upsert: bool = False, rows_per_transaction: int = 100000) -> int:
+    """
+    Loads rows of a CSV or JSON Lines file (in the format written by export_table) into a table.
+    Rows are validated and inserted in chunks, every chunk in a single transaction.
+    Returns the number of loaded rows.
+
+    Since chunks are committed as they are loaded, an invalid row stops the import
+    but keeps the chunks before it. Validate the file with stream_valid_rows first if that is not desired.
+
+    Parameters:
+        database: Database
+            Database into which rows will be loaded.
+        table_name: str
+            \'habits\' or \'habits_log\'.
+        file_name: str
+            Name of the file to be read.
+        file_format: str, optional
+            \'csv\' or \'jsonl\'. Defaults to the format of the file extension.
+        upsert: bool, optional
+            Whether to overwrite habits that already exist instead of failing with IntegrityError.
+            Log rows are always appended. Defaults to False.
+        rows_per_transaction: int, optional
+            Number of rows in a chunk. Defaults to 100000."""
+    rows_amount = 0
+    rows = []
+    def insert_rows() -> None:
+        if table_name == "habits":
+            database.insert_rows_to_database(rows, [], upsert)
+        else:
+            database.insert_rows_to_database([], rows)
+
+    for row in stream_valid_rows(table_name, file_name, file_format):
+        rows.append(row)
+        if len(rows) == rows_per_transaction:
+            insert_rows()
+            rows_amount += len(rows)
+            rows.clear()
+    if rows != []:
+        insert_rows()
+        rows_amount += len(rows)
+    return rows_amount
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export and import of the Habit tracker data.")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("table", choices=list(TABLE_COLUMNS))
+    parser.add_argument("file", help="CSV (.csv) or JSON Lines (.jsonl) file")
+    parser.add_argument("--database", default="AppDatabase.db", help="database of the application")
+    parser.add_argument("--format", choices=list(FILE_FORMATS.values()), help="format of the file")
+    parser.add_argument("--upsert", action="store_true", help="overwrite habits that already exist")
+    parser.add_argument("--rows-per-transaction", type=int, default=100000,
+                        help="number of rows imported in a single transaction")
+    args = parser.parse_args()
+
+    database = Database(args.database)
+    if args.action == "export":
+        analyzer = DatabaseAnalyzer(args.database, database.return_read_pool())
+        rows_amount = export_table(analyzer, args.table, args.file, args.format)
+    else:
+        rows_amount = import_table(database, args.table, args.file, args.format,
+                                   args.upsert, args.rows_per_transaction)
+    database.disconnect_database()
+    print(f"{rows_amount} rows of the table {args.table} were {args.action}ed.")
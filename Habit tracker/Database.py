@@ -1,6 +1,89 @@
+from PeriodIndex import return_timestamp_of_habit_time, return_period_indices, return_timestamp
+from DatabaseMigrations import (migrate_database, fill_completion_rollups, return_habit_schedule,
+                                update_habit_schedules, ROLLUP_COLUMNS)
+from LogArchive import (attach_archive, attach_empty_archive, move_log_rows, return_archive_name,
+                        return_attached_databases, return_log_union, ARCHIVE_SCHEMA)
+from DatabaseAnalyzer import HABIT_COLUMNS
+from Clock import SystemClock, SYSTEM_CLOCK
+from ConnectionPool import ConnectionPool
+from QueryCache import QueryCache, TABLES
 from Habit import Habit
 
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+import threading
 import sqlite3
+import os
+
+
+
+# Habit characteristics that are stored in the database as a single timestamp column
+TIMESTAMP_COLUMNS = {
+    "start_time": ("start_timestamp", "start_time", "start_date"),
+    "start_date": ("start_timestamp", "start_time", "start_date"),
+    "end_time": ("end_timestamp", "end_time", "end_date"),
+    "end_date": ("end_timestamp", "end_time", "end_date")
+}
+
+# Habit rows (see return_habit_row) are followed by their schedule (see return_scheduled_habit_row)
+INSERT_HABIT_ROW = """INSERT INTO habits (name, periodicity, time_span, state, current_streak, longest_streak,
+                      start_timestamp, end_timestamp, next_due, breaks_at) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+INSERT_LOG_ROW = """INSERT INTO habits_log (name, current_streak, longest_streak, end_timestamp, 
+                    hour_index, day_index, week_index, month_index, year_index) 
+                    VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+UPSERT_HABIT_ROW = INSERT_HABIT_ROW + """ ON CONFLICT(name) DO UPDATE SET 
+                      periodicity = excluded.periodicity, time_span = excluded.time_span, state = excluded.state,
+                      current_streak = excluded.current_streak, longest_streak = excluded.longest_streak,
+                      start_timestamp = excluded.start_timestamp, end_timestamp = excluded.end_timestamp,
+                      next_due = excluded.next_due, breaks_at = excluded.breaks_at"""
+# Rollups count check-offs, so new log rows are added to the counts of their periods
+UPSERT_HABIT_ROLLUP = """INSERT INTO habit_rollups (name, periodicity, period_index, completions) VALUES(?, ?, ?, ?)
+                         ON CONFLICT DO UPDATE SET completions = completions + excluded.completions"""
+UPSERT_GLOBAL_ROLLUP = """INSERT INTO global_rollups (periodicity, period_index, completions) VALUES(?, ?, ?)
+                          ON CONFLICT DO UPDATE SET completions = completions + excluded.completions"""
+
+
+
+def return_habit_row(habit: Habit) -> tuple:
+    """
+    Returns values of a habit in the order of the INSERT_HABIT_ROW columns (without the schedule).
+
+    Parameters:
+        habit: Habit
+            Habit to be stored."""
+    return (habit.name, 
+            habit.periodicity, 
+            habit.time_span, 
+            habit.state,
+            habit.current_streak, 
+            habit.longest_streak, 
+            return_timestamp_of_habit_time(habit.start_time, habit.start_date), 
+            return_timestamp_of_habit_time(habit.end_time, habit.end_date))
+
+def return_scheduled_habit_row(habit_row: tuple) -> tuple:
+    """
+    Returns a habit row followed by next_due and breaks_at of the habit (see DatabaseMigrations.add_habit_schedule).
+
+    Parameters:
+        habit_row: tuple
+            Values of a habit returned by return_habit_row."""
+    name, periodicity, time_span, state, current_streak, longest_streak, start_timestamp, end_timestamp = habit_row
+    return (*habit_row, *return_habit_schedule(periodicity, state, start_timestamp, end_timestamp))
+
+def return_habit_log_row(habit: Habit) -> tuple:
+    """
+    Returns values of a habit in the order of the INSERT_LOG_ROW columns.
+
+    Parameters:
+        habit: Habit
+            Habit whose secondary information to be logged."""
+    end_timestamp = return_timestamp_of_habit_time(habit.end_time, habit.end_date)
+    return (habit.name,
+            habit.current_streak, 
+            habit.longest_streak, 
+            end_timestamp,
+            *return_period_indices(end_timestamp))
 
 
 
@@ -12,10 +95,53 @@ class Database:
         name: str
             Name to be given for database.
         database: sqlite3.Connection
-            Database that represents by this class."""
-    def __init__(self, name: str = "AppDatabase.db"):
+            Database that represents by this class.
+        read_pool: ConnectionPool
+            Pool of read-only connections to the database, created on the first request.
+        group_commit_latency: float
+            If set, writes are committed in groups: a write is committed at most this number of seconds
+            after it has been made. None means that every write is committed at once.
+        group_commit_size: int
+            The maximal number of writes in a group. The group is committed once it is full.
+        manual_commit: bool
+            If set, writes are committed in groups only when the group is full or commit_pending_writes is called,
+            never by a timer, e.g., in simulations on a simulated clock. The latency is ignored.
+        write_listeners: list
+            Functions called with the names of changed habits (None for all habits) and the changed tables
+            after every commit, e.g., QueryCache.invalidate.
+        clock: SystemClock
+            Clock that tells the current moment to writes that depend on it, e.g., DeadlineScheduler."""
+    def __init__(self, name: str = "AppDatabase.db", group_commit_latency: float = None,
+                 group_commit_size: int = 1000, clock: SystemClock = None, manual_commit: bool = False):
+        """
+        Parameters:
+            name: str, optional
+                Name to be given for database. Defaults to \'AppDatabase.db\'.
+            group_commit_latency: float, optional
+                The maximal number of seconds a write may wait for the commit of its group.
+                Defaults to committing every write at once.
+            group_commit_size: int, optional
+                The maximal number of writes in a group. Defaults to 1000.
+            clock: SystemClock, optional
+                Clock of the database. Defaults to the system clock.
+            manual_commit: bool, optional
+                Whether groups are committed only when they are full or by commit_pending_writes.
+                Defaults to False."""
         self.name = name
+        self.clock = SYSTEM_CLOCK if clock is None else clock
+        self.group_commit_latency = group_commit_latency
+        self.group_commit_size = group_commit_size
+        self.manual_commit = manual_commit
         self.database = self.connect_database(name)
+        self.read_pool = None
+        self.write_listeners = []
+
+        # Pending writes of the current group. The timer commits the group once the latency has passed,
+        # so the connection is shared with the timer thread under the lock.
+        self.lock = threading.RLock()
+        self.pending_writes = 0
+        self.pending_changes = []
+        self.commit_timer = None
 
     # Database creation
     def connect_database(self, name: str = "AppDatabase.db") -> sqlite3.Connection:
@@ -25,8 +151,9 @@ class Database:
         Parameters:
             name: str
                 Name to be given for database."""
-        database = sqlite3.connect(name)
+        database = sqlite3.connect(name, check_same_thread=False)
         self.create_database_tables(database)
+        attach_archive(database, name)
         return database
 
     def create_database_tables(self, database: sqlite3.Connection) -> None:
@@ -36,34 +163,9 @@ class Database:
         Parameters:
             database: sqlite3.Connection
                 Database used for tasks."""
-        # Since the "IF NOT EXISTS" clause is used, we don't need to check weather tables exist or not.
-        # Moreover, code won't affect tables if they already exist.
-        cursor = database.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS habits (
-                name TEXT PRIMARY KEY,
-                periodicity TEXT,
-                time_span INTEGER,
-                state TEXT,
-                current_streak INTEGER,
-                longest_streak INTEGER,
-                start_time TEXT,
-                start_date TEXT,
-                end_time TEXT,
-                end_date TEXT
-        )
-    ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS habits_log (
-                name TEXT,
-                current_streak INTEGER,
-                longest_streak INTEGER,
-                end_time TEXT,
-                end_date TEXT                
-        )
-    ''')
-        database.commit()
-        cursor.close()
+        # Migrations create tables in a new database and upgrade tables of an existing one.
+        # They don't affect tables if the database is already up to date.
+        migrate_database(database)
 
     def disconnect_database(self) -> None:
         """
@@ -72,27 +174,230 @@ class Database:
         Parameters:
             self: Database
                 The instance of the class itself."""
+        self.commit_pending_writes()
+        if self.read_pool is not None:
+            self.read_pool.close()
         self.database.close()
 
+    def return_read_pool(self, size: int = 4) -> ConnectionPool:
+        """
+        Returns the pool of read-only connections to the database. Readers, e.g., DatabaseAnalyzer,
+        can share it instead of opening their own connections. The pool is closed together with the database.
+
+        Parameters:
+            size: int, optional
+                The maximal number of open connections if the pool has not been created yet. Defaults to 4."""
+        if self.read_pool is None:
+            self.read_pool = ConnectionPool(self.name, size, attached_databases=return_attached_databases(self.name),
+                                            setup=attach_empty_archive)
+        return self.read_pool
+
+    def return_data_version(self) -> int:
+        """
+        Returns the version of the database file. The version changes whenever another connection,
+        e.g., of another process, commits changes to the file, but not after commits of this database.
+
+        No parameters."""
+        with self.lock:
+            return self.database.execute("PRAGMA data_version").fetchone()[0]
+
+    def add_write_listener(self, listener) -> None:
+        """
+        Registers a function to be called after every commit with the names of changed habits 
+        (None for all habits) and the changed tables.
+
+        Parameters:
+            listener: callable
+                Function with parameters habit_names: list and tables: tuple."""
+        self.write_listeners.append(listener)
+
+    def return_query_cache(self, capacity: int = 256) -> QueryCache:
+        """
+        Returns a new query result cache for DatabaseAnalyzer that is invalidated by writes of this database
+        and by changes of the database file made by other connections.
+
+        Parameters:
+            capacity: int, optional
+                The maximal number of cached results. Defaults to 256."""
+        cache = QueryCache(self.return_data_version, capacity)
+        self.add_write_listener(cache.invalidate)
+        return cache
+
+    # Transactions
+    @contextmanager
+    def write_transaction(self, habit_names: list = None, tables: tuple = TABLES):
+        """
+        Context manager that yields a cursor for a write. Everything written inside the block is applied
+        atomically: if an error occurs, the changes of the block are rolled back and the error is raised again.
+        The changes are committed at once or together with their group if group commit is enabled.
+        Example: with database.write_transaction() as cursor: cursor.execute(...)
+
+        Parameters:
+            habit_names: list, optional
+                Names of the habits changed by the block, reported to write listeners. Defaults to all habits.
+            tables: tuple, optional
+                Tables changed by the block, reported to write listeners. Defaults to all tables."""
+        with self.lock:
+            cursor = self.database.cursor()
+            if not self.database.in_transaction:
+                cursor.execute("BEGIN")
+            cursor.execute("SAVEPOINT write")
+            try:
+                yield cursor
+                cursor.execute("RELEASE write")
+                if tables:
+                    self.pending_changes.append((habit_names, tables))
+            except Exception:
+                cursor.execute("ROLLBACK TO write")
+                cursor.execute("RELEASE write")
+                # Don't keep an empty transaction (and its lock) open
+                if self.pending_writes == 0:
+                    self.database.rollback()
+                    self.pending_changes.clear()
+                raise
+            finally:
+                cursor.close()
+            self.pending_writes += 1
+            if self.pending_writes >= self.group_commit_size or (
+                    self.group_commit_latency is None and not self.manual_commit):
+                self.commit_pending_writes()
+            elif self.commit_timer is None and not self.manual_commit:
+                self.commit_timer = threading.Timer(self.group_commit_latency, self.commit_pending_writes)
+                self.commit_timer.daemon = True
+                self.commit_timer.start()
+
+    def commit_pending_writes(self) -> None:
+        """
+        Commits all writes of the current group. Called automatically when the group is full
+        or its latency has passed (unless commits are manual), but can be called at any moment,
+        e.g., at the end of bulk loading.
+
+        No parameters."""
+        with self.lock:
+            if self.commit_timer is not None:
+                self.commit_timer.cancel()
+                self.commit_timer = None
+            if self.database.in_transaction:
+                self.database.commit()
+            self.pending_writes = 0
+            changes, self.pending_changes = self.pending_changes, []
+            for habit_names, tables in changes:
+                for listener in self.write_listeners:
+                    listener(habit_names, tables)
+
+
+
     def clean_tables_in_database(self) -> None:
         """
         Deletes all habits from database"""
-        cursor = self.database.cursor()
-        cursor.execute("DELETE FROM habits")
-        cursor.execute("DELETE FROM habits_log")
-        self.database.commit()
-        cursor.close()
+        with self.write_transaction() as cursor:
+            cursor.execute("DELETE FROM habits")
+            cursor.execute("DELETE FROM habits_log")
+            cursor.execute("DELETE FROM archive.archived_log")
+            # No archived row is left, so log ids can start from 1 again
+            cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'habits_log'")
+            cursor.execute("DELETE FROM habit_rollups")
+            cursor.execute("DELETE FROM global_rollups")
+
+    def rebuild_streak_leaderboard(self) -> None:
+        """
+        Rebuilds the streak leaderboard indexes from the habits table. 
+        Use it if the database file was changed by a tool that could leave the indexes inconsistent.
+
+        No parameters."""
+        with self.write_transaction(tables=()) as cursor:
+            cursor.execute("REINDEX habits_by_longest_streak")
+            cursor.execute("REINDEX habits_by_current_streak")
+
+    def rebuild_rollups(self) -> None:
+        """
+        Recomputes the check-off counts of the rollup tables from the habits_log table and the archive.
+        Use it if the log was changed by a tool that didn't update the rollups.
+
+        No parameters."""
+        log_query = return_log_union("""SELECT name, end_timestamp, day_index, week_index, month_index, year_index
+                                        FROM {log}""")
+        with self.write_transaction(tables=("habits_log",)) as cursor:
+            cursor.execute("DELETE FROM habit_rollups")
+            cursor.execute("DELETE FROM global_rollups")
+            fill_completion_rollups(cursor, f"({log_query})")
+
+    # Rollups
+    def update_rollups(self, cursor, log_rows: list) -> None:
+        """
+        Adds check-offs of new habits_log rows to the rollup tables. Must be called inside the write transaction
+        that adds the rows.
+
+        Parameters:
+            cursor: sqlite3.Cursor
+                Cursor of the write transaction.
+            log_rows: list
+                Added log rows in the order of the INSERT_LOG_ROW columns."""
+        completions = Counter()
+        for row in log_rows:
+            # Rows of created habits have no end timestamp, they aren't check-offs
+            if row[3] is not None:
+                # Indices of the day, week, month and year follow the end timestamp and the hour index
+                for periodicity, period_index in zip(ROLLUP_COLUMNS, row[5:]):
+                    completions[(row[0], periodicity, period_index)] += 1
+        global_completions = Counter()
+        for (_, periodicity, period_index), number in completions.items():
+            global_completions[(periodicity, period_index)] += number
+        cursor.executemany(UPSERT_HABIT_ROLLUP, ((*key, number) for key, number in completions.items()))
+        cursor.executemany(UPSERT_GLOBAL_ROLLUP, ((*key, number) for key, number in global_completions.items()))
+
+    # Retention
+    def archive_log_rows(self, retention_days: int = 365, habits_per_transaction: int = 100,
+                         now: datetime = None) -> int:
+        """
+        Moves check-offs older than the retention horizon from the habits_log table to the archive
+        (see LogArchive.py) and returns the number of moved rows. Rollups aren't changed, so they still count
+        check-offs of the whole history. Habits are moved in groups, each in its own transaction, so other writes
+        wait for the write lock no longer than a group takes. Events of habit creation stay in habits_log.
+        The archive file is created when the first check-offs are moved, and the read pool of the database
+        attaches it from then on.
+
+        Parameters:
+            retention_days: int, optional
+                Check-offs made before the beginning of the day this number of days ago are moved.
+                Defaults to 365.
+            habits_per_transaction: int, optional
+                Number of habits whose check-offs are moved in a transaction. Defaults to 100.
+            now: datetime, optional
+                The current moment. Defaults to the time of the clock of the database."""
+        now = self.clock.return_current_datetime() if now is None else now
+        before_timestamp = (return_timestamp(now) // 86400 - retention_days) * 86400
+        with self.lock:
+            names = [row[0] for row in self.database.execute(
+                "SELECT DISTINCT name FROM habits_log WHERE end_timestamp < ?", (before_timestamp,))]
+            archive_name = return_archive_name(self.name)
+            if names and not os.path.exists(archive_name):
+                # The empty archive can only be detached outside a transaction
+                self.commit_pending_writes()
+                attach_archive(self.database, self.name, create=True)
+                if self.read_pool is not None:
+                    self.read_pool.attach_database(ARCHIVE_SCHEMA, archive_name)
+        moved_rows = 0
+        for start in range(0, len(names), habits_per_transaction):
+            group = names[start:start + habits_per_transaction]
+            with self.write_transaction(group, ("habits_log",)) as cursor:
+                moved_rows += move_log_rows(cursor, group, before_timestamp)
+        return moved_rows
+
+
 
     # Function for debugging
     def delete_tables_in_database(self) -> None:
         """
         Deletes table structures from database. It is useful if you restructure your tables (you want more/less columns).
         Only for developers!"""
-        cursor = self.database.cursor()
-        cursor.execute("DROP TABLE IF EXISTS habits")
-        cursor.execute("DROP TABLE IF EXISTS habits_log")
-        self.database.commit()
-        cursor.close()
+        with self.write_transaction() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS habits")
+            cursor.execute("DROP TABLE IF EXISTS habits_log")
+            cursor.execute("DROP TABLE IF EXISTS archive.archived_log")
+            cursor.execute("DROP TABLE IF EXISTS habit_rollups")
+            cursor.execute("DROP TABLE IF EXISTS global_rollups")
+            cursor.execute("PRAGMA user_version = 0")
 
 
 
@@ -105,26 +410,9 @@ class Database:
         Parameters:
             habit: Habit
                 Habit that have to be added to database."""
-        cursor=self.database.cursor()
-        cursor.execute("""INSERT INTO habits VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", (
-            habit.name, 
-            habit.periodicity, 
-            habit.time_span, 
-            habit.state,
-            habit.current_streak, 
-            habit.longest_streak, 
-            habit.start_time, 
-            habit.start_date, 
-            habit.end_time, 
-            habit.end_date,))
-        cursor.execute("""INSERT INTO habits_log VALUES(?, ?, ?, ?, ?)""", (
-            habit.name,
-            habit.current_streak, 
-            habit.longest_streak, 
-            habit.end_time, 
-            habit.end_date,))
-        self.database.commit()
-        cursor.close()
+        with self.write_transaction([habit.name]) as cursor:
+            cursor.execute(INSERT_HABIT_ROW, return_scheduled_habit_row(return_habit_row(habit)))
+            cursor.execute(INSERT_LOG_ROW, return_habit_log_row(habit))
 
     def update_habit_characteristic_in_database(self, habit: Habit, characteristics: list, 
                                                 new_values: list)-> None:
@@ -138,12 +426,19 @@ class Database:
                 Name of the characteristic to be updated.
             new_value: type depends on the charateristic
                 Value that replaces the old one."""
-        cursor=self.database.cursor()
-        for characteristic, new_value in zip(characteristics, new_values):
-            cursor.execute(f"""UPDATE habits SET {characteristic} = ? WHERE name = ?""",
-                            (new_value, habit.name,))
-        self.database.commit()
-        cursor.close()
+        updates = dict(zip(characteristics, new_values))
+        for characteristic in list(updates):
+            if characteristic in TIMESTAMP_COLUMNS:
+                column, time_name, date_name = TIMESTAMP_COLUMNS[characteristic]
+                time = updates.pop(time_name, getattr(habit, time_name))
+                date = updates.pop(date_name, getattr(habit, date_name))
+                updates[column] = return_timestamp_of_habit_time(time, date)
+        assignments = ", ".join(f"{characteristic} = ?" for characteristic in updates)
+        with self.write_transaction([habit.name], ("habits",)) as cursor:
+            cursor.execute(f"""UPDATE habits SET {assignments} WHERE name = ?""",
+                           (*updates.values(), habit.name,))
+            # E.g., a new periodicity moves the deadline of the habit
+            update_habit_schedules(cursor, [habit.name])
 
     def update_habit_logs(self, habit: Habit) -> None:
         """
@@ -152,15 +447,36 @@ class Database:
         Parameters:
             habit: Habit
                 Habit whose updated secondary parameters should be added into logы."""
-        cursor=self.database.cursor()
-        cursor.execute("""INSERT INTO habits_log VALUES(?, ?, ?, ?, ?)""", (
-            habit.name,
-            habit.current_streak, 
-            habit.longest_streak, 
-            habit.end_time, 
-            habit.end_date,))
-        self.database.commit()
-        cursor.close()
+        with self.write_transaction([habit.name], ("habits_log",)) as cursor:
+            log_row = return_habit_log_row(habit)
+            cursor.execute(INSERT_LOG_ROW, log_row)
+            self.update_rollups(cursor, [log_row])
+
+    def check_off_habit_in_database(self, habit: Habit) -> None:
+        """
+        Stores the result of Habit.check_off_habit: updates the state, streaks and end time of the habit
+        and adds the new row to the habits_log table in a single transaction.
+
+        Parameters:
+            habit: Habit
+                Habit that has been checked-off."""
+        end_timestamp = return_timestamp_of_habit_time(habit.end_time, habit.end_date)
+        next_due, breaks_at = return_habit_schedule(habit.periodicity, habit.state,
+                                                    return_timestamp_of_habit_time(habit.start_time, habit.start_date),
+                                                    end_timestamp)
+        with self.write_transaction([habit.name]) as cursor:
+            cursor.execute("""UPDATE habits SET state = ?, current_streak = ?, longest_streak = ?, end_timestamp = ?,
+                              next_due = ?, breaks_at = ? WHERE name = ?""", (
+                habit.state,
+                habit.current_streak,
+                habit.longest_streak,
+                end_timestamp,
+                next_due,
+                breaks_at,
+                habit.name,))
+            log_row = return_habit_log_row(habit)
+            cursor.execute(INSERT_LOG_ROW, log_row)
+            self.update_rollups(cursor, [log_row])
         
 
     def delete_habit_from_database(self, habit_name: str) -> None:
@@ -170,10 +486,56 @@ class Database:
         Parameters:
             habit_name: str
                 Name of the habit to be deleted from the database."""
-        cursor=self.database.cursor()
-        cursor.execute("""DELETE FROM habits WHERE name = ?""", 
-                       (habit_name,))
-        cursor.execute("""DELETE FROM habits_log WHERE name = ?""", 
-                       (habit_name,))
-        self.database.commit()
-        cursor.close()
\ No newline at end of file
+        with self.write_transaction([habit_name]) as cursor:
+            # Check-offs of the habit are taken away from the counts of all habits first
+            cursor.execute("""UPDATE global_rollups SET completions = global_rollups.completions - habit_rollups.completions
+                              FROM habit_rollups WHERE habit_rollups.name = ?
+                              AND habit_rollups.periodicity = global_rollups.periodicity
+                              AND habit_rollups.period_index = global_rollups.period_index""", (habit_name,))
+            cursor.execute("DELETE FROM global_rollups WHERE completions = 0")
+            cursor.execute("DELETE FROM habit_rollups WHERE name = ?", (habit_name,))
+            cursor.execute("""DELETE FROM habits WHERE name = ?""", 
+                           (habit_name,))
+            cursor.execute("""DELETE FROM habits_log WHERE name = ?""", 
+                           (habit_name,))
+            cursor.execute("""DELETE FROM archive.archived_log WHERE name = ?""",
+                           (habit_name,))
+
+
+
+    def return_habit_from_database(self, habit_name: str) -> tuple:
+        """
+        Returns the habit with the given name in the order of Habit.__init__ parameters or None if it doesn't exist.
+        Unlike DatabaseAnalyzer, reads through the writing connection, so writes that haven't been committed yet
+        (see group commit) are seen.
+
+        Parameters:
+            habit_name: str
+                Name of the habit to be returned."""
+        with self.lock:
+            return self.database.execute(f"SELECT {HABIT_COLUMNS} FROM habits WHERE name = ?",
+                                         (habit_name,)).fetchone()
+
+
+
+    # Bulk loading
+    def insert_rows_to_database(self, habit_rows: list, log_rows: list, upsert: bool = False) -> None:
+        """
+        Adds many habits and log rows to the database in a single transaction. Much faster than adding 
+        habits one by one, since statements are executed in bulk and committed once.
+
+        Parameters:
+            habit_rows: list
+                Habits in the order of the INSERT_HABIT_ROW columns (see return_habit_row).
+            log_rows: list
+                Log rows in the order of the INSERT_LOG_ROW columns (see return_habit_log_row).
+            upsert: bool, optional
+                Whether to overwrite habits that already exist instead of failing with IntegrityError. 
+                Log rows are always appended. Defaults to False."""
+        # Bulk loads are reported as changes of all habits rather than of every loaded habit
+        tables = tuple(table for table, rows in zip(TABLES, (habit_rows, log_rows)) if rows)
+        with self.write_transaction(None, tables) as cursor:
+            cursor.executemany(UPSERT_HABIT_ROW if upsert else INSERT_HABIT_ROW,
+                               map(return_scheduled_habit_row, habit_rows))
+            cursor.executemany(INSERT_LOG_ROW, log_rows)
+            self.update_rollups(cursor, log_rows)
@@ -1,4 +1,60 @@
-import sqlite3
+from LogArchive import attach_empty_archive, return_attached_databases, return_log_union, LOG_TABLES
+from PeriodIndex import return_covering_periods, return_timestamp
+from ConnectionPool import ConnectionPool
+from Clock import SystemClock, SYSTEM_CLOCK
+from QueryCache import QueryCache, cached_query
+
+from datetime import datetime
+
+
+
+# Columns of the 'habits' table in the order of Habit.__init__ parameters. 
+# Timestamps are rendered back to the time and date format used by the Habit class.
+HABIT_COLUMNS = """name, periodicity, time_span, state, current_streak, longest_streak,
+                   strftime('%H:%M:%S', start_timestamp, 'unixepoch'), 
+                   strftime('%Y-%m-%d', start_timestamp, 'unixepoch'),
+                   strftime('%H:%M:%S', end_timestamp, 'unixepoch'), 
+                   strftime('%Y-%m-%d', end_timestamp, 'unixepoch')"""
+
+# Columns of habits returned by the schedule queries (due, overdue and at-risk habits)
+SCHEDULE_COLUMNS = "name, periodicity, current_streak, next_due, breaks_at"
+
+
+
+
+def return_page_token(end_timestamp: int, log_id: int) -> str:
+    """
+    Returns a token that points to the event of a habit history with the given end timestamp and log id.
+
+    Parameters:
+        end_timestamp: int
+            End timestamp of the event or None.
+        log_id: int
+            Log id of the event."""
+    return f"{'' if end_timestamp is None else end_timestamp}:{log_id}"
+
+def parse_page_token(page_token: str) -> tuple:
+    """
+    Returns (end timestamp, log id) of the event the token points to.
+
+    Parameters:
+        page_token: str
+            Token returned by return_page_token."""
+    end_timestamp, log_id = page_token.split(":")
+    return (int(end_timestamp) if end_timestamp else None, int(log_id))
+
+
+
+def return_now(now: int = None, clock: SystemClock = SYSTEM_CLOCK) -> int:
+    """
+    Returns the timestamp of the current moment unless a timestamp is given.
+
+    Parameters:
+        now: int, optional
+            Timestamp of the moment. Defaults to the time of the clock.
+        clock: SystemClock, optional
+            Clock that tells the current moment. Defaults to the system clock."""
+    return clock.return_current_timestamp() if now is None else now
 
 
 
@@ -10,26 +66,60 @@ class DatabaseAnalyzer:
     
     Attributes:
             database_name: str
-                Name of the database to be analyzed."""
-    def __init__(self, database_name: str) -> None:
+                Name of the database to be analyzed.
+            pool: ConnectionPool
+                Pool of read-only connections used for queries.
+            owns_pool: bool
+                Whether the pool has been created by the analyzer and should be closed together with it.
+            cache: QueryCache
+                Cache of query results or None if every query reads the database.
+            clock: SystemClock
+                Clock that tells the current moment to queries that depend on it, e.g., return_due_habits."""
+    def __init__(self, database_name: str, pool: ConnectionPool = None, cache: QueryCache = None,
+                 clock: SystemClock = None) -> None:
         """
         Parameters:
             database_name: str
-                Name of the database to be analyzed."""
+                Name of the database to be analyzed.
+            pool: ConnectionPool, optional
+                Pool of read-only connections to share with other objects, e.g., Database.return_read_pool().
+                Defaults to a new pool owned by the analyzer.
+            cache: QueryCache, optional
+                Cache of query results, e.g., Database.return_query_cache(). Defaults to no cache.
+            clock: SystemClock, optional
+                Clock of the analyzed database, e.g., Database.clock. Defaults to the system clock."""
         self.database_name = database_name
+        self.owns_pool = pool is None
+        if pool is None:
+            pool = ConnectionPool(database_name, attached_databases=return_attached_databases(database_name),
+                                  setup=attach_empty_archive)
+        self.pool = pool
+        self.cache = cache
+        self.clock = SYSTEM_CLOCK if clock is None else clock
 
+    def close(self) -> None:
+        """
+        Closes connections of the analyzer. A pool shared with other objects is left open.
+
+        No parameters."""
+        if self.owns_pool:
+            self.pool.close()
+
+    @cached_query(("habits",))
     def return_currently_tracked_habits(self, state = "In progress") -> list:
         """
         Returns all currently tracked habits, i.e., whose state is \"In progress\"
         
         No parameters."""
-        cursor = sqlite3.connect(self.database_name).cursor()
-        cursor.execute("SELECT * FROM habits WHERE state = ?",
-                       (state,))        
-        habits = list(cursor.fetchall())
-        cursor.close()
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"SELECT {HABIT_COLUMNS} FROM habits WHERE state = ?",
+                           (state,))        
+            habits = list(cursor.fetchall())
+            cursor.close()
         return habits
 
+    @cached_query(("habits",))
     def return_habits_with_the_same_periodicity(self, periodicity: str) -> list:
         """
         Returns all currently tracked habits with a certain periodicity (hour/day/etc.).
@@ -37,55 +127,163 @@ class DatabaseAnalyzer:
         Parameters:
             periodicity: str
                 Periodicity of habits to be returned."""
-        cursor = sqlite3.connect(self.database_name).cursor()
-        cursor.execute("SELECT * FROM habits WHERE periodicity = ?", 
-                       (periodicity,))
-        habits = list(cursor.fetchall())
-        cursor.close()
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"SELECT {HABIT_COLUMNS} FROM habits WHERE periodicity = ?", 
+                           (periodicity,))
+            habits = list(cursor.fetchall())
+            cursor.close()
         return habits
 
+    @cached_query(("habits",))
     def return_longest_streak_of_all_habits(self) -> list:
         """
         Returns the longest streak among all defined habits.
         
         No parameters."""
-        cursor = sqlite3.connect(self.database_name).cursor()
-        cursor.execute("SELECT MAX(longest_streak) FROM habits")
-        max_longest_streak = cursor.fetchone()[0]
-        cursor.execute("SELECT name FROM habits WHERE longest_streak = ?", 
-                       (max_longest_streak,))
-        habits_names_with_longest_streak = cursor.fetchall()
-        cursor.close()
-        return [habits_names_with_longest_streak, max_longest_streak]
+        # Both the maximum and the habits that reach it are read from the streak leaderboard index
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("""SELECT name, longest_streak FROM habits 
+                           WHERE longest_streak = (SELECT MAX(longest_streak) FROM habits)
+                           ORDER BY longest_streak DESC, name""")
+            rows = cursor.fetchall()
+            cursor.close()
+        if rows == []:
+            return [[], None]
+        return [[(name,) for name, _ in rows], rows[0][1]]
 
+    @cached_query(("habits",))
+    def return_top_habits_by_streak(self, habits_amount: int = 10, streak: str = "longest_streak",
+                                    include_ties: bool = False) -> list:
+        """
+        Returns names, current and longest streaks of habits with the highest streaks,
+        from the highest to the lowest streak (habits with equal streaks are ordered by name).
+        
+        Parameters:
+            habits_amount: int, optional
+                Number of habits to be returned. Defaults to 10.
+            streak: str, optional
+                \'longest_streak\' or \'current_streak\'. Defaults to \'longest_streak\'.
+            include_ties: bool, optional
+                Whether to also return habits whose streak equals the streak of the last returned habit.
+                Defaults to False."""
+        if streak not in ("longest_streak", "current_streak"):
+            raise ValueError(f"Unknown streak {streak}.")
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"""SELECT name, current_streak, longest_streak FROM habits 
+                           ORDER BY {streak} DESC, name 
+                           LIMIT ?""", (habits_amount,))
+            top_habits = cursor.fetchall()
+            if include_ties and len(top_habits) == habits_amount > 0:
+                last_name, last_streak = top_habits[-1][0], top_habits[-1][1 if streak == "current_streak" else 2]
+                cursor.execute(f"""SELECT name, current_streak, longest_streak FROM habits 
+                               WHERE {streak} = ? AND name > ?
+                               ORDER BY {streak} DESC, name""", (last_streak, last_name))
+                top_habits.extend(cursor.fetchall())
+            cursor.close()
+        return top_habits
+
+    @cached_query(("habits",), per_habit=True)
     def return_longest_streaks_of_given_habit(self, habit_name: str) -> int:
         """
-        Returns the longest streak of the certain habit.
+        Returns the longest streak of the certain habit. Raises KeyError if the habit doesn't exist.
         
         Parameters:
             habit_name: str
                 Name of the habit whose longest streak to be returned."""
-        cursor = sqlite3.connect(self.database_name).cursor()
-        cursor.execute("SELECT longest_streak FROM habits WHERE name = ?", 
-                       (habit_name,))
-        streak = cursor.fetchone()[0]
-        cursor.close()
-        return streak
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT longest_streak FROM habits WHERE name = ?", 
+                           (habit_name,))
+            row = cursor.fetchone()
+            cursor.close()
+        if row is None:
+            raise KeyError(habit_name)
+        return row[0]
     
     
     
+    # Results of the schedule queries depend on the current moment, so they aren't cached.
+    # Each of them reads a range of an index (see DatabaseMigrations.add_habit_schedule) in time order.
+    def return_due_habits(self, now: int = None, habits_amount: int = None) -> list:
+        """
+        Returns habits in progress that haven't been checked off in the current period (including overdue habits)
+        as (name, periodicity, current streak, next due, breaks at), from the longest waiting one.
+
+        Parameters:
+            now: int, optional
+                Timestamp of the current moment. Defaults to the time of the clock of the analyzer.
+            habits_amount: int, optional
+                The maximal number of habits to be returned. Defaults to all due habits."""
+        return self.fetch_scheduled_habits("next_due <= ?", (return_now(now, self.clock),), "next_due", habits_amount)
+
+    def return_overdue_habits(self, now: int = None, habits_amount: int = None) -> list:
+        """
+        Returns habits in progress whose deadline has passed without a check-off, i.e., whose streak is lost,
+        as (name, periodicity, current streak, next due, breaks at), from the earliest deadline.
+
+        Parameters:
+            now: int, optional
+                Timestamp of the current moment. Defaults to the time of the clock of the analyzer.
+            habits_amount: int, optional
+                The maximal number of habits to be returned. Defaults to all overdue habits."""
+        return self.fetch_scheduled_habits("breaks_at <= ?", (return_now(now, self.clock),), "breaks_at", habits_amount)
+
+    def return_habits_at_risk(self, hours_amount: int = 24, now: int = None, habits_amount: int = None) -> list:
+        """
+        Returns due habits whose streak is lost within the given number of hours unless they are checked off,
+        as (name, periodicity, current streak, next due, breaks at), from the earliest deadline.
+
+        Parameters:
+            hours_amount: int, optional
+                Number of hours ahead. Defaults to 24.
+            now: int, optional
+                Timestamp of the current moment. Defaults to the time of the clock of the analyzer.
+            habits_amount: int, optional
+                The maximal number of habits to be returned. Defaults to all habits at risk."""
+        now = return_now(now, self.clock)
+        return self.fetch_scheduled_habits("breaks_at > ? AND breaks_at <= ? AND next_due <= ?",
+                                            (now, now + hours_amount * 3600, now), "breaks_at", habits_amount)
+
+    def fetch_scheduled_habits(self, condition: str, parameters: tuple, order: str, habits_amount: int) -> list:
+        """
+        Returns habits that meet a condition on their schedule, ordered by a schedule column and name.
+
+        Parameters:
+            condition: str
+                Condition of the query that bounds the range of the index of the order column.
+            parameters: tuple
+                Parameters of the condition.
+            order: str
+                'next_due' or 'breaks_at'.
+            habits_amount: int
+                The maximal number of habits to be returned, None for all of them."""
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"""SELECT {SCHEDULE_COLUMNS} FROM habits WHERE {condition}
+                               ORDER BY {order}, name LIMIT ?""",
+                           (*parameters, -1 if habits_amount is None else habits_amount))
+            habits = cursor.fetchall()
+            cursor.close()
+        return habits
+
+    @cached_query(("habits",))
     def return_developed_habits(self, state = "Completed") -> list:
         """
         Returns all developed habits, i.e., whose state is \"Completed\"
         
         No parameters."""
-        cursor = sqlite3.connect(self.database_name).cursor()
-        cursor.execute("SELECT * FROM habits WHERE state = ?",
-                       (state,))        
-        habits = list(cursor.fetchall())
-        cursor.close()
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"SELECT {HABIT_COLUMNS} FROM habits WHERE state = ?",
+                           (state,))        
+            habits = list(cursor.fetchall())
+            cursor.close()
         return habits
 
+    @cached_query(("habits",), per_habit=True)
     def return_detailed_information_about_habit(self, habit_name: str) -> list:
         """
         Returns all information about the certain habit.
@@ -93,26 +291,27 @@ class DatabaseAnalyzer:
         Parameters:
             habit_name: str
                 Name of the habit whose the whole information to be returned."""
-        cursor = sqlite3.connect(self.database_name).cursor()
-        cursor.execute("""SELECT 
-                       habits.name AS 'Habit name', 
-                       habits.periodicity AS Periodicity, 
-                       habits.time_span AS 'Time span',
-                       habits.state AS 'State', 
-                       habits.current_streak AS 'Current streak', 
-                       habits.longest_streak AS 'Longest streak', 
-                       habits.start_time AS 'Start time', 
-                       habits.start_date AS 'Start date', 
-                       habits.end_time AS 'End time',
-                       habits.end_date AS 'End date' 
-                       FROM habits
-                       WHERE habits.name = ?""", (habit_name,))
-        row = cursor.fetchone()
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("""SELECT 
+                           habits.name AS 'Habit name', 
+                           habits.periodicity AS Periodicity, 
+                           habits.time_span AS 'Time span',
+                           habits.state AS 'State', 
+                           habits.current_streak AS 'Current streak', 
+                           habits.longest_streak AS 'Longest streak', 
+                           strftime('%H:%M:%S', habits.start_timestamp, 'unixepoch') AS 'Start time', 
+                           strftime('%Y-%m-%d', habits.start_timestamp, 'unixepoch') AS 'Start date', 
+                           strftime('%H:%M:%S', habits.end_timestamp, 'unixepoch') AS 'End time',
+                           strftime('%Y-%m-%d', habits.end_timestamp, 'unixepoch') AS 'End date' 
+                           FROM habits
+                           WHERE habits.name = ?""", (habit_name,))
+            row = cursor.fetchone()
+            column_names = [description[0] for description in cursor.description]
+            cursor.close()
         if row is None:
             return [None, None]
         habit_info = list(row)
-        column_names = [description[0] for description in cursor.description]
-        cursor.close()
         return [column_names, habit_info]
 
     def return_habit_history(self, habit_name: str, rows_amount: int = 10) -> list:
@@ -121,19 +320,337 @@ class DatabaseAnalyzer:
         
         Parameters:
             habit_name: str
-                Name of the habit whose history to be returned."""
-        cursor = sqlite3.connect(self.database_name).cursor()
-        cursor.execute(f"""SELECT 
-                       habits_log.name AS 'Habit name', 
-                       habits_log.current_streak AS 'Current streak', 
-                       habits_log.longest_streak AS 'Longest streak', 
-                       habits_log.end_time AS 'End time',
-                       habits_log.end_date AS 'End date'
-                       FROM habits_log
-                       WHERE habits_log.name = ?
-                       ORDER BY habits_log.end_date DESC, habits_log.end_time DESC
-                       LIMIT {rows_amount} OFFSET 0""", (habit_name,))
-        history = cursor.fetchall()
-        history = list(history)
+                Name of the habit whose history to be returned.
+            rows_amount: int, optional
+                Number of events to be returned. Defaults to 10."""
+        return self.return_habit_history_page(habit_name, rows_amount)[0]
+
+    @cached_query(("habits_log",), per_habit=True)
+    def return_habit_history_page(self, habit_name: str, rows_amount: int = 10, 
+                                  page_token: str = None, direction: str = "next") -> list:
+        """
+        Returns a page of completion events of a certain habit, from the latest to the earliest,
+        together with tokens of the next (earlier events) and the previous (later events) pages.
+        A token is None if there is no such page.
+        Pages are found by the position of their first event (keyset pagination), so reading any page 
+        costs the same regardless of how long the history is.
+        
+        Parameters:
+            habit_name: str
+                Name of the habit whose history to be returned.
+            rows_amount: int, optional
+                The maximal number of events on the page. Defaults to 10.
+            page_token: str, optional
+                Token returned with a previous page. Defaults to the first page.
+            direction: str, optional
+                \'next\' to read the page after the token or \'previous\' to read the page before it.
+                Defaults to \'next\'."""
+        key = None if page_token is None else parse_page_token(page_token)
+        earlier = direction == "next" or key is None
+        with self.pool.connection() as connection:
+            rows = self.fetch_history_rows(connection, habit_name, rows_amount + 1, key, earlier)
+        has_more = len(rows) > rows_amount
+        rows = rows[:rows_amount]
+        if not earlier:
+            rows.reverse()
+        if rows == []:
+            return [[], None, None]
+
+        first_token = return_page_token(rows[0][-2], rows[0][-1])
+        last_token = return_page_token(rows[-1][-2], rows[-1][-1])
+        if earlier:
+            next_token = last_token if has_more else None
+            previous_token = first_token if key is not None else None
+        else:
+            next_token = last_token
+            previous_token = first_token if has_more else None
+        return [[row[:-2] for row in rows], next_token, previous_token]
+
+    def stream_habit_history(self, habit_name: str, chunk_size: int = 1000):
+        """
+        Generator that yields every completion event of a certain habit, from the latest to the earliest.
+        Events are read in chunks, so the whole history is never held in memory.
+        
+        Parameters:
+            habit_name: str
+                Name of the habit whose history to be returned.
+            chunk_size: int, optional
+                Number of events read from the database at once. Defaults to 1000."""
+        page_token = None
+        while True:
+            history, page_token, _ = self.return_habit_history_page(habit_name, chunk_size, page_token)
+            yield from history
+            if page_token is None:
+                return
+
+    def fetch_history_rows(self, connection, habit_name: str, rows_amount: int, 
+                           key: tuple, earlier: bool) -> list:
+        """
+        Returns up to rows_amount events of a certain habit that are earlier (ordered from the latest)
+        or later (ordered from the earliest) than the event with the given key. Every row ends with 
+        the end timestamp and the log id of the event.
+        Events are ordered by end timestamp and log id; events without end timestamp (the habit creation) 
+        are considered the earliest. Each part of the order is read with its own index seek, check-offs
+        are read from both tiers of the log (see LogArchive.py) and merged.
+        
+        Parameters:
+            connection: sqlite3.Connection
+                Connection to the database.
+            habit_name: str
+                Name of the habit whose history to be returned.
+            rows_amount: int
+                The maximal number of events to be returned.
+            key: tuple
+                (end timestamp, log id) of the event to start from or None to start from the latest event.
+            earlier: bool
+                Whether to return events earlier or later than the key."""
+        if key is None:
+            timed, untimed = ("end_timestamp IS NOT NULL", ()), ("1", ())
+        elif key[0] is None:
+            timed = None if earlier else ("end_timestamp IS NOT NULL", ())
+            untimed = ("log_id < ?" if earlier else "log_id > ?", (key[1],))
+        elif earlier:
+            timed = ("end_timestamp <= ? AND NOT (end_timestamp = ? AND log_id >= ?)", (key[0], key[0], key[1]))
+            untimed = ("1", ())
+        else:
+            timed = ("end_timestamp >= ? AND NOT (end_timestamp = ? AND log_id <= ?)", (key[0], key[0], key[1]))
+            untimed = None
+
+        order = "DESC" if earlier else "ASC"
+        # Events of habit creation are never archived
+        parts = [(timed, "end_timestamp IS NOT NULL", f"end_timestamp {order}, log_id {order}", True),
+                 (untimed, "end_timestamp IS NULL", f"log_id {order}", False)]
+        if not earlier:
+            parts.reverse()
+        rows = []
+        cursor = connection.cursor()
+        for condition, part, part_order, archived in parts:
+            if condition is None or len(rows) == rows_amount:
+                continue
+            query = f"""SELECT 
+                        name AS 'Habit name', 
+                        current_streak AS 'Current streak', 
+                        longest_streak AS 'Longest streak', 
+                        strftime('%H:%M:%S', end_timestamp, 'unixepoch') AS 'End time',
+                        strftime('%Y-%m-%d', end_timestamp, 'unixepoch') AS 'End date',
+                        end_timestamp, log_id
+                        FROM {{log}}
+                        WHERE name = ? AND {part} AND {condition[0]}"""
+            parameters = (habit_name, *condition[1])
+            if archived:
+                query, parameters = return_log_union(query), parameters * len(LOG_TABLES)
+            else:
+                query = query.format(log="habits_log")
+            cursor.execute(f"{query} ORDER BY {part_order} LIMIT ?", (*parameters, rows_amount - len(rows)))
+            rows.extend(cursor.fetchall())
         cursor.close()
-        return history
+        return rows
+
+    @cached_query(("habits",), per_habit=True)
+    def return_habit(self, habit_name: str) -> tuple:
+        """
+        Returns the habit with the given name in the order of Habit.__init__ parameters or None if it doesn't exist.
+        
+        Parameters:
+            habit_name: str
+                Name of the habit to be returned."""
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"SELECT {HABIT_COLUMNS} FROM habits WHERE name = ?",
+                           (habit_name,))
+            habit = cursor.fetchone()
+            cursor.close()
+        return habit
+
+    @cached_query(("habits",))
+    def return_habit_names(self, rows_amount: int = 1000, after_row_id: int = 0) -> list:
+        """
+        Returns a page of habit names in the order habits were added, as (row id, name) pairs.
+        The next page starts after the row id of the last pair.
+        
+        Parameters:
+            rows_amount: int, optional
+                The maximal number of names on the page. Defaults to 1000.
+            after_row_id: int, optional
+                Row id of the last habit on the previous page. Defaults to the beginning."""
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT rowid, name FROM habits WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                           (after_row_id, rows_amount))
+            names = list(cursor.fetchall())
+            cursor.close()
+        return names
+
+    @cached_query(("habits",))
+    def return_number_of_habits(self) -> int:
+        """
+        Returns the number of all defined habits.
+        
+        No parameters."""
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT COUNT(*) FROM habits")
+            number = cursor.fetchone()[0]
+            cursor.close()
+        return number
+
+    @cached_query(("habits",))
+    def return_habit_streaks(self, habit_names: list = None) -> list:
+        """
+        Returns the name, state, current streak, longest streak and end timestamp of habits, ordered by name.
+        
+        Parameters:
+            habit_names: list, optional
+                Names of habits to be returned. Defaults to all habits."""
+        query = "SELECT name, state, current_streak, longest_streak, end_timestamp FROM habits"
+        parameters = ()
+        if habit_names is not None:
+            query += f" WHERE name IN ({', '.join('?' * len(habit_names))})"
+            parameters = tuple(habit_names)
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query + " ORDER BY name", parameters)
+            streaks = list(cursor.fetchall())
+            cursor.close()
+        return streaks
+
+    @cached_query(("habits", "habits_log"))
+    def return_check_off_log(self, habit_names: list = None) -> list:
+        """
+        Returns every check-off of habits together with the habit periodicity and time span,
+        ordered by habit name and time. Used to recompute streaks from the history.
+        
+        Parameters:
+            habit_names: list, optional
+                Names of habits whose check-offs to be returned. Defaults to all habits."""
+        query = """SELECT 
+                   habits.name AS name, habits.periodicity, habits.time_span,
+                   log.end_timestamp AS end_timestamp
+                   FROM {log} AS log
+                   JOIN habits ON habits.name = log.name
+                   WHERE log.end_timestamp IS NOT NULL"""
+        parameters = ()
+        if habit_names is not None:
+            query += f" AND log.name IN ({', '.join('?' * len(habit_names))})"
+            parameters = tuple(habit_names) * len(LOG_TABLES)
+        # Both tiers of the log are read in the order of their indexes and merged
+        query = return_log_union(query) + " ORDER BY name, end_timestamp"
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, parameters)
+            log = list(cursor.fetchall())
+            cursor.close()
+        return log
+
+    @cached_query(("habits_log",), per_habit=True)
+    def return_completion_series(self, habit_name: str = None, periodicity: str = "Month",
+                                 first_index: int = None, last_index: int = None) -> list:
+        """
+        Returns (period index, number of check-offs) of every day, ISO week, month or year with check-offs,
+        ordered by period. Reads the rollup of the periodicity, i.e., one row per period.
+        
+        Parameters:
+            habit_name: str, optional
+                Name of the habit. Defaults to all habits together.
+            periodicity: str, optional
+                'Day', 'Week', 'Month' or 'Year'. Defaults to 'Month'.
+            first_index: int, optional
+                Index of the first period (see PeriodIndex.return_period_indices). Defaults to the earliest one.
+            last_index: int, optional
+                Index of the last period. Defaults to the latest one."""
+        if periodicity not in ("Day", "Week", "Month", "Year"):
+            raise ValueError("Periodicity must be one of Day, Week, Month, Year.")
+        table, conditions, parameters = "global_rollups", ["periodicity = ?"], [periodicity]
+        if habit_name is not None:
+            table = "habit_rollups"
+            conditions.insert(0, "name = ?")
+            parameters.insert(0, habit_name)
+        if first_index is not None:
+            conditions.append("period_index >= ?")
+            parameters.append(first_index)
+        if last_index is not None:
+            conditions.append("period_index <= ?")
+            parameters.append(last_index)
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"""SELECT period_index, completions FROM {table}
+                               WHERE {' AND '.join(conditions)} ORDER BY period_index""", parameters)
+            series = list(cursor.fetchall())
+            cursor.close()
+        return series
+
+    @cached_query(("habits_log",), per_habit=True)
+    def return_number_of_completions(self, habit_name: str = None, first_day: int = None,
+                                     last_day: int = None) -> int:
+        """
+        Returns the number of check-offs made from the first to the last day (inclusive). The days are covered
+        by the fewest whole years, months and days, and each of them is read from the coarsest rollup,
+        so a range of many years reads tens of rollup rows.
+        
+        Parameters:
+            habit_name: str, optional
+                Name of the habit. Defaults to all habits together.
+            first_day: int, optional
+                Index of the first day (see PeriodIndex.return_period_indices). Defaults to the earliest check-off.
+            last_day: int, optional
+                Index of the last day. Defaults to the latest check-off."""
+        if first_day is None and last_day is None:
+            periods = [("Year", None, None)]
+        else:
+            # Missing bounds are replaced by the bounds of the years with check-offs
+            years = self.return_completion_series(habit_name, "Year")
+            if years == []:
+                return 0
+            if first_day is None:
+                first_day = return_timestamp(datetime(years[0][0], 1, 1)) // 86400
+            if last_day is None:
+                last_day = return_timestamp(datetime(years[-1][0] + 1, 1, 1)) // 86400 - 1
+            periods = return_covering_periods(first_day, last_day)
+        table, name_condition = ("global_rollups", "") if habit_name is None else ("habit_rollups", "name = ? AND ")
+        parts, parameters = [], []
+        for periodicity, first_index, last_index in periods:
+            parts.append(f"(periodicity = ?{'' if first_index is None else ' AND period_index BETWEEN ? AND ?'})")
+            parameters += ([periodicity] if first_index is None else [periodicity, first_index, last_index])
+        if habit_name is not None:
+            parameters.insert(0, habit_name)
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"""SELECT COALESCE(SUM(completions), 0) FROM {table}
+                               WHERE {name_condition}({' OR '.join(parts)})""", parameters)
+            number = cursor.fetchone()[0]
+            cursor.close()
+        return number
+
+    @cached_query(("habits", "habits_log"))
+    def return_check_off_columns(self, habit_names: list = None) -> list:
+        """
+        Returns the name, periodicity, time span, start timestamp, number of check-offs and check-off timestamps
+        (joined with commas, usually in the order of time) of every habit, ordered by habit name. Habits that have
+        never been checked off have no timestamps (None). One row per habit is much faster to read than one row per
+        check-off, so analytics of the whole history use this query instead of return_check_off_log.
+        
+        Parameters:
+            habit_names: list, optional
+                Names of habits whose check-offs to be returned. Defaults to all habits."""
+        # Every tier is joined with habits through its index, which yields check-offs of a habit in the order of time,
+        # and the rows of both tiers are merged by name with the archive (the earlier check-offs) first
+        query = """SELECT
+                   habits.name AS name, habits.periodicity AS periodicity, habits.time_span AS time_span,
+                   habits.start_timestamp AS start_timestamp,
+                   COUNT(log.end_timestamp) AS completions, GROUP_CONCAT(log.end_timestamp) AS timestamps
+                   FROM habits
+                   LEFT JOIN {log} AS log
+                   ON log.name = habits.name AND log.end_timestamp IS NOT NULL"""
+        parameters = ()
+        if habit_names is not None:
+            query += f" WHERE habits.name IN ({', '.join('?' * len(habit_names))})"
+            parameters = tuple(habit_names) * len(LOG_TABLES)
+        query = f"""SELECT name, periodicity, time_span, start_timestamp, SUM(completions), GROUP_CONCAT(timestamps)
+                    FROM ({return_log_union(query + " GROUP BY habits.name")} ORDER BY name)
+                    GROUP BY name ORDER BY name"""
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, parameters)
+            columns = list(cursor.fetchall())
+            cursor.close()
+        return columns
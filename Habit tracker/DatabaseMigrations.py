@@ -0,0 +1,339 @@
+from PeriodIndex import return_deadline, return_next_period_start
+
+import sqlite3
+
+
+
+"""
+This module upgrades the structure of the application database. The schema version is stored
+in the database file itself (\'PRAGMA user_version\'), and every migration upgrades the database by one version.
+Migrations are applied in order, each one in its own transaction, so an interrupted upgrade never leaves
+a half-migrated database behind.
+
+Never change or reorder existing migrations, since databases of users have already been upgraded by them.
+Append a new migration to the MIGRATIONS list instead."""
+
+
+
+# Column of habits_log with the index of the period of every rollup (see add_completion_rollups)
+ROLLUP_COLUMNS = {
+    "Day": "day_index",
+    "Week": "week_index",
+    "Month": "month_index",
+    "Year": "year_index"
+}
+
+
+
+def create_tables_with_integer_timestamps(cursor: sqlite3.Cursor) -> None:
+    """
+    Version 1. Creates tables for habits and their log. Time and date are stored as timestamps
+    (see PeriodIndex.py), and every log row also stores indices of the periods containing the check-off.
+    Databases created by older versions of the application, which stored time and date as separate
+    text columns, are converted.
+
+    Parameters:
+        cursor: sqlite3.Cursor
+            Cursor of the database to be upgraded."""
+    cursor.execute("SELECT name FROM pragma_table_info('habits')")
+    text_columns = ("start_time",) in cursor.fetchall()
+    if text_columns:
+        cursor.execute("ALTER TABLE habits RENAME TO habits_text")
+        cursor.execute("ALTER TABLE habits_log RENAME TO habits_log_text")
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS habits (
+            name TEXT PRIMARY KEY,
+            periodicity TEXT,
+            time_span INTEGER,
+            state TEXT,
+            current_streak INTEGER,
+            longest_streak INTEGER,
+            start_timestamp INTEGER,
+            end_timestamp INTEGER
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS habits_log (
+            name TEXT,
+            current_streak INTEGER,
+            longest_streak INTEGER,
+            end_timestamp INTEGER,
+            hour_index INTEGER,
+            day_index INTEGER,
+            week_index INTEGER,
+            month_index INTEGER,
+            year_index INTEGER
+        )
+    ''')
+    if not text_columns:
+        return
+
+    # SQLite treats '%Y-%m-%d %H:%M:%S' strings as UTC, so strftime('%s', ...) gives exactly
+    # the wall-clock timestamp used by PeriodIndex.
+    cursor.execute('''
+        INSERT INTO habits
+        SELECT name, periodicity, time_span, state, current_streak, longest_streak,
+               CAST(strftime('%s', start_date || ' ' || start_time) AS INTEGER),
+               CAST(strftime('%s', end_date || ' ' || end_time) AS INTEGER)
+        FROM habits_text
+    ''')
+    cursor.execute('''
+        INSERT INTO habits_log
+        SELECT name, current_streak, longest_streak, end_timestamp,
+               end_timestamp / 3600,
+               end_timestamp / 86400,
+               (end_timestamp / 86400 + 3) / 7,
+               (CAST(strftime('%Y', end_timestamp, 'unixepoch') AS INTEGER) - 1970) * 12
+               + CAST(strftime('%m', end_timestamp, 'unixepoch') AS INTEGER) - 1,
+               CAST(strftime('%Y', end_timestamp, 'unixepoch') AS INTEGER)
+        FROM (SELECT name, current_streak, longest_streak,
+                     CAST(strftime('%s', end_date || ' ' || end_time) AS INTEGER) AS end_timestamp
+              FROM habits_log_text ORDER BY rowid)
+    ''')
+    cursor.execute("DROP TABLE habits_text")
+    cursor.execute("DROP TABLE habits_log_text")
+
+def add_habits_log_primary_key_and_indexes(cursor: sqlite3.Cursor) -> None:
+    """
+    Version 2. Gives every log row a primary key and adds indexes for the most frequent queries:
+    the covering index on the log serves history of a habit (and its deletion) without reading the table,
+    indexes on habits serve selections by state and periodicity.
+
+    Parameters:
+        cursor: sqlite3.Cursor
+            Cursor of the database to be upgraded."""
+    cursor.execute('''
+        CREATE TABLE habits_log_with_key (
+            log_id INTEGER PRIMARY KEY,
+            name TEXT,
+            current_streak INTEGER,
+            longest_streak INTEGER,
+            end_timestamp INTEGER,
+            hour_index INTEGER,
+            day_index INTEGER,
+            week_index INTEGER,
+            month_index INTEGER,
+            year_index INTEGER
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO habits_log_with_key
+        SELECT rowid, name, current_streak, longest_streak, end_timestamp,
+               hour_index, day_index, week_index, month_index, year_index
+        FROM habits_log
+    ''')
+    cursor.execute("DROP TABLE habits_log")
+    cursor.execute("ALTER TABLE habits_log_with_key RENAME TO habits_log")
+    cursor.execute('''
+        CREATE INDEX habits_log_by_name_and_end
+        ON habits_log (name, end_timestamp, current_streak, longest_streak)
+    ''')
+    cursor.execute("CREATE INDEX habits_by_state ON habits (state)")
+    cursor.execute("CREATE INDEX habits_by_periodicity ON habits (periodicity)")
+
+def add_streak_leaderboard_indexes(cursor: sqlite3.Cursor) -> None:
+    """
+    Version 3. Adds the streak leaderboard: indexes that keep habits ordered by their longest and current streaks
+    (the highest streak first, ties by name). SQLite keeps them in sync with every write, so the longest streak
+    is found with a single index seek and the top K habits are the first K index entries.
+
+    Parameters:
+        cursor: sqlite3.Cursor
+            Cursor of the database to be upgraded."""
+    cursor.execute("CREATE INDEX habits_by_longest_streak ON habits (longest_streak DESC, name)")
+    cursor.execute("CREATE INDEX habits_by_current_streak ON habits (current_streak DESC, name)")
+
+def fill_completion_rollups(cursor: sqlite3.Cursor, log_query: str = "habits_log") -> None:
+    """
+    Counts check-offs of the habits_log table into the empty rollup tables. Used by add_completion_rollups
+    and Database.rebuild_rollups.
+
+    Parameters:
+        cursor: sqlite3.Cursor
+            Cursor of the database.
+        log_query: str, optional
+            Table or subquery (in parentheses) with log rows to be counted. Defaults to 'habits_log'."""
+    for periodicity, column in ROLLUP_COLUMNS.items():
+        cursor.execute(f'''
+            INSERT INTO habit_rollups
+            SELECT name, ?, {column}, COUNT(*) FROM {log_query}
+            WHERE end_timestamp IS NOT NULL GROUP BY name, {column}
+        ''', (periodicity,))
+        cursor.execute('''
+            INSERT INTO global_rollups
+            SELECT periodicity, period_index, SUM(completions) FROM habit_rollups
+            WHERE periodicity = ? GROUP BY period_index
+        ''', (periodicity,))
+
+def add_completion_rollups(cursor: sqlite3.Cursor) -> None:
+    """
+    Version 4. Adds rollups: numbers of check-offs of every habit (habit_rollups) and of all habits together
+    (global_rollups) per day, ISO week, month and year, filled from the existing history. Database keeps them
+    up to date with every check-off, so counts over long periods read a few rollup rows instead of the whole log.
+
+    Parameters:
+        cursor: sqlite3.Cursor
+            Cursor of the database to be upgraded."""
+    cursor.execute('''
+        CREATE TABLE habit_rollups (
+            name TEXT,
+            periodicity TEXT,
+            period_index INTEGER,
+            completions INTEGER,
+            PRIMARY KEY (name, periodicity, period_index)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE global_rollups (
+            periodicity TEXT,
+            period_index INTEGER,
+            completions INTEGER,
+            PRIMARY KEY (periodicity, period_index)
+        ) WITHOUT ROWID
+    ''')
+    fill_completion_rollups(cursor)
+
+
+
+def return_habit_schedule(periodicity: str, state: str, start_timestamp: int, end_timestamp: int) -> tuple:
+    """
+    Returns (next_due, breaks_at) of a habit: the moment from which the habit needs a check-off again,
+    i.e., the beginning of the period after its last check-off (or its creation if it has never been checked off),
+    and the deadline of its last check-off (see PeriodIndex.return_deadline). Both are None unless the habit
+    is in progress, and breaks_at is None if the habit has never been checked off.
+
+    Parameters:
+        periodicity: str
+            Periodicity of the habit.
+        state: str
+            State of the habit.
+        start_timestamp: int
+            Timestamp of the creation of the habit.
+        end_timestamp: int
+            Timestamp of the last check-off or None."""
+    if state != "In progress":
+        return (None, None)
+    if end_timestamp is None:
+        return (start_timestamp, None)
+    return (return_next_period_start(end_timestamp, periodicity), return_deadline(end_timestamp, periodicity))
+
+def update_habit_schedules(cursor: sqlite3.Cursor, habit_names: list = None) -> None:
+    """
+    Recomputes next_due and breaks_at of habits from their other columns. Used by add_habit_schedule
+    and by writes that change habits without knowing all their columns.
+
+    Parameters:
+        cursor: sqlite3.Cursor
+            Cursor of the database.
+        habit_names: list, optional
+            Names of habits to be updated. Defaults to all habits."""
+    query = "SELECT name, periodicity, state, start_timestamp, end_timestamp FROM habits"
+    if habit_names is None:
+        rows = cursor.execute(query).fetchall()
+    else:
+        rows = [row for name in habit_names for row in cursor.execute(query + " WHERE name = ?", (name,))]
+    cursor.executemany("UPDATE habits SET next_due = ?, breaks_at = ? WHERE name = ?",
+                       [(*return_habit_schedule(*row[1:]), row[0]) for row in rows])
+
+def add_habit_schedule(cursor: sqlite3.Cursor) -> None:
+    """
+    Version 5. Adds the schedule of habits: next_due (when a habit needs a check-off again) and breaks_at
+    (when its streak is lost, see return_habit_schedule), each with an index. Database keeps both up to date
+    with every write, so due, overdue and at-risk habits are read as a range of an index in time order
+    instead of checking every habit.
+
+    Parameters:
+        cursor: sqlite3.Cursor
+            Cursor of the database to be upgraded."""
+    cursor.execute("ALTER TABLE habits ADD COLUMN next_due INTEGER")
+    cursor.execute("ALTER TABLE habits ADD COLUMN breaks_at INTEGER")
+    update_habit_schedules(cursor)
+    cursor.execute("CREATE INDEX habits_by_next_due ON habits (next_due, name)")
+    cursor.execute("CREATE INDEX habits_by_breaks_at ON habits (breaks_at, name)")
+
+def add_log_id_autoincrement(cursor: sqlite3.Cursor) -> None:
+    """
+    Version 6. Makes log ids of habits_log AUTOINCREMENT. Otherwise SQLite gives a new row the largest log id
+    in the table plus one, so once the rows with the largest ids are deleted, new rows could get the ids of rows
+    moved to the archive (see LogArchive.py). The largest id ever given is kept in sqlite_sequence instead.
+
+    Parameters:
+        cursor: sqlite3.Cursor
+            Cursor of the database to be upgraded."""
+    cursor.execute('''
+        CREATE TABLE habits_log_with_sequence (
+            log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            current_streak INTEGER,
+            longest_streak INTEGER,
+            end_timestamp INTEGER,
+            hour_index INTEGER,
+            day_index INTEGER,
+            week_index INTEGER,
+            month_index INTEGER,
+            year_index INTEGER
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO habits_log_with_sequence
+        SELECT log_id, name, current_streak, longest_streak, end_timestamp,
+               hour_index, day_index, week_index, month_index, year_index
+        FROM habits_log
+    ''')
+    cursor.execute("DROP TABLE habits_log")
+    cursor.execute("ALTER TABLE habits_log_with_sequence RENAME TO habits_log")
+    cursor.execute('''
+        CREATE INDEX habits_log_by_name_and_end
+        ON habits_log (name, end_timestamp, current_streak, longest_streak)
+    ''')
+
+
+
+# Migration number i (counting from 1) upgrades the database from version i - 1 to version i
+MIGRATIONS = [
+    create_tables_with_integer_timestamps,
+    add_habits_log_primary_key_and_indexes,
+    add_streak_leaderboard_indexes,
+    add_completion_rollups,
+    add_habit_schedule,
+    add_log_id_autoincrement
+]
+
+
+
+def return_schema_version(database: sqlite3.Connection) -> int:
+    """
+    Returns the schema version of the database. Databases that have never been migrated have version 0.
+
+    Parameters:
+        database: sqlite3.Connection
+            Database whose version to be returned."""
+    return database.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate_database(database: sqlite3.Connection) -> None:
+    """
+    Upgrades the database to the latest schema version. Does nothing if the database is up to date.
+
+    Parameters:
+        database: sqlite3.Connection
+            Database to be upgraded."""
+    if return_schema_version(database) > len(MIGRATIONS):
+        raise sqlite3.DatabaseError("The database has been created by a newer version of the application.")
+
+    database.commit()
+    cursor = database.cursor()
+    while return_schema_version(database) < len(MIGRATIONS):
+        # The immediate transaction takes the write lock, so the version is checked again
+        # in case another process has just upgraded the database.
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            version = return_schema_version(database)
+            if version < len(MIGRATIONS):
+                MIGRATIONS[version](cursor)
+                cursor.execute(f"PRAGMA user_version = {version + 1}")
+            database.commit()
+        except Exception:
+            database.rollback()
+            raise
+    cursor.close()
@@ -0,0 +1,228 @@
+from PeriodIndex import return_deadline
+from Database import Database
+
+import threading
+import argparse
+import heapq
+import json
+
+"""
+This module resets streaks of habits as soon as they are broken. Habit.check_time_excess only notices a break
+when the habit is checked off again, so the current streak of an abandoned habit stays in the habits table
+(and in every analysis query) forever. The scheduler keeps the deadline of every habit in progress
+(the first moment its streak is lost, see PeriodIndex.return_deadline) in a min-heap and, once deadlines pass,
+resets streaks of exactly those habits in batched transactions, without scanning the other habits.
+
+Changes of habits (check-offs, updates of the periodicity) are reported by the database after every commit,
+so only changed habits are read again. Entries of the heap that are out of date are skipped by the reset itself,
+which only changes a habit whose periodicity and last check-off are still the ones the deadline was computed for.
+
+The scheduler runs in a thread of the interactive application or as a periodic job, e.g., from cron.
+
+Example:
+    python DeadlineScheduler.py --database AppDatabase.db
+    python DeadlineScheduler.py --database AppDatabase.db --watch"""
+
+
+
+# Habits whose streak can be broken: in progress, with a streak and a check-off
+SELECT_SCHEDULED_HABITS = """SELECT name, periodicity, end_timestamp FROM habits
+                             WHERE state = 'In progress' AND current_streak > 0 AND end_timestamp IS NOT NULL"""
+
+RESET_CURRENT_STREAK = """UPDATE habits SET current_streak = 0
+                          WHERE name = ? AND periodicity = ? AND end_timestamp = ?
+                          AND state = 'In progress' AND current_streak > 0"""
+
+
+
+class DeadlineScheduler:
+    """
+    A class to represent the scheduler of streak resets of a database.
+
+    Attributes:
+        database: Database
+            Database whose habits are scheduled.
+        habits_per_transaction: int
+            The maximal number of habits reset in a transaction.
+        on_reset: callable
+            Function called by the thread of the scheduler with the names of reset habits, e.g., to discard them
+            from a HabitContainer. None if not needed.
+        poll_interval: float
+            The maximal number of seconds the thread sleeps, so changes of the system clock are noticed.
+        deadlines: list
+            Min-heap of (deadline, name, periodicity, end timestamp) of habits in progress.
+        changed_habits: set
+            Names of habits changed since they were scheduled, None if all habits have to be scheduled again.
+        lock: threading.Lock
+            Protects the heap and changed habits, which are changed by commits of any thread.
+        thread: threading.Thread
+            Thread of the scheduler, None if it isn't started.
+        stopped: threading.Event
+            Set to stop the thread.
+        woken: threading.Event
+            Set to wake the thread up before its timeout, e.g., when habits change."""
+    def __init__(self, database: Database, habits_per_transaction: int = 1000, on_reset=None,
+                 poll_interval: float = 60) -> None:
+        """
+        Parameters:
+            database: Database
+                Database whose habits are scheduled.
+            habits_per_transaction: int, optional
+                The maximal number of habits reset in a transaction. Defaults to 1000.
+            on_reset: callable, optional
+                Function called by the thread of the scheduler with the names of reset habits. Defaults to None.
+            poll_interval: float, optional
+                The maximal number of seconds the thread sleeps. Defaults to 60."""
+        self.database = database
+        self.habits_per_transaction = habits_per_transaction
+        self.on_reset = on_reset
+        self.poll_interval = poll_interval
+        self.deadlines = []
+        self.changed_habits = None
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stopped = threading.Event()
+        self.woken = threading.Event()
+        database.add_write_listener(self.track_changes)
+
+    def track_changes(self, habit_names: list, tables: tuple) -> None:
+        """
+        Write listener of the database: remembers the habits to be scheduled again.
+
+        Parameters:
+            habit_names: list
+                Names of changed habits, None for all habits.
+            tables: tuple
+                Changed tables."""
+        if "habits" not in tables:
+            return
+        with self.lock:
+            if habit_names is None:
+                self.changed_habits = None
+            elif self.changed_habits is not None:
+                self.changed_habits.update(habit_names)
+        self.woken.set()
+
+    def schedule_changed_habits(self) -> None:
+        """
+        Adds deadlines of changed habits to the heap, or fills the heap from all habits if it is the first call
+        or all habits have changed.
+
+        No parameters."""
+        with self.lock:
+            changed_habits, self.changed_habits = self.changed_habits, set()
+        # The lock isn't held while reading: listeners are called under the lock of the database
+        with self.database.lock:
+            if changed_habits is None:
+                rows = self.database.database.execute(SELECT_SCHEDULED_HABITS).fetchall()
+            else:
+                rows = [row for name in changed_habits for row in self.database.database.execute(
+                    SELECT_SCHEDULED_HABITS + " AND name = ?", (name,))]
+        entries = [(return_deadline(end_timestamp, periodicity), name, periodicity, end_timestamp)
+                   for name, periodicity, end_timestamp in rows]
+        with self.lock:
+            if changed_habits is None:
+                self.deadlines = entries
+                heapq.heapify(self.deadlines)
+            else:
+                for entry in entries:
+                    heapq.heappush(self.deadlines, entry)
+
+    def return_next_deadline(self) -> int:
+        """
+        Returns the timestamp of the earliest deadline or None if no habit can be broken.
+
+        No parameters."""
+        self.schedule_changed_habits()
+        with self.lock:
+            return self.deadlines[0][0] if self.deadlines else None
+
+    def reset_broken_streaks(self, now: int = None) -> list:
+        """
+        Resets current streaks of habits whose deadline has passed and returns the names of reset habits.
+
+        Parameters:
+            now: int, optional
+                Timestamp of the current moment. Defaults to the time of the clock of the database."""
+        if now is None:
+            now = self.database.clock.return_current_timestamp()
+        due = []
+        self.schedule_changed_habits()
+        with self.lock:
+            while self.deadlines and self.deadlines[0][0] <= now:
+                due.append(heapq.heappop(self.deadlines)[1:])
+
+        reset = []
+        for start in range(0, len(due), self.habits_per_transaction):
+            group = due[start:start + self.habits_per_transaction]
+            with self.database.write_transaction([name for name, _, _ in group], ("habits",)) as cursor:
+                for entry in group:
+                    if cursor.execute(RESET_CURRENT_STREAK, entry).rowcount > 0:
+                        reset.append(entry[0])
+        return reset
+
+
+
+    # Thread of the scheduler
+    def start(self) -> None:
+        """
+        Starts a thread that resets streaks whenever deadlines pass.
+
+        No parameters."""
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the thread of the scheduler and waits for it.
+
+        No parameters."""
+        self.stopped.set()
+        self.woken.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self) -> None:
+        """
+        Resets broken streaks and sleeps until the next deadline, a change of habits or the poll interval,
+        whichever comes first, until the scheduler is stopped.
+
+        No parameters."""
+        while not self.stopped.is_set():
+            reset = self.reset_broken_streaks()
+            if reset and self.on_reset is not None:
+                self.on_reset(reset)
+            next_deadline = self.return_next_deadline()
+            timeout = self.poll_interval
+            if next_deadline is not None:
+                now = self.database.clock.return_current_timestamp()
+                timeout = min(max(next_deadline - now, 0), timeout)
+            self.woken.wait(timeout)
+            self.woken.clear()
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resets streaks of broken habits of the Habit tracker.")
+    parser.add_argument("--database", default="AppDatabase.db", help="database of the application")
+    parser.add_argument("--habits-per-transaction", type=int, default=1000,
+                        help="the maximal number of habits reset in a transaction")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and reset streaks whenever deadlines pass (stop with Ctrl+C)")
+    args = parser.parse_args()
+
+    database = Database(args.database)
+    scheduler = DeadlineScheduler(database, args.habits_per_transaction,
+                                  on_reset=lambda names: print(json.dumps({"reset": names}), flush=True))
+    if args.watch:
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            pass
+    else:
+        reset = scheduler.reset_broken_streaks()
+        next_deadline = scheduler.return_next_deadline()
+        print(json.dumps({"reset": reset, "next_deadline": next_deadline}))
+    database.disconnect_database()
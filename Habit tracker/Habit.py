@@ -1,21 +1,41 @@
+from Clock import SystemClock, SYSTEM_CLOCK
+from PeriodIndex import is_time_exceeded
+
 from datetime import datetime
-from dateutil.relativedelta import relativedelta 
+from array import array
 
 
 
 # Returns current date and time
-def return_current_date_and_time() -> list:
+def return_current_datetime() -> datetime:
     """
-    Returns current date and time. Used to track the start and end points of a habit. 
+    Returns current date and time of the system clock as a datetime object.
 
     No parameters."""
-    now = datetime.now()
+    return SYSTEM_CLOCK.return_current_datetime()
+
+def return_current_date_and_time(now: datetime = None) -> list:
+    """
+    Returns current date and time. Used to track the start and end points of a habit. 
+
+    Parameters:
+        now: datetime, optional
+            Moment to be formatted. Defaults to the current date and time."""
+    if now is None:
+        now = return_current_datetime()
     current_time = now.strftime("%H:%M:%S")
     current_date = now.strftime("%Y-%m-%d")
     return [current_time, current_date]
 
 
 
+# Attributes of a habit in the order of Habit.__init__ parameters and database rows
+HABIT_ATTRIBUTES = ("name", "periodicity", "time_span", "state", "current_streak", "longest_streak",
+                    "start_time", "start_date", "end_time", "end_date")
+INTEGER_ATTRIBUTES = ("time_span", "current_streak", "longest_streak")
+
+
+
 class Habit:
     """
     A class to represent a habit.
@@ -44,12 +64,22 @@ class Habit:
             Stores the time of finishing, i.e., when habit is completed.
         end_time: str
             Stores the date of finishing, i.e., when habit is completed."""
+    name: str
+    periodicity: str
+    time_span: int
+    state: str
+    current_streak: int
+    longest_streak: int
+    start_time: str
+    start_date: str
+    end_time: str
+    end_date: str
 
     def __init__ (self, name: str, periodicity: str, 
                   time_span: int, state: str = "In progress",
                   current_streak: int = 0, longest_streak: int = 0,
                   start_time: str = None, start_date: str = None,
-                  end_time: str = None, end_date: str = None) -> None:
+                  end_time: str = None, end_date: str = None, clock: SystemClock = None) -> None:
         """
         Parameters:
             name: str
@@ -75,6 +105,8 @@ class Habit:
                 Stores the time of finishing, i.e., when habit is completed.
             end_time: str, optimal
                 Stores the date of finishing, i.e., when habit is completed.
+            clock: SystemClock, optional
+                Clock that tells the time of creation. Defaults to the system clock.
                 """     
         # Primary habit information to create it  
         self.name = name
@@ -86,13 +118,30 @@ class Habit:
         self.current_streak = current_streak
         self.longest_streak = longest_streak
         if start_time == None and start_date == None:
-            self.start_time, self.start_date = return_current_date_and_time()
+            now = None if clock is None else clock.return_current_datetime()
+            self.start_time, self.start_date = return_current_date_and_time(now)
         else:
             self.start_time, self.start_date = start_time, start_date
         self.end_time, self.end_date = end_time, end_date
 
 
 
+    @classmethod
+    def from_row(cls, row: tuple) -> "Habit":
+        """
+        Creates a habit from a database row in the order of HABIT_ATTRIBUTES without checks
+        of the constructor. Rows returned by DatabaseAnalyzer already contain all attributes.
+
+        Parameters:
+            row: tuple
+                Values of all habit attributes."""
+        habit = object.__new__(cls)
+        (habit.name, habit.periodicity, habit.time_span, habit.state, habit.current_streak, habit.longest_streak,
+         habit.start_time, habit.start_date, habit.end_time, habit.end_date) = row
+        return habit
+
+
+
     def update_habit_characteristic(self, characteristic_name: str, new_value) -> None:
         """
         Updates a habit characteristic.
@@ -109,20 +158,23 @@ class Habit:
 
 
 
-    def check_off_habit(self) -> None:
+    def check_off_habit(self, clock: SystemClock = None) -> None:
         """
         Updates streaks of a habit.
         
-        No parameters."""
+        Parameters:
+            clock: SystemClock, optional
+                Clock that tells the time of the check-off. Defaults to the system clock."""
+        current_datetime = return_current_datetime() if clock is None else clock.return_current_datetime()
         if self.end_time is not None and self.end_date is not None:
-            self.check_time_excess()
+            self.check_time_excess(current_datetime)
 
         self.current_streak += 1
         if self.current_streak>self.longest_streak:
             self.longest_streak = self.current_streak
-        self.end_time, self.end_date = return_current_date_and_time() 
+        self.end_time, self.end_date = return_current_date_and_time(current_datetime) 
 
-    def check_time_excess(self) -> None:
+    def check_time_excess(self, current_datetime: datetime = None) -> None:
         """
         Checks whether the user exceeded time to complete a habit within a specific period.
         Habit is broken if the time difference between current time and the time of the last check
@@ -130,32 +182,13 @@ class Habit:
         E.g.: Periodicity is \'Week\'. Assume the user start the habit \'this\' week. If the user don't check it off
         until the end of the \'next\' week, the habit's currenet streak would be reset.
 
-        No parameters."""
-        current_time, current_date = return_current_date_and_time()
-        current_time = datetime.strptime(current_time, '%H:%M:%S').time()
-        current_date = datetime.strptime(current_date, '%Y-%m-%d')
-        current_datetime = datetime.combine(current_date, current_time)
-
-        end_time = datetime.strptime(self.end_time, '%H:%M:%S').time()
-        end_date = datetime.strptime(self.end_date, '%Y-%m-%d')
-        end_datetime = datetime.combine(end_date, end_time)
-
-        time_difference = [current_datetime.hour - end_datetime.hour,
-                           current_datetime.day - end_datetime.day,
-                           current_datetime.isocalendar().week - end_datetime.isocalendar().week,
-                           current_datetime.month - end_datetime.month,
-                           current_datetime.year - end_datetime.year]     
-        time_excess = False
-        range_codes = {
-            "Hour": 5,
-            "Day": 4,
-            "Week": 3,
-            "Month": 2,
-            "Year": 1
-        }
-        for i in range(range_codes[self.periodicity]):
-            if abs(time_difference[-i-1])>1:
-                time_excess = True
+        Parameters:
+            current_datetime: datetime, optional
+                Moment of the new check-off. Defaults to the current date and time."""
+        if current_datetime is None:
+            current_datetime = return_current_datetime()
+        end_datetime = datetime.fromisoformat(f"{self.end_date} {self.end_time}")
+        time_excess = is_time_exceeded(end_datetime, current_datetime, self.periodicity)
 
         if time_excess:
             self.current_streak = 0
@@ -173,3 +206,45 @@ class Habit:
             return True
         else:
             return False
+
+
+
+class HabitTable:
+    """
+    A class to represent many habits column by column (struct of arrays). Used instead of a list of Habit objects
+    where many habits are only read, e.g., to display them: it doesn't create an object per habit, and numeric
+    columns are stored as compact arrays of integers.
+
+    Attributes:
+        columns: dict[str, Sequence]
+            Values of every attribute from HABIT_ATTRIBUTES, one column per attribute."""
+    def __init__(self, rows: list) -> None:
+        """
+        Parameters:
+            rows: list
+                Habits as rows in the order of HABIT_ATTRIBUTES, e.g., returned by DatabaseAnalyzer."""
+        columns = list(zip(*rows)) if rows else [()] * len(HABIT_ATTRIBUTES)
+        self.columns = {}
+        for attribute, column in zip(HABIT_ATTRIBUTES, columns):
+            self.columns[attribute] = array("q", column) if attribute in INTEGER_ATTRIBUTES else column
+
+    def __len__(self) -> int:
+        return len(self.columns["name"])
+
+    def return_rows(self, attributes: list) -> list:
+        """
+        Returns rows that contain only the given attributes of every habit.
+
+        Parameters:
+            attributes: list
+                Names of attributes to be returned, e.g., ['name', 'state']."""
+        return list(zip(*(self.columns[attribute] for attribute in attributes)))
+
+    def return_habit(self, index: int) -> Habit:
+        """
+        Returns a Habit object for the habit with the given index.
+
+        Parameters:
+            index: int
+                Index of the habit in the table."""
+        return Habit.from_row(tuple(self.columns[attribute][index] for attribute in HABIT_ATTRIBUTES))
@@ -0,0 +1,262 @@
+from StreakEngine import compute_streaks_of_many, return_period_indices_of_many
+from DatabaseAnalyzer import DatabaseAnalyzer
+from Clock import SYSTEM_CLOCK
+
+import numpy as np
+
+"""
+This module computes trends of habits from their whole check-off history: completion rates per period,
+calendar heatmaps of check-offs, histograms of streak lengths and the time streaks survive before they break.
+The history is read as columns (one array of timestamps for all check-offs) and every analytic is a handful
+of NumPy array operations, so a million check-offs are analyzed in a fraction of a second.
+
+Example:
+    columns = return_check_off_columns(analyzer)
+    rates = compute_completion_rates(columns, "Month")
+    heatmaps = compute_heatmaps(columns)"""
+
+
+
+# Column of return_period_indices_of_many (and index into PERIODICITIES) for every periodicity
+PERIODICITIES = ["Hour", "Day", "Week", "Month", "Year"]
+
+# Periodicities that can group periods of habits into buckets of completion rates
+BUCKETS = ["Day", "Week", "Month", "Year"]
+
+# The shortest streak length of every range of the binned streak histogram
+STREAK_LENGTH_EDGES = (1, 2, 3, 4, 5, 7, 10, 15, 20, 30, 50, 100, 200, 500, 1000)
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+
+def return_check_off_columns(analyzer: DatabaseAnalyzer, habit_names: list = None) -> dict:
+    """
+    Reads the check-off history as columns. Returns a dictionary with per habit \'names\', \'periodicities\'
+    and arrays \'time_spans\', \'start_timestamps\', \'columns\' (column of return_period_indices_of_many that
+    matches the periodicity), per check-off arrays \'habit_indices\' and \'timestamps\', ordered by habit and time,
+    and \'read_timestamp\', the time of the clock of the analyzer when the history was read.
+
+    Parameters:
+        analyzer: DatabaseAnalyzer
+            Analyzer of the database.
+        habit_names: list, optional
+            Names of habits to be analyzed. Defaults to all habits."""
+    rows = analyzer.return_check_off_columns(habit_names)
+    names, periodicities, time_spans, start_timestamps, counts, timestamps = zip(*rows) if rows else ([],) * 6
+    counts = np.array(counts, dtype=np.int64)
+    text = ",".join(timestamps for timestamps in timestamps if timestamps is not None)
+    timestamps = np.fromstring(text, dtype=np.int64, sep=",") if text else np.zeros(0, dtype=np.int64)
+    habit_indices = np.repeat(np.arange(len(rows)), counts)
+    # The database returns check-offs in the order of time, but nothing guarantees it
+    if np.any((np.diff(timestamps) < 0) & (np.diff(habit_indices) == 0)):
+        order = np.lexsort((timestamps, habit_indices))
+        timestamps = timestamps[order]
+    return {
+        "names": list(names),
+        "periodicities": list(periodicities),
+        "time_spans": np.array(time_spans, dtype=np.int64),
+        # Habits imported without a start are counted from their first check-off or from now (see compute_completion_rates)
+        "start_timestamps": np.array([np.iinfo(np.int64).max // 2 if timestamp is None else timestamp
+                                      for timestamp in start_timestamps], dtype=np.int64),
+        "columns": np.array([PERIODICITIES.index(periodicity) for periodicity in periodicities], dtype=np.int64),
+        "habit_indices": habit_indices,
+        "timestamps": timestamps,
+        "read_timestamp": analyzer.clock.return_current_timestamp()
+    }
+
+def return_bucket_starts(first_timestamp: int, last_timestamp: int, bucket: str) -> np.ndarray:
+    """
+    Returns timestamps of the beginnings of consecutive buckets (days, weeks, months or years) from the bucket
+    that contains the first timestamp to the one after the bucket that contains the last timestamp.
+
+    Parameters:
+        first_timestamp: int
+            Timestamp in the first bucket.
+        last_timestamp: int
+            Timestamp in the last bucket.
+        bucket: str
+            \'Day\', \'Week\', \'Month\' or \'Year\'."""
+    if bucket == "Day" or bucket == "Week":
+        first_day, last_day = first_timestamp // 86400, last_timestamp // 86400
+        if bucket == "Week":
+            # Weeks start on Monday, and 1970-01-01 was a Thursday
+            first_day, last_day = first_day - (first_day + 3) % 7, last_day - (last_day + 3) % 7
+        days = np.arange(first_day, last_day + 8 if bucket == "Week" else last_day + 2, 7 if bucket == "Week" else 1)
+        return days * 86400
+    unit = "M" if bucket == "Month" else "Y"
+    first, last = (np.array([first_timestamp, last_timestamp]).astype("datetime64[s]").astype(f"datetime64[{unit}]"))
+    return np.arange(first, last + 2).astype("datetime64[s]").astype(np.int64)
+
+def return_period_starts(period_indices: np.ndarray, columns: np.ndarray) -> np.ndarray:
+    """
+    Returns timestamps of the beginnings of periods.
+
+    Parameters:
+        period_indices: np.ndarray
+            Indices of periods (see PeriodIndex.return_period_indices).
+        columns: np.ndarray
+            Periodicity of every period as the column of return_period_indices_of_many."""
+    period_indices = np.asarray(period_indices, dtype=np.int64)
+    months = period_indices.astype("datetime64[M]").astype("datetime64[s]").astype(np.int64)
+    years = (period_indices - 1970).astype("datetime64[Y]").astype("datetime64[s]").astype(np.int64)
+    return np.choose(columns, [period_indices * 3600, period_indices * 86400, (period_indices * 7 - 3) * 86400,
+                               months, years])
+
+
+
+def compute_completion_rates(columns: dict, bucket: str = "Month", now: int = None) -> dict:
+    """
+    Computes the share of periods in which every habit has been checked off, overall and in every bucket
+    (e.g., every month). A habit is counted from the period it was created in up to the current period.
+    Periods belong to the bucket they begin in, so rates are only computed for habits whose periodicity isn\'t
+    coarser than the bucket, and other rates are NaN.
+
+    Returns a dictionary with \'bucket_starts\' (timestamps), per habit \'overall\' rates and \'checked\'
+    (number of checked off periods), and \'rates\' with the shape (habits, buckets).
+
+    Parameters:
+        columns: dict
+            Columns returned by return_check_off_columns.
+        bucket: str, optional
+            \'Day\', \'Week\', \'Month\' or \'Year\'. Defaults to \'Month\'.
+        now: int, optional
+            Timestamp of the current moment. Defaults to the time the history was read at (see return_check_off_columns)
+            or, for columns without it, to the time of the system clock."""
+    if bucket not in BUCKETS:
+        raise ValueError(f"Bucket must be one of {', '.join(BUCKETS)}.")
+    if now is None:
+        now = columns.get("read_timestamp", SYSTEM_CLOCK.return_current_timestamp())
+    habits_amount = len(columns["names"])
+    habit_indices, timestamps, habit_columns = columns["habit_indices"], columns["timestamps"], columns["columns"]
+    if habits_amount == 0:
+        return {"bucket_starts": np.zeros(0, dtype=np.int64), "overall": np.zeros(0),
+                "checked": np.zeros(0, dtype=np.int64), "rates": np.zeros((0, 0))}
+
+    # Check-offs of a habit are ordered by time, so repeated periods are adjacent
+    periods = return_period_indices_of_many(timestamps)[np.arange(len(timestamps)), habit_columns[habit_indices]]
+    distinct = np.concatenate(([True], (np.diff(periods) != 0) | (np.diff(habit_indices) != 0)))[:len(periods)]
+    checked_habits, checked_periods = habit_indices[distinct], periods[distinct]
+    habits = np.arange(habits_amount)
+    first_periods = return_period_indices_of_many(np.minimum(columns["start_timestamps"], now))[habits, habit_columns]
+    last_periods = return_period_indices_of_many([now])[0][habit_columns]
+    # Check-offs before the creation of a habit (e.g., imported history) extend its tracked periods
+    np.minimum.at(first_periods, checked_habits, checked_periods)
+    np.maximum.at(last_periods, checked_habits, checked_periods)
+    checked = np.bincount(checked_habits, minlength=habits_amount)
+    overall = checked / (last_periods - first_periods + 1)
+
+    # Only habits whose periodicity isn't coarser than the bucket have rates per bucket
+    eligible = np.flatnonzero(habit_columns <= PERIODICITIES.index(bucket))
+    eligible_columns = habit_columns[eligible]
+    first_timestamp = min(int(return_period_starts(first_periods[eligible], eligible_columns).min(initial=now)), now)
+    last_timestamp = max(int(return_period_starts(last_periods[eligible], eligible_columns).max(initial=now)), now)
+    bucket_starts = return_bucket_starts(first_timestamp, last_timestamp, bucket)
+    buckets_amount = len(bucket_starts) - 1
+    # Periods that begin in a bucket are those after the period containing the second before the bucket start
+    # up to the period containing the last second of the bucket
+    boundaries = return_period_indices_of_many(bucket_starts - 1)[:, eligible_columns].T
+    first_in_bucket = np.maximum(boundaries[:, :-1] + 1, first_periods[eligible, None])
+    last_in_bucket = np.minimum(boundaries[:, 1:], last_periods[eligible, None])
+    totals = np.maximum(last_in_bucket - first_in_bucket + 1, 0)
+
+    positions = np.full(habits_amount, -1)
+    positions[eligible] = np.arange(len(eligible))
+    counted = positions[checked_habits] >= 0
+    bucket_indices = np.searchsorted(bucket_starts, return_period_starts(checked_periods[counted],
+                                     habit_columns[checked_habits[counted]]), side="right") - 1
+    counts = np.bincount(positions[checked_habits[counted]] * buckets_amount + bucket_indices,
+                         minlength=len(eligible) * buckets_amount).reshape(len(eligible), buckets_amount)
+    rates = np.full((habits_amount, buckets_amount), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rates[eligible] = np.where(totals > 0, counts / totals, np.nan)
+    return {"bucket_starts": bucket_starts[:-1], "overall": overall, "checked": checked, "rates": rates}
+
+def compute_heatmaps(columns: dict) -> dict:
+    """
+    Counts check-offs by hour of the day, day of the week and month of the year. Returns a dictionary with
+    arrays \'hour\' (24 values), \'weekday\' (7 values, Monday first), \'month\' (12 values, January first)
+    and \'weekday_hour\' with the shape (7, 24).
+
+    Parameters:
+        columns: dict
+            Columns returned by return_check_off_columns."""
+    timestamps = columns["timestamps"]
+    hours = timestamps % 86400 // 3600
+    # 1970-01-01 was a Thursday, so the weekday of a day number d is (d + 3) % 7 with Monday = 0
+    weekdays = (timestamps // 86400 + 3) % 7
+    months = timestamps.astype("datetime64[s]").astype("datetime64[M]").astype(np.int64) % 12
+    weekday_hour = np.bincount(weekdays * 24 + hours, minlength=7 * 24).reshape(7, 24)
+    return {
+        "hour": weekday_hour.sum(axis=0),
+        "weekday": weekday_hour.sum(axis=1),
+        "month": np.bincount(months, minlength=12),
+        "weekday_hour": weekday_hour
+    }
+
+def compute_streak_lengths(columns: dict) -> dict:
+    """
+    Recomputes streaks from the history (see StreakEngine.py) and returns a dictionary with arrays
+    of every streak: \'lengths\', \'durations\' (seconds from its first to its last check-off),
+    \'broken\' (True if a later check-off has reset it, False for current streaks) and \'habit_indices\'.
+
+    Parameters:
+        columns: dict
+            Columns returned by return_check_off_columns."""
+    habit_indices, timestamps = columns["habit_indices"], columns["timestamps"]
+    summary = compute_streaks_of_many(habit_indices, timestamps.astype("datetime64[s]"),
+                                      columns["periodicities"], columns["time_spans"])
+    new_habit = np.concatenate(([True], np.diff(habit_indices) != 0))[:len(habit_indices)]
+    starts = np.flatnonzero(new_habit | summary["break_points"])
+    ends = np.concatenate((starts[1:], [len(habit_indices)])) - 1
+    # A streak is broken if the check-off after its end resets the streak (rather than belongs to the next habit)
+    next_break_points = np.concatenate((summary["break_points"], [False]))[ends + 1]
+    return {
+        "lengths": summary["streaks"][ends],
+        "durations": timestamps[ends] - timestamps[starts],
+        "broken": next_break_points,
+        "habit_indices": habit_indices[starts]
+    }
+
+def compute_streak_histogram(streaks: dict) -> np.ndarray:
+    """
+    Returns the number of streaks of every length: the value at index n is the number of streaks of n check-offs.
+
+    Parameters:
+        streaks: dict
+            Streaks returned by compute_streak_lengths."""
+    return np.bincount(streaks["lengths"], minlength=1)
+
+def compute_time_to_break(streaks: dict, percentiles: tuple = (25, 50, 75, 90)) -> dict:
+    """
+    Returns the distribution of the number of days broken streaks lasted (from their first to their last check-off)
+    as a dictionary with \'days\' of every broken streak and their \'percentiles\' (NaN if no streak has broken).
+
+    Parameters:
+        streaks: dict
+            Streaks returned by compute_streak_lengths.
+        percentiles: tuple, optional
+            Percentiles of the distribution. Defaults to quartiles and the 90th percentile."""
+    days = streaks["durations"][streaks["broken"]] / 86400
+    values = np.percentile(days, percentiles) if len(days) > 0 else np.full(len(percentiles), np.nan)
+    return {"days": days, "percentiles": dict(zip(percentiles, values))}
+
+def bin_streak_histogram(histogram: np.ndarray, edges: tuple = STREAK_LENGTH_EDGES) -> list:
+    """
+    Groups the streak histogram into ranges of lengths. Returns a list of (range, number of streaks),
+    e.g., ('5-6', 12), without empty ranges after the longest streak.
+
+    Parameters:
+        histogram: np.ndarray
+            Histogram returned by compute_streak_histogram.
+        edges: tuple, optional
+            The shortest length of every range. Defaults to STREAK_LENGTH_EDGES."""
+    edges = [edge for edge in edges if edge < len(histogram)]
+    counts = np.add.reduceat(histogram, edges) if edges else []
+    bounds = [f"{edge}-{next_edge - 1}" if next_edge - 1 > edge else str(edge)
+              for edge, next_edge in zip(edges, edges[1:])]
+    if edges:
+        bounds.append(f"{edges[-1]}-{len(histogram) - 1}" if len(histogram) - 1 > edges[-1] else str(edges[-1]))
+    return [(bound, int(count)) for bound, count in zip(bounds, counts)]
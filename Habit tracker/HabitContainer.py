@@ -0,0 +1,90 @@
+from DatabaseAnalyzer import DatabaseAnalyzer
+from Habit import Habit
+
+from collections.abc import Mapping
+from collections import OrderedDict
+
+
+
+class HabitContainer(Mapping):
+    """
+    A class to represent a lazy mapping from habit names to habits stored in the database.
+    Habits are materialized from the database on demand, and only a bounded number of the most recently used
+    habits is kept in memory. Names are listed page by page without loading whole habits.
+
+    Since the container reads the database, it should only hold habits that are stored in it:
+    add a habit to the container after inserting it to the database, and discard it before deleting from the database.
+    Habits can't be deleted through the container, since a habit stays in it as long as it is stored in the database.
+
+    Attributes:
+        analyzer: DatabaseAnalyzer
+            Analyzer that retrieves habits from the database.
+        capacity: int
+            The maximal number of habits kept in memory.
+        page_size: int
+            Number of names read from the database at once while iterating.
+        cache: OrderedDict[str, Habit]
+            Habits kept in memory, from the least to the most recently used."""
+    def __init__(self, analyzer: DatabaseAnalyzer, capacity: int = 1024, page_size: int = 1000) -> None:
+        """
+        Parameters:
+            analyzer: DatabaseAnalyzer
+                Analyzer that retrieves habits from the database.
+            capacity: int, optional
+                The maximal number of habits kept in memory. Defaults to 1024.
+            page_size: int, optional
+                Number of names read from the database at once while iterating. Defaults to 1000."""
+        self.analyzer = analyzer
+        self.capacity = capacity
+        self.page_size = page_size
+        self.cache: OrderedDict[str, Habit] = OrderedDict()
+
+    def __getitem__(self, name: str) -> Habit:
+        if name in self.cache:
+            self.cache.move_to_end(name)
+            return self.cache[name]
+        row = self.analyzer.return_habit(name)
+        if row is None:
+            raise KeyError(name)
+        habit = Habit.from_row(row)
+        self.__setitem__(name, habit)
+        return habit
+
+    def __setitem__(self, name: str, habit: Habit) -> None:
+        self.cache[name] = habit
+        self.cache.move_to_end(name)
+        while len(self.cache) > self.capacity:
+            self.cache.popitem(last=False)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.cache or self.analyzer.return_habit(name) is not None
+
+    def __iter__(self):
+        # Keyset pagination: every page starts after the last habit of the previous one
+        last_row_id = 0
+        while True:
+            page = self.analyzer.return_habit_names(self.page_size, last_row_id)
+            for _, name in page:
+                yield name
+            if len(page) < self.page_size:
+                return
+            last_row_id = page[-1][0]
+
+    def __len__(self) -> int:
+        return self.analyzer.return_number_of_habits()
+
+    def discard(self, name: str) -> None:
+        """
+        Forgets a habit kept in memory if it is there. The habit stored in the database is not affected.
+
+        Parameters:
+            name: str
+                Name of the habit."""
+        self.cache.pop(name, None)
+
+    def clear(self) -> None:
+        """
+        Forgets all habits kept in memory. Habits stored in the database are not affected.
+
+        No parameters."""
+        self.cache.clear()
@@ -0,0 +1,208 @@
+from HabitService import HabitService
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl, unquote
+from sqlite3 import IntegrityError
+import argparse
+import json
+
+"""
+This module serves operations of the application as a JSON HTTP API on the local machine.
+It is a second entry point besides HabitTrackingApp.py: requests are handled in parallel threads
+by a shared HabitService.
+
+Routes:
+    GET    /habits                          names of habits (parameters of DatabaseAnalyzer.return_habit_names)
+    POST   /habits                          add a habit: {"name": ..., "periodicity": ..., "time_span": ...}
+    GET    /habits/<name>                   the whole information of a habit
+    PATCH  /habits/<name>                   update a habit: {"characteristic": ..., "value": ...}
+    DELETE /habits/<name>                   delete a habit
+    POST   /habits/<name>/check-off         check off a habit
+    GET    /habits/<name>/history           a page of the history (rows_amount, page_token, direction)
+    GET    /queries/<query>                 any DatabaseAnalyzer query, e.g., /queries/currently_tracked_habits,
+                                            with its parameters in the query string (lists separated by commas)
+
+Example:
+    python HabitServer.py --port 8000
+    curl -X POST localhost:8000/habits -d '{"name": "Read", "periodicity": "Day", "time_span": 30}'
+    curl -X POST localhost:8000/habits/Read/check-off"""
+
+
+
+class HabitRequestHandler(BaseHTTPRequestHandler):
+    """
+    A class to handle requests to the HTTP API. Connections are kept alive between requests."""
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, which Nagle's algorithm would delay on kept-alive connections
+    disable_nagle_algorithm = True
+
+    # Set by return_server
+    service: HabitService = None
+    quiet: bool = True
+
+    def do_GET(self) -> None:
+        self.handle_request("GET")
+
+    def do_POST(self) -> None:
+        self.handle_request("POST")
+
+    def do_PATCH(self) -> None:
+        self.handle_request("PATCH")
+
+    def do_DELETE(self) -> None:
+        self.handle_request("DELETE")
+
+    def handle_request(self, method: str) -> None:
+        """
+        Reads a request, runs the corresponding operation and sends its result or the error as JSON.
+
+        Parameters:
+            method: str
+                HTTP method of the request."""
+        try:
+            url = urlsplit(self.path)
+            path = [unquote(part) for part in url.path.strip("/").split("/")]
+            arguments = dict(parse_qsl(url.query))
+            body = self.read_body()
+            status, result = self.route(method, path, arguments, body)
+        except KeyError as error:
+            status, result = 404, {"error": f"Not found: {error.args[0] if error.args else self.path}"}
+        except IntegrityError:
+            status, result = 409, {"error": "The habit already exists."}
+        except ValueError as error:
+            status, result = 400, {"error": str(error)}
+        except Exception as error:
+            self.log_error("Error while handling %s %s: %r", method, self.path, error)
+            status, result = 500, {"error": "Internal server error."}
+        self.send_json(status, result)
+
+    def read_body(self) -> dict:
+        """
+        Returns the JSON object sent with the request or an empty dictionary if nothing has been sent.
+
+        No parameters."""
+        length = int(self.headers.get("Content-Length") or 0)
+        if length == 0:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except json.JSONDecodeError:
+            raise ValueError("The request body must be JSON.") from None
+        if not isinstance(body, dict):
+            raise ValueError("The request body must be a JSON object.")
+        return body
+
+    def route(self, method: str, path: list, arguments: dict, body: dict) -> tuple:
+        """
+        Runs the operation of a request and returns the HTTP status and the result.
+
+        Parameters:
+            method: str
+                HTTP method of the request.
+            path: list
+                Decoded parts of the request path.
+            arguments: dict
+                Parameters from the query string.
+            body: dict
+                JSON object sent with the request."""
+        service = self.service
+        if path[0] == "queries" and len(path) == 2 and method == "GET":
+            return 200, {"result": service.run_query(path[1], arguments)}
+        if path[0] != "habits":
+            raise KeyError(self.path)
+
+        if len(path) == 1:
+            if method == "GET":
+                return 200, {"result": service.run_query("habit_names", arguments)}
+            if method == "POST":
+                habit = service.add_habit(body.get("name"), body.get("periodicity"), body.get("time_span"))
+                return 201, vars(habit)
+        elif len(path) == 2:
+            name = path[1]
+            if method == "GET":
+                column_names, values = service.run_query("detailed_information_about_habit", {"habit_name": name})
+                if values is None:
+                    raise KeyError(name)
+                return 200, dict(zip(column_names, values))
+            if method == "PATCH":
+                return 200, vars(service.update_habit(name, body.get("characteristic"), body.get("value")))
+            if method == "DELETE":
+                service.delete_habit(name)
+                return 200, {"deleted": name}
+        elif len(path) == 3:
+            name = path[1]
+            if path[2] == "check-off" and method == "POST":
+                habit = service.check_off_habit(name)
+                return 200, dict(vars(habit), completed=habit.state == "Completed")
+            if path[2] == "history" and method == "GET":
+                history, next_token, previous_token = service.run_query(
+                    "habit_history_page", dict(arguments, habit_name=name))
+                return 200, {"history": history, "next_page_token": next_token,
+                             "previous_page_token": previous_token}
+        raise KeyError(self.path)
+
+    def send_json(self, status: int, result) -> None:
+        """
+        Sends a response with a JSON body.
+
+        Parameters:
+            status: int
+                HTTP status of the response.
+            result: any
+                Object to be sent."""
+        body = json.dumps(result).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_request(self, code="-", size="-") -> None:
+        # Errors are always logged, requests only on demand
+        if not self.quiet:
+            super().log_request(code, size)
+
+
+
+def return_server(service: HabitService, host: str = "127.0.0.1", port: int = 8000,
+                  quiet: bool = True) -> ThreadingHTTPServer:
+    """
+    Returns an HTTP server of the API that handles every connection in its own thread.
+    Run it with serve_forever() and stop it with shutdown().
+
+    Parameters:
+        service: HabitService
+            Service that runs the operations.
+        host: str, optional
+            Address to listen on. Defaults to the local machine only.
+        port: int, optional
+            Port to listen on, 0 for any free port. Defaults to 8000.
+        quiet: bool, optional
+            Whether to not log every request. Defaults to True."""
+    handler = type("BoundHabitRequestHandler", (HabitRequestHandler,), {"service": service, "quiet": quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSON HTTP API of the Habit tracker.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on")
+    parser.add_argument("--database", default="AppDatabase.db", help="database of the application")
+    parser.add_argument("--group-commit-latency", type=float,
+                        help="commit writes in groups, at most this number of seconds after they are made")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    service = HabitService(args.database, args.group_commit_latency)
+    server = return_server(service, args.host, args.port, quiet=not args.verbose)
+    print(f"Serving the Habit tracker on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
@@ -0,0 +1,271 @@
+from DatabaseAnalyzer import DatabaseAnalyzer
+from HabitContainer import HabitContainer
+from PeriodIndex import RANGE_CODES
+from Clock import SystemClock
+from Database import Database
+from Habit import Habit
+
+import threading
+
+
+
+# Queries of DatabaseAnalyzer available to clients of the service, by name without the \'return_\' prefix
+QUERIES = {
+    name[len("return_"):]: name for name in sorted(vars(DatabaseAnalyzer))
+    if name.startswith("return_") and callable(getattr(DatabaseAnalyzer, name))
+}
+
+# Characteristics of a habit that can be changed after its creation
+UPDATABLE_CHARACTERISTICS = ("periodicity", "time_span")
+
+
+
+def validate_periodicity(periodicity: str) -> str:
+    """
+    Returns the periodicity if it is valid, otherwise raises ValueError.
+
+    Parameters:
+        periodicity: str
+            \'Hour\', \'Day\', \'Week\', \'Month\' or \'Year\'."""
+    if periodicity not in RANGE_CODES:
+        raise ValueError(f"Periodicity must be one of {', '.join(RANGE_CODES)}.")
+    return periodicity
+
+def validate_time_span(time_span: int) -> int:
+    """
+    Returns the time span if it is valid, otherwise raises ValueError.
+
+    Parameters:
+        time_span: int
+            Positive whole number of periods."""
+    if isinstance(time_span, bool) or not isinstance(time_span, int) or time_span < 1:
+        raise ValueError("Time span must be a positive whole number.")
+    return time_span
+
+def return_query_parameters(method) -> tuple:
+    """
+    Returns the annotations of parameters of a query by parameter name and the names of its required parameters.
+    They are read from the code of the query, since inspect.signature costs about 12 ms of startup to import.
+
+    Parameters:
+        method: callable
+            Bound query of DatabaseAnalyzer, possibly wrapped by QueryCache.cached_query."""
+    function = getattr(method, "__func__", method)
+    while hasattr(function, "__wrapped__"):
+        function = function.__wrapped__
+    if not hasattr(function, "__code__"):
+        # Other callables, e.g., mocks of queries in tests
+        import inspect
+        parameters = inspect.signature(method).parameters.values()
+        return ({parameter.name: parameter.annotation for parameter in parameters},
+                tuple(parameter.name for parameter in parameters if parameter.default is inspect.Parameter.empty
+                      and parameter.kind in (parameter.POSITIONAL_OR_KEYWORD, parameter.KEYWORD_ONLY)))
+    code = function.__code__
+    # The first parameter is self
+    names = code.co_varnames[1:code.co_argcount]
+    annotations = {name: function.__annotations__.get(name) for name in names}
+    return annotations, names[:len(names) - len(function.__defaults__ or ())]
+
+
+
+class HabitService:
+    """
+    A class to represent operations of the application (the same as in the command line interface)
+    for non-interactive clients, e.g., the HTTP server. Operations may be called from several threads at once.
+    Invalid arguments raise ValueError, unknown habits raise KeyError, and adding an existing habit raises
+    sqlite3.IntegrityError.
+
+    Attributes:
+        database: Database
+            Database of the application.
+        analyzer: DatabaseAnalyzer
+            Analyzer of the database with a query result cache.
+        habit_container: HabitContainer
+            Habits changed by the operations. Habits are loaded from the database on demand.
+        lock: threading.Lock
+            Serializes changes of habits, since a change reads the habit and writes it back."""
+    def __init__(self, database_name: str = "AppDatabase.db", group_commit_latency: float = None,
+                 readers: int = 4, cache_capacity: int = 256, group_commit_size: int = 1000,
+                 clock: SystemClock = None, manual_commit: bool = False) -> None:
+        """
+        Parameters:
+            database_name: str, optional
+                Name of the database. Defaults to \'AppDatabase.db\'.
+            group_commit_latency: float, optional
+                See Database. Defaults to committing every write at once.
+            readers: int, optional
+                Number of read-only connections used by queries. Defaults to 4.
+            cache_capacity: int, optional
+                Capacity of the query result cache. Defaults to 256.
+            group_commit_size: int, optional
+                See Database. Defaults to 1000.
+            clock: SystemClock, optional
+                Clock that tells the time of operations. Defaults to the system clock.
+            manual_commit: bool, optional
+                See Database. Defaults to False."""
+        self.database = Database(database_name, group_commit_latency, group_commit_size, clock, manual_commit)
+        self.analyzer = DatabaseAnalyzer(database_name, self.database.return_read_pool(readers),
+                                         self.database.return_query_cache(cache_capacity), self.database.clock)
+        self.habit_container = HabitContainer(self.analyzer)
+        self.lock = threading.Lock()
+
+    def close(self) -> None:
+        """
+        Commits pending writes and closes the database.
+
+        No parameters."""
+        self.database.disconnect_database()
+
+    def return_habit_obj(self, name: str) -> Habit:
+        """
+        Returns the habit with the given name. Must be called under the lock.
+
+        Parameters:
+            name: str
+                Name of the habit."""
+        if name in self.habit_container.cache:
+            return self.habit_container[name]
+        # Read-only connections of the analyzer don't see writes of an unfinished group, the writing connection does
+        row = self.database.return_habit_from_database(name)
+        if row is None:
+            raise KeyError(name)
+        habit = Habit.from_row(row)
+        self.habit_container[name] = habit
+        return habit
+
+    def add_habit(self, name: str, periodicity: str, time_span: int) -> Habit:
+        """
+        Adds a habit and returns it.
+
+        Parameters:
+            name: str
+                Name of the habit. Can\'t be changed later.
+            periodicity: str
+                Periodicity of the habit.
+            time_span: int
+                Number of periods to develop the habit."""
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError("Name must be a non-empty text.")
+        habit = Habit(name, validate_periodicity(periodicity), validate_time_span(time_span),
+                      clock=self.database.clock)
+        with self.lock:
+            self.database.insert_habit_to_database(habit)
+            self.habit_container[habit.name] = habit
+        return habit
+
+    def update_habit(self, name: str, characteristic: str, new_value) -> Habit:
+        """
+        Changes the periodicity or the time span of a habit and returns the habit.
+
+        Parameters:
+            name: str
+                Name of the habit.
+            characteristic: str
+                \'periodicity\' or \'time_span\'.
+            new_value: str or int
+                New value of the characteristic."""
+        if characteristic == "periodicity":
+            validate_periodicity(new_value)
+        elif characteristic == "time_span":
+            validate_time_span(new_value)
+        else:
+            raise ValueError(f"Characteristic must be one of {', '.join(UPDATABLE_CHARACTERISTICS)}.")
+        with self.lock:
+            habit = self.return_habit_obj(name)
+            habit.update_habit_characteristic(characteristic, new_value)
+            self.database.update_habit_characteristic_in_database(habit, [characteristic], [new_value])
+        return habit
+
+    def delete_habit(self, name: str) -> None:
+        """
+        Deletes a habit with its history.
+
+        Parameters:
+            name: str
+                Name of the habit."""
+        with self.lock:
+            self.return_habit_obj(name)
+            self.database.delete_habit_from_database(name)
+            self.habit_container.discard(name)
+
+    def check_off_habit(self, name: str) -> Habit:
+        """
+        Checks off a habit (and marks it as completed if it has been developed) and returns the habit.
+
+        Parameters:
+            name: str
+                Name of the habit."""
+        with self.lock:
+            habit = self.return_habit_obj(name)
+            habit.check_off_habit(self.database.clock)
+            habit.complete_habit()
+            self.database.check_off_habit_in_database(habit)
+        return habit
+
+    def archive_history(self, retention_days: int) -> int:
+        """
+        Moves check-offs older than the given number of days to the archive (see Database.archive_log_rows)
+        and returns the number of moved check-offs.
+
+        Parameters:
+            retention_days: int
+                Number of recent days whose check-offs stay in the main log."""
+        if isinstance(retention_days, bool) or not isinstance(retention_days, int) or retention_days < 0:
+            raise ValueError("Retention must be a whole number of days.")
+        return self.database.archive_log_rows(retention_days)
+
+    def verify_habits(self, repair: bool = False, processes: int = None) -> dict:
+        """
+        Replays the history of every habit (see HistoryReplay.py) and returns descriptions of habits
+        that differ from their history and the number of repaired habits.
+
+        Parameters:
+            repair: bool, optional
+                Whether to overwrite inconsistent habits with the values replayed from their history.
+                Defaults to False.
+            processes: int, optional
+                Number of processes replaying habits in parallel. Defaults to replaying in the current process."""
+        # HistoryReplay imports numpy, which is only needed here
+        from HistoryReplay import replay_habits, repair_habits, return_discrepancy_description
+        discrepancies = replay_habits(self.database, processes)
+        with self.lock:
+            repaired = repair_habits(self.database, discrepancies) if repair else 0
+            if repaired > 0:
+                self.habit_container.clear()
+        return {"discrepancies": [return_discrepancy_description(discrepancy) for discrepancy in discrepancies],
+                "repaired": repaired}
+
+    def run_query(self, query_name: str, arguments: dict = None):
+        """
+        Runs a DatabaseAnalyzer query and returns its result. Text arguments of integer and boolean parameters,
+        e.g., taken from a URL, are converted, and text arguments of list parameters are split by commas,
+        e.g., \'Read books,Run\'.
+
+        Parameters:
+            query_name: str
+                Name of the query without the \'return_\' prefix, e.g., \'currently_tracked_habits\'.
+            arguments: dict, optional
+                Arguments of the query by parameter name. Defaults to no arguments."""
+        if query_name not in QUERIES:
+            raise KeyError(query_name)
+        method = getattr(self.analyzer, QUERIES[query_name])
+        annotations, required = return_query_parameters(method)
+        values = {}
+        for name, value in (arguments or {}).items():
+            if name not in annotations:
+                raise ValueError(f"Unknown parameter {name} of the query {query_name}.")
+            annotation = annotations[name]
+            if isinstance(value, str) and annotation is int:
+                try:
+                    value = int(value)
+                except ValueError:
+                    raise ValueError(f"Parameter {name} must be a whole number.") from None
+            elif isinstance(value, str) and annotation is bool:
+                value = value.lower() in ("1", "true", "yes")
+            elif isinstance(value, str) and annotation is list:
+                value = [item.strip() for item in value.split(",") if item.strip()]
+            values[name] = value
+        for name in required:
+            if name not in values:
+                raise ValueError(f"Missing parameter {name} of the query {query_name}.")
+        return method(**values)
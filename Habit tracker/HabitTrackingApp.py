@@ -1,9 +1,17 @@
-from CLI import CommandLineInterface as CLI
+from ScriptedCLI import return_parser, return_database_name, run_scripted
+
+import sys
 
 
 
 if __name__ == "__main__":
-    input_analyzer = CLI()
+    args = return_parser().parse_args()
+    if args.command is not None:
+        sys.exit(run_scripted(args))
+
+    # The interactive interface imports questionary (prompt_toolkit) and tabulate, which scripted commands don't need
+    from CLI import CommandLineInterface as CLI
+    input_analyzer = CLI(return_database_name(args))
     print("Welcome to the Habit tracker!")
     while True:
         input_analyzer.start_menu()
@@ -0,0 +1,195 @@
+from HabitAnalytics import return_check_off_columns
+from StreakEngine import compute_streaks_of_many
+from PeriodIndex import return_deadline
+from DatabaseMigrations import update_habit_schedules
+from Clock import SYSTEM_CLOCK
+from DatabaseAnalyzer import DatabaseAnalyzer
+from Database import Database
+
+from concurrent.futures import ProcessPoolExecutor
+from collections import namedtuple
+import numpy as np
+import argparse
+import json
+import sys
+import os
+
+"""
+This module replays the check-off history of habits to verify the habits table. The state, streaks and the time
+of the last check-off of every habit are recomputed from its log alone (see StreakEngine.py) and compared with
+the stored habit, since the two can drift apart, e.g., after a manual edit of the database file.
+Habits are replayed in chunks by a pool of processes, and found discrepancies can be repaired
+in batched transactions.
+
+Example:
+    python HistoryReplay.py --database AppDatabase.db --processes 8
+    python HistoryReplay.py --database AppDatabase.db --repair"""
+
+
+
+# Columns of the habits table recomputed from the log, in the order of DatabaseAnalyzer.return_habit_streaks
+REPLAYED_COLUMNS = ("state", "current_streak", "longest_streak", "end_timestamp")
+
+# A habit whose stored values (in the order of REPLAYED_COLUMNS) differ from the values replayed from its log
+Discrepancy = namedtuple("Discrepancy", ["name", "stored", "replayed"])
+
+# The stored values are repeated in the condition, so a habit changed since it was replayed isn't overwritten
+REPAIR_HABIT_ROW = """UPDATE habits SET state = ?, current_streak = ?, longest_streak = ?, end_timestamp = ?
+                      WHERE name = ? AND state IS ? AND current_streak IS ? AND longest_streak IS ?
+                      AND end_timestamp IS ?"""
+
+
+
+def return_replayed_habits(columns: dict, stored: dict, now: int = None) -> dict:
+    """
+    Returns the state, current streak, longest streak and end timestamp of every habit, computed from
+    its check-offs, by habit name. Habits that have been dropped stay dropped, since dropping a habit
+    isn't recorded in the log. Likewise, a stored current streak of 0 is kept if the deadline
+    of the last check-off has passed, since the streak has been reset by DeadlineScheduler.
+
+    Parameters:
+        columns: dict
+            Check-off history returned by HabitAnalytics.return_check_off_columns.
+        stored: dict
+            Stored values of habits (in the order of REPLAYED_COLUMNS) by habit name.
+        now: int, optional
+            Timestamp of the current moment. Defaults to the time of the system clock."""
+    if now is None:
+        now = SYSTEM_CLOCK.return_current_timestamp()
+    habit_indices, timestamps = columns["habit_indices"], columns["timestamps"]
+    summary = compute_streaks_of_many(habit_indices, timestamps.astype("datetime64[s]"),
+                                      columns["periodicities"], columns["time_spans"])
+    counts = np.bincount(habit_indices, minlength=len(columns["names"]))
+    last_check_offs = np.cumsum(counts) - 1
+    replayed = {}
+    for habit, name in enumerate(columns["names"]):
+        stored_values = stored.get(name, (None, None))
+        if stored_values[0] == "Dropped":
+            state = "Dropped"
+        else:
+            state = "Completed" if summary["completed"][habit] else "In progress"
+        current_streak = int(summary["current_streak"][habit])
+        end_timestamp = int(timestamps[last_check_offs[habit]]) if counts[habit] > 0 else None
+        if stored_values[1] == 0 and end_timestamp is not None:
+            if return_deadline(end_timestamp, columns["periodicities"][habit]) <= now:
+                current_streak = 0
+        replayed[name] = (state, current_streak, int(summary["longest_streak"][habit]), end_timestamp)
+    return replayed
+
+def replay_chunk(database_name: str, habit_names: list, now: int = None) -> list:
+    """
+    Replays the history of a chunk of habits and returns their discrepancies. Runs in a process of the pool,
+    so it opens connections of its own.
+
+    Parameters:
+        database_name: str
+            Name of the database.
+        habit_names: list
+            Names of habits to be replayed.
+        now: int, optional
+            Timestamp of the current moment. Defaults to the time of the system clock."""
+    analyzer = DatabaseAnalyzer(database_name)
+    try:
+        # Habits are read before their history: a habit checked off in between looks inconsistent,
+        # but its repair is skipped (see repair_habits) rather than overwriting its newer values
+        stored = analyzer.return_habit_streaks(habit_names)
+        columns = return_check_off_columns(analyzer, habit_names)
+    finally:
+        analyzer.close()
+    replayed = return_replayed_habits(columns, {row[0]: row[1:] for row in stored}, now)
+    # Habits deleted in between are missing from the history
+    return [Discrepancy(row[0], tuple(row[1:]), replayed[row[0]]) for row in stored
+            if row[0] in replayed and tuple(row[1:]) != replayed[row[0]]]
+
+def replay_habits(database: Database, processes: int = None, habits_per_chunk: int = 500) -> list:
+    """
+    Replays the history of every habit and returns discrepancies between the stored habits and their logs,
+    ordered by habit name.
+
+    Parameters:
+        database: Database
+            Database to be verified. Its pending writes are committed first.
+        processes: int, optional
+            Number of processes replaying chunks of habits in parallel.
+            Defaults to replaying in the current process.
+        habits_per_chunk: int, optional
+            Number of habits replayed at once. Defaults to 500."""
+    database.commit_pending_writes()
+    analyzer = DatabaseAnalyzer(database.name, database.return_read_pool(), clock=database.clock)
+    chunks, after_row_id = [], 0
+    while True:
+        page = analyzer.return_habit_names(habits_per_chunk, after_row_id)
+        if page == []:
+            break
+        chunks.append([name for _, name in page])
+        after_row_id = page[-1][0]
+
+    # Streaks are replayed as of the time of the clock of the database, e.g., of a simulated clock
+    arguments = ([database.name] * len(chunks), chunks, [database.clock.return_current_timestamp()] * len(chunks))
+    if processes is None:
+        results = list(map(replay_chunk, *arguments))
+    else:
+        with ProcessPoolExecutor(processes) as executor:
+            results = list(executor.map(replay_chunk, *arguments))
+    discrepancies = [discrepancy for result in results for discrepancy in result]
+    return sorted(discrepancies, key=lambda discrepancy: discrepancy.name)
+
+def repair_habits(database: Database, discrepancies: list, habits_per_transaction: int = 1000) -> int:
+    """
+    Overwrites stored habits with the values replayed from their logs and returns the number of repaired habits.
+    Habits that have been changed since they were replayed, e.g., checked off, are left as they are.
+
+    Parameters:
+        database: Database
+            Database to be repaired.
+        discrepancies: list
+            Discrepancies returned by replay_habits.
+        habits_per_transaction: int, optional
+            Number of habits repaired in a transaction. Defaults to 1000."""
+    repaired = 0
+    for start in range(0, len(discrepancies), habits_per_transaction):
+        group = discrepancies[start:start + habits_per_transaction]
+        with database.write_transaction([discrepancy.name for discrepancy in group], ("habits",)) as cursor:
+            cursor.executemany(REPAIR_HABIT_ROW, [(*discrepancy.replayed, discrepancy.name, *discrepancy.stored)
+                                                  for discrepancy in group])
+            repaired += cursor.rowcount
+            update_habit_schedules(cursor, [discrepancy.name for discrepancy in group])
+    return repaired
+
+def return_discrepancy_description(discrepancy: Discrepancy) -> str:
+    """
+    Returns a readable description of a discrepancy, e.g., \'Read books: current_streak 3 (log: 5)\'.
+
+    Parameters:
+        discrepancy: Discrepancy
+            Discrepancy returned by replay_habits."""
+    differences = [f"{column} {stored} (log: {replayed})"
+                   for column, stored, replayed in zip(REPLAYED_COLUMNS, discrepancy.stored, discrepancy.replayed)
+                   if stored != replayed]
+    return f"{discrepancy.name}: {', '.join(differences)}"
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifies habits of the Habit tracker against their history.")
+    parser.add_argument("--database", default="AppDatabase.db", help="database of the application")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(),
+                        help="number of processes replaying habits (defaults to the number of CPUs)")
+    parser.add_argument("--habits-per-chunk", type=int, default=500, help="number of habits replayed at once")
+    parser.add_argument("--repair", action="store_true", help="overwrite inconsistent habits with replayed values")
+    parser.add_argument("--output", help="file to write discrepancies to as JSON")
+    args = parser.parse_args()
+
+    database = Database(args.database)
+    discrepancies = replay_habits(database, args.processes, args.habits_per_chunk)
+    for discrepancy in discrepancies:
+        print(return_discrepancy_description(discrepancy))
+    habits_amount = DatabaseAnalyzer(args.database, database.return_read_pool()).return_number_of_habits()
+    print(f"{len(discrepancies)} of {habits_amount} habits differ from their history.")
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump([discrepancy._asdict() for discrepancy in discrepancies], file, indent=4)
+    if args.repair and discrepancies:
+        print(f"{repair_habits(database, discrepancies)} habits repaired.")
+    database.disconnect_database()
+    sys.exit(1 if discrepancies and not args.repair else 0)
@@ -0,0 +1,172 @@
+import sqlite3
+import os
+
+"""
+This module keeps the history of habits in two tiers. Recent events live in the habits_log table
+of the application database (the hot tier). Older check-offs are moved to the archived_log table of the archive,
+a database file next to the application database with the \'-archive\' suffix, which is attached to every
+connection as \'archive\'. The file is created when check-offs are archived for the first time; until then
+an empty in-memory archive is attached instead, so queries over both tiers work the same. This way the hot table
+and its index stay small enough to be kept in the page cache, however long the history grows. The rollup tables
+of the application database keep numbers of check-offs per day, week, month and year of the whole history,
+so counts don't read the archive at all.
+
+DatabaseAnalyzer reads events of both tiers (see return_log_union), so the history of a habit,
+streak recomputation and analytics don't depend on where the events are stored. Connections opened
+before the archive file was created keep reading the empty archive until they are reopened, except for
+the read pool of the database (see Database.archive_log_rows).
+
+Example:
+    moved_rows = database.archive_log_rows(retention_days=365)"""
+
+
+
+# Name of the attached archive database in queries, e.g., archive.archived_log
+ARCHIVE_SCHEMA = "archive"
+
+# Tables with log rows. The archive goes first, since it usually holds the earlier check-offs.
+LOG_TABLES = ("archive.archived_log", "main.habits_log")
+
+# Columns of the archived_log table. Both tiers have the same columns, so a row is moved with INSERT ... SELECT.
+ARCHIVED_LOG_COLUMNS = """name, end_timestamp, log_id, current_streak, longest_streak,
+                          hour_index, day_index, week_index, month_index, year_index"""
+
+# Version of the archive ('PRAGMA archive.user_version'). Archives of version 0 may have been filled
+# before log ids of habits_log were AUTOINCREMENT (see DatabaseMigrations.add_log_id_autoincrement).
+ARCHIVE_VERSION = 1
+
+
+
+def return_archive_name(database_name: str) -> str:
+    """
+    Returns the name of the archive file of a database.
+
+    Parameters:
+        database_name: str
+            Name of the application database."""
+    return f"{database_name}-archive"
+
+def return_attached_databases(database_name: str) -> dict:
+    """
+    Returns the databases to be attached to read-only connections of a database (see ConnectionPool),
+    i.e., its archive if it has been created.
+
+    Parameters:
+        database_name: str
+            Name of the application database."""
+    archive_name = return_archive_name(database_name)
+    return {ARCHIVE_SCHEMA: archive_name} if os.path.exists(archive_name) else {}
+
+def attach_empty_archive(connection: sqlite3.Connection) -> None:
+    """
+    Attaches an empty in-memory archive to a connection unless an archive is attached already.
+    It is the setup of connection pools (see ConnectionPool) of databases without an archive file.
+
+    Parameters:
+        connection: sqlite3.Connection
+            Connection to the application database."""
+    if any(row[1] == ARCHIVE_SCHEMA for row in connection.execute("PRAGMA database_list")):
+        return
+    connection.execute(f"ATTACH DATABASE ':memory:' AS {ARCHIVE_SCHEMA}")
+    cursor = connection.cursor()
+    create_archive_tables(cursor)
+    cursor.close()
+
+def create_archive_tables(cursor: sqlite3.Cursor) -> None:
+    """
+    Creates the table of archived check-offs in the attached archive if it doesn't exist yet.
+    The rows are stored in the order of the history of every habit (name, end timestamp, log id)
+    without a separate index, which keeps the archive about half the size of the same rows in habits_log.
+
+    Parameters:
+        cursor: sqlite3.Cursor
+            Cursor of a connection with the attached archive."""
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.archived_log (
+            name TEXT,
+            end_timestamp INTEGER,
+            log_id INTEGER,
+            current_streak INTEGER,
+            longest_streak INTEGER,
+            hour_index INTEGER,
+            day_index INTEGER,
+            week_index INTEGER,
+            month_index INTEGER,
+            year_index INTEGER,
+            PRIMARY KEY (name, end_timestamp, log_id)
+        ) WITHOUT ROWID
+    ''')
+
+def attach_archive(database: sqlite3.Connection, database_name: str, create: bool = False) -> None:
+    """
+    Attaches the archive of a database to its writing connection in place of the empty in-memory archive.
+    If the archive file doesn't exist and mustn't be created, the empty archive is attached instead.
+    When an archive of an older version is attached for the first time, the log id sequence of habits_log
+    is raised above its archived log ids.
+
+    Parameters:
+        database: sqlite3.Connection
+            Writing connection to the application database without a pending transaction.
+        database_name: str
+            Name of the application database.
+        create: bool, optional
+            Whether to create the archive file and its table if they don't exist yet. Defaults to False."""
+    archive_name = return_archive_name(database_name)
+    if not create and not os.path.exists(archive_name):
+        attach_empty_archive(database)
+        return
+    if any(row[1] == ARCHIVE_SCHEMA for row in database.execute("PRAGMA database_list")):
+        database.execute(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+    database.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (archive_name,))
+    cursor = database.cursor()
+    create_archive_tables(cursor)
+    if cursor.execute(f"PRAGMA {ARCHIVE_SCHEMA}.user_version").fetchone()[0] < ARCHIVE_VERSION:
+        raise_log_id_sequence(cursor)
+        cursor.execute(f"PRAGMA {ARCHIVE_SCHEMA}.user_version = {ARCHIVE_VERSION}")
+    cursor.close()
+    database.commit()
+
+def raise_log_id_sequence(cursor: sqlite3.Cursor) -> None:
+    """
+    Makes sure that new rows of habits_log get larger log ids than every archived row.
+
+    Parameters:
+        cursor: sqlite3.Cursor
+            Cursor of a connection with the attached archive."""
+    last_log_id = cursor.execute(f"SELECT MAX(log_id) FROM {ARCHIVE_SCHEMA}.archived_log").fetchone()[0]
+    if last_log_id is None:
+        return
+    cursor.execute("UPDATE main.sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'habits_log'", (last_log_id,))
+    if cursor.rowcount == 0:
+        cursor.execute("INSERT INTO main.sqlite_sequence (name, seq) VALUES ('habits_log', ?)", (last_log_id,))
+
+def return_log_union(query: str) -> str:
+    """
+    Returns a query that combines the results of a query over every tier of the log with UNION ALL.
+    Parameters of the query have to be passed once per tier, see LOG_TABLES.
+
+    Parameters:
+        query: str
+            Query with {log} in place of the log table, e.g., \'SELECT end_timestamp FROM {log} WHERE name = ?\'."""
+    return " UNION ALL ".join(query.format(log=table) for table in LOG_TABLES)
+
+def move_log_rows(cursor: sqlite3.Cursor, habit_names: list, before_timestamp: int) -> int:
+    """
+    Moves check-offs of habits made before a moment from habits_log to the archive and returns the number
+    of moved rows. Every habit is read with a seek of the habits_log index. Log ids of habits_log are AUTOINCREMENT,
+    so ids of archived rows are never given to new rows.
+
+    Parameters:
+        cursor: sqlite3.Cursor
+            Cursor of the write transaction.
+        habit_names: list
+            Names of habits whose check-offs to be moved.
+        before_timestamp: int
+            Check-offs made before this timestamp are moved."""
+    parameters = [(name, before_timestamp) for name in habit_names]
+    cursor.executemany(f"""INSERT INTO {ARCHIVE_SCHEMA}.archived_log ({ARCHIVED_LOG_COLUMNS})
+                           SELECT {ARCHIVED_LOG_COLUMNS} FROM main.habits_log
+                           WHERE name = ? AND end_timestamp < ?""", parameters)
+    cursor.executemany("""DELETE FROM main.habits_log
+                          WHERE name = ? AND end_timestamp < ?""", parameters)
+    return cursor.rowcount
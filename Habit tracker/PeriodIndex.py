@@ -0,0 +1,233 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+
+
+# Timestamps are stored as seconds since 1970-01-01 00:00:00 of the local wall-clock time,
+# i.e., of the same naive local time the application has always shown to the user.
+# This way timestamps map to dates without any time zone conversion and SQLite renders them back
+# with strftime(..., \'unixepoch\').
+EPOCH = datetime(1970, 1, 1)
+
+# The number of calendar fields (counting from the year down to the hour)
+# that are compared for each periodicity.
+RANGE_CODES = {
+    "Hour": 5,
+    "Day": 4,
+    "Week": 3,
+    "Month": 2,
+    "Year": 1
+}
+
+
+
+def return_timestamp(moment: datetime) -> int:
+    """
+    Returns the timestamp of a moment.
+
+    Parameters:
+        moment: datetime
+            Naive local date and time."""
+    return (moment - EPOCH) // timedelta(seconds=1)
+
+def return_datetime(timestamp: int) -> datetime:
+    """
+    Returns the moment of a timestamp.
+
+    Parameters:
+        timestamp: int
+            Seconds since 1970-01-01 00:00:00 of the local wall-clock time."""
+    return EPOCH + timedelta(seconds=timestamp)
+
+def return_timestamp_of_habit_time(time: str, date: str) -> int:
+    """
+    Returns the timestamp of time and date stored by a habit (e.g., end_time and end_date) or None if they aren't set.
+
+    Parameters:
+        time: str
+            Time in the format \'%H:%M:%S\'.
+        date: str
+            Date in the format \'%Y-%m-%d\'."""
+    if time is None or date is None:
+        return None
+    return return_timestamp(datetime.fromisoformat(f"{date} {time}"))
+
+
+
+def return_period_indices(timestamp: int) -> list:
+    """
+    Returns ordinals of the hour, day, ISO week, month and year that contain the timestamp.
+    Hours, days, weeks and months are counted from 1970-01-01 (weeks start on Monday, 1969-12-29),
+    the year index is the year itself. Consecutive periods always have consecutive indices.
+
+    Parameters:
+        timestamp: int
+            Seconds since 1970-01-01 00:00:00 of the local wall-clock time."""
+    if timestamp is None:
+        return [None, None, None, None, None]
+    day_index = timestamp // 86400
+    day = EPOCH + timedelta(days=day_index)
+    return [timestamp // 3600,
+            day_index,
+            (day_index + 3) // 7,
+            (day.year - 1970) * 12 + day.month - 1,
+            day.year]
+
+def return_period_label(periodicity: str, period_index: int) -> str:
+    """
+    Returns a readable name of a period: the date of a day, the date of the Monday of a week,
+    the year and the month of a month or the year.
+
+    Parameters:
+        periodicity: str
+            'Day', 'Week', 'Month' or 'Year'.
+        period_index: int
+            Index of the period (see return_period_indices)."""
+    if periodicity == "Day":
+        return (EPOCH + timedelta(days=period_index)).strftime("%Y-%m-%d")
+    if periodicity == "Week":
+        return (EPOCH + timedelta(days=period_index * 7 - 3)).strftime("%Y-%m-%d")
+    if periodicity == "Month":
+        return f"{1970 + period_index // 12}-{period_index % 12 + 1:02d}"
+    return str(period_index)
+
+def return_covering_periods(first_day: int, last_day: int) -> list:
+    """
+    Returns the fewest whole days, months and years that together cover the days from first_day to last_day
+    (inclusive) as a list of (periodicity, first index, last index) with indices of return_period_indices.
+    E.g., 2023-12-30..2025-02-01 is covered by 2 days of 2023, the year 2024, January 2025 and 1 day of February.
+
+    Parameters:
+        first_day: int
+            Index of the first day.
+        last_day: int
+            Index of the last day."""
+    def return_month_start(month_index: int) -> int:
+        year, month = divmod(month_index, 12)
+        return (datetime(1970 + year, month + 1, 1) - EPOCH).days
+
+    if first_day > last_day:
+        return []
+    periods = []
+    first_month, last_month = return_period_indices(first_day * 86400)[3], return_period_indices(last_day * 86400)[3]
+    # Days before the first whole month and after the last one
+    if return_month_start(first_month) != first_day:
+        first_month += 1
+    if return_month_start(last_month + 1) != last_day + 1:
+        last_month -= 1
+    if first_month > last_month:
+        return [("Day", first_day, last_day)]
+    if return_month_start(first_month) > first_day:
+        periods.append(("Day", first_day, return_month_start(first_month) - 1))
+    if return_month_start(last_month + 1) <= last_day:
+        periods.append(("Day", return_month_start(last_month + 1), last_day))
+
+    # Months before the first whole year and after the last one
+    first_year, last_year = -(-first_month // 12), (last_month + 1) // 12 - 1
+    if first_year > last_year:
+        periods.append(("Month", first_month, last_month))
+        return periods
+    if first_year * 12 > first_month:
+        periods.append(("Month", first_month, first_year * 12 - 1))
+    if (last_year + 1) * 12 <= last_month:
+        periods.append(("Month", (last_year + 1) * 12, last_month))
+    periods.append(("Year", 1970 + first_year, 1970 + last_year))
+    return periods
+
+def return_calendar_fields(moment: datetime) -> list:
+    """
+    Returns hour, day of month, ISO week number, month and year of a moment.
+
+    Parameters:
+        moment: datetime
+            Naive local date and time."""
+    return [moment.hour, moment.day, moment.isocalendar().week, moment.month, moment.year]
+
+def is_time_exceeded(last_datetime: datetime, current_datetime: datetime, periodicity: str) -> bool:
+    """
+    Checks whether the user exceeded time to complete a habit within a specific period.
+    Time is exceeded if the difference between any calendar field not finer than the periodicity
+    (e.g. year, month and ISO week number for \'Week\') of two moments is greater than 1.
+
+    Parameters:
+        last_datetime: datetime
+            Moment of the last check-off.
+        current_datetime: datetime
+            Moment of the new check-off.
+        periodicity: str
+            Periodicity of the habit."""
+    last_fields = return_calendar_fields(last_datetime)
+    current_fields = return_calendar_fields(current_datetime)
+    for i in range(RANGE_CODES[periodicity]):
+        if abs(current_fields[-i-1] - last_fields[-i-1])>1:
+            return True
+    return False
+
+def return_next_period_start(timestamp: int, periodicity: str) -> int:
+    """
+    Returns the timestamp of the beginning of the hour, day, ISO week, month or year that follows
+    the one containing the timestamp.
+
+    Parameters:
+        timestamp: int
+            Seconds since 1970-01-01 00:00:00 of the local wall-clock time.
+        periodicity: str
+            Periodicity of the period."""
+    if periodicity == "Hour":
+        return (timestamp // 3600 + 1) * 3600
+    if periodicity == "Day":
+        return (timestamp // 86400 + 1) * 86400
+    if periodicity == "Week":
+        # Week w starts on the day 7w - 3 (see return_period_label)
+        return ((timestamp // 86400 + 3) // 7 * 7 + 4) * 86400
+    month_index, year = return_period_indices(timestamp)[3:]
+    if periodicity == "Year":
+        return return_timestamp(datetime(year + 1, 1, 1))
+    month_index += 1
+    return return_timestamp(datetime(1970 + month_index // 12, month_index % 12 + 1, 1))
+
+def return_deadline(timestamp: int, periodicity: str) -> int:
+    """
+    Returns the timestamp of the first moment after a check-off at which is_time_exceeded reports
+    the habit as broken, i.e., the moment its current streak is lost if the habit isn't checked off again.
+
+    Parameters:
+        timestamp: int
+            Timestamp of the last check-off.
+        periodicity: str
+            Periodicity of the habit."""
+    # The calendar fields compared for a periodicity don't change within an hour (for 'Hour'), a day (for 'Day'
+    # and 'Week', since months start on any weekday) or a month, so the deadline only depends on that period
+    if periodicity == "Hour":
+        return return_deadline_of_period(timestamp // 3600 * 3600, periodicity)
+    if periodicity in ("Day", "Week"):
+        return return_deadline_of_period(timestamp // 86400 * 86400, periodicity)
+    return return_deadline_of_period(return_period_indices(timestamp)[3], periodicity)
+
+@lru_cache(maxsize=4096)
+def return_deadline_of_period(period: int, periodicity: str) -> int:
+    """
+    Returns the deadline (see return_deadline) of check-offs made within a period. Many habits are checked off
+    within the same periods, so deadlines are computed once per period.
+
+    Parameters:
+        period: int
+            Timestamp of the beginning of the hour or the day for 'Hour', 'Day' and 'Week',
+            index of the month for 'Month' and 'Year'.
+        periodicity: str
+            Periodicity of the habit."""
+    if periodicity in ("Month", "Year"):
+        months = 12 if periodicity == "Year" else 1
+        last_datetime = datetime(1970 + period // 12, period % 12 + 1, 1)
+        month_index = period - period % months
+        while True:
+            month_index += months
+            moment = datetime(1970 + month_index // 12, month_index % 12 + 1, 1)
+            if is_time_exceeded(last_datetime, moment, periodicity):
+                return return_timestamp(moment)
+    step = timedelta(hours=1) if periodicity == "Hour" else timedelta(days=1)
+    last_datetime = moment = return_datetime(period)
+    while True:
+        moment += step
+        if is_time_exceeded(last_datetime, moment, periodicity):
+            return return_timestamp(moment)
@@ -1,8 +1,13 @@
+from StreakEngine import compute_streaks, return_period_indices_of_many
+from Habit import Habit, return_current_date_and_time
+from PeriodIndex import return_timestamp
+from Clock import SimulatedClock
 from Database import Database
-from Habit import Habit
 
+from concurrent.futures import ProcessPoolExecutor
 from dateutil.relativedelta import relativedelta 
 from datetime import datetime
+import numpy as np
 import random
 
 
@@ -21,64 +26,6 @@ def predefine_habits() -> list[Habit]:
 
 
 
-def check_off_habit(predefined_habit: Habit, new_end_datetime: datetime) -> None:
-    """
-    Updates streaks of a habit.
-    
-    Parameters:
-        predefined_habit: Habit
-            Predefined habit to be checked-off.
-        new_end_datetime: datetime
-            New end date and time for habit. This is an analog to \'current_datetime\' in case 
-            we check habit off in real time."""
-    if predefined_habit.end_time is not None and predefined_habit.end_date is not None:
-        check_time_excess(predefined_habit, new_end_datetime)
-
-    predefined_habit.current_streak += 1
-    if predefined_habit.current_streak>predefined_habit.longest_streak:
-        predefined_habit.longest_streak = predefined_habit.current_streak
-
-def check_time_excess(predefined_habit: Habit, new_end_datetime: datetime) -> None:
-    """
-    Checks whether the user exceeded time to complete a habit within a specific period.
-    Habit is broken if the time difference between current time and the time of the last check
-    greater than 1 periodicity. 
-    E.g.: Periodicity is \'Week\'. Assume the user start the habit \'this\' week. If the user don't check it off
-    until the end of the \'next\' week, the habit's currenet streak would be reset.
-
-    Parameters:
-        predefined_habit: Habit
-            Predefined habit to be checked-off.
-        new_end_datetime: datetime
-            New end date and time for habit. This is an analog to \'current_datetime\' in case 
-            we check habit off in real time."""
-    end_time = datetime.strptime(predefined_habit.end_time, '%H:%M:%S').time()
-    end_date = datetime.strptime(predefined_habit.end_date, '%Y-%m-%d')
-    end_datetime = datetime.combine(end_date, end_time)
-
-    time_difference = [end_datetime.hour - new_end_datetime.hour,
-                        end_datetime.day - new_end_datetime.day,
-                        end_datetime.isocalendar().week - new_end_datetime.isocalendar().week,
-                        end_datetime.month - new_end_datetime.month,
-                        end_datetime.year - new_end_datetime.year]     
-    time_excess = False
-    range_codes = {
-        "Hour": 5,
-        "Day": 4,
-        "Week": 3,
-        "Month": 2,
-        "Year": 1
-    }
-    for i in range(range_codes[predefined_habit.periodicity]):
-        if abs(time_difference[-i-1])>1:
-            time_excess = True
-
-    if time_excess:
-        predefined_habit.current_streak = 0
-        print("Time has passed and your current streak has been reset!")
-
-
-
 def generate_habit_history(predefined_habit: Habit, database: Database) -> None:
     """
     Generates approximate history for a certain habit. Used only to examplify how habit could be defined and developed.
@@ -88,32 +35,12 @@ def generate_habit_history(predefined_habit: Habit, database: Database) -> None:
             Predefined habit which history should be generated.
         database: Database
             Database into which data about predefined habit will be uploaded."""
-    start_datetime = datetime(2024, 1, 17, 12, 4, 36)
-    start_time = start_datetime.strftime("%H:%M:%S")
-    start_date = start_datetime.strftime("%Y-%m-%d")
-    predefined_habit.start_time = start_time
-    predefined_habit.start_date = start_date
-
-
-    def update_data(predefined_habit: Habit, end_datetime: datetime) -> None:
-        """
-        Updates end datetime, state and streaks of a predefined habit. It also updates logs.
-        
-        Parameters:
-            predefined_habit: Habit
-                Habit which data in the database should be updated."""
-        end_time = end_datetime.strftime("%H:%M:%S")
-        end_date = end_datetime.strftime("%Y-%m-%d")
-        predefined_habit.end_time = end_time
-        predefined_habit.end_date = end_date
-        check_off_habit(predefined_habit, end_datetime)
-        database.update_habit_characteristic_in_database(predefined_habit, ["end_time", "end_date"], 
-                                                         [predefined_habit.end_time, predefined_habit.end_date])
-        if predefined_habit.complete_habit():
-            database.update_habit_characteristic_in_database(predefined_habit, ["state"], [predefined_habit.state])
-        database.update_habit_characteristic_in_database(predefined_habit, ["current_streak", "longest_streak"], 
-                                                         [predefined_habit.current_streak, predefined_habit.longest_streak])
-        database.update_habit_logs(predefined_habit)
+    # Every span (28 days, 4 weeks, 8 hours) fits within February, since check_time_excess compares calendar fields
+    # and a check-off on the 1st of a month after one on the 31st would break the streak
+    start_datetime = datetime(2024, 2, 1, 12, 4, 36)
+    predefined_habit.start_time, predefined_habit.start_date = return_current_date_and_time(start_datetime)
+    # The habit is checked off the same way as in real time, only the clock is simulated
+    clock = SimulatedClock(start_datetime)
 
     for i in range(predefined_habit.time_span):
         if predefined_habit.periodicity == "Hour":
@@ -126,5 +53,115 @@ def generate_habit_history(predefined_habit: Habit, database: Database) -> None:
             delta = relativedelta(months=i, days=random.randint(1, 30 - start_datetime.day))
         elif predefined_habit.periodicity == "Year":
             delta = relativedelta(years=i)
-        end_datetime = start_datetime + delta
-        update_data(predefined_habit, end_datetime)
+        clock.move_to(start_datetime + delta)
+        predefined_habit.check_off_habit(clock)
+        predefined_habit.complete_habit()
+        database.check_off_habit_in_database(predefined_habit)
+
+
+
+# Probability that the user misses a period of a habit with the given periodicity
+BREAK_PROBABILITIES = {
+    "Hour": 0.15,
+    "Day": 0.08,
+    "Week": 0.05,
+    "Month": 0.03,
+    "Year": 0.02
+}
+
+def generate_synthetic_habits(habit_numbers: range, periods_amount: int, seed: int = 0,
+                              break_probabilities: dict = None, 
+                              start_datetime: datetime = datetime(2024, 1, 1)) -> tuple[list, list]:
+    """
+    Generates habits with made up history. Each habit gets a random periodicity and time span and is performed
+    once in every period, except for periods the user misses with the probability given for its periodicity.
+    Streaks and states follow the same rules as Habit.check_off_habit (see StreakEngine.py).
+    The result depends only on the seed and the habit numbers, so habits can be generated in any order and in parallel.
+
+    Returns rows for the \'habits\' and \'habits_log\' tables (see Database.insert_rows_to_database).
+
+    Parameters:
+        habit_numbers: range
+            Numbers of habits to be generated. Habit number n is called \'Synthetic habit n\'.
+        periods_amount: int
+            Number of periods each habit is tracked for.
+        seed: int, optional
+            Seed of the random generator. Defaults to 0.
+        break_probabilities: dict, optional
+            Probability to miss a period for every periodicity. Defaults to BREAK_PROBABILITIES.
+        start_datetime: datetime, optional
+            The beginning of the first period. Should be the beginning of an hour, day, week (Monday), month and year
+            simultaneously. Defaults to 2024-01-01 00:00:00."""
+    if break_probabilities is None:
+        break_probabilities = BREAK_PROBABILITIES
+    start_timestamp = return_timestamp(start_datetime)
+    start_month = np.datetime64(start_datetime, "M")
+    start_year = np.datetime64(start_datetime, "Y")
+    periodicities = list(BREAK_PROBABILITIES)
+    habit_rows, log_rows = [], []
+
+    for number in habit_numbers:
+        generator = np.random.default_rng([seed, number])
+        name = f"Synthetic habit {number}"
+        periodicity = periodicities[generator.integers(len(periodicities))]
+        time_span = int(generator.integers(1, periods_amount + 1))
+        periods = np.flatnonzero(generator.random(periods_amount) >= break_probabilities[periodicity])
+
+        # Beginning of every performed period and the random moment within it
+        if periodicity == "Hour":
+            starts, lengths = start_timestamp + periods * 3600, 3600
+        elif periodicity == "Day":
+            starts, lengths = start_timestamp + periods * 86400, 86400
+        elif periodicity == "Week":
+            starts, lengths = start_timestamp + periods * 604800, 604800
+        elif periodicity == "Month":
+            starts, lengths = (start_month + periods).astype("datetime64[s]").astype(np.int64), 28 * 86400
+        elif periodicity == "Year":
+            starts, lengths = (start_year + periods).astype("datetime64[s]").astype(np.int64), 365 * 86400
+        timestamps = starts + generator.integers(0, lengths, len(periods))
+
+        summary = compute_streaks(timestamps.astype("datetime64[s]"), periodicity, time_span)
+        habit_rows.append((name, periodicity, time_span, summary["state"],
+                           summary["current_streak"], summary["longest_streak"], start_timestamp,
+                           int(timestamps[-1]) if len(timestamps) else None))
+        # As Database.insert_habit_to_database does, the first log row stores the habit creation
+        log_rows.append((name, 0, 0, None, None, None, None, None, None))
+        log_rows.extend(zip([name] * len(timestamps),
+                            summary["streaks"].tolist(),
+                            summary["longest_streaks"].tolist(),
+                            timestamps.tolist(),
+                            *return_period_indices_of_many(timestamps).T.tolist()))
+    return habit_rows, log_rows
+
+def load_synthetic_history(database: Database, habits_amount: int, periods_amount: int, seed: int = 0,
+                           break_probabilities: dict = None, processes: int = None, 
+                           habits_per_transaction: int = 1000) -> None:
+    """
+    Generates synthetic habits with their history and loads them into the database. Habits are generated 
+    in chunks, and every chunk is inserted in a single transaction.
+
+    Parameters:
+        database: Database
+            Database into which data about synthetic habits will be uploaded.
+        habits_amount: int
+            Number of habits to be generated.
+        periods_amount: int
+            Number of periods each habit is tracked for.
+        seed: int, optional
+            Seed of the random generator. Defaults to 0.
+        break_probabilities: dict, optional
+            Probability to miss a period for every periodicity. Defaults to BREAK_PROBABILITIES.
+        processes: int, optional
+            Number of processes generating habits in parallel. Defaults to generating in the current process.
+        habits_per_transaction: int, optional
+            Number of habits in a chunk. Defaults to 1000."""
+    chunks = [range(start, min(start + habits_per_transaction, habits_amount))
+              for start in range(0, habits_amount, habits_per_transaction)]
+    arguments = (chunks, [periods_amount] * len(chunks), [seed] * len(chunks), [break_probabilities] * len(chunks))
+    if processes is None:
+        for habit_rows, log_rows in map(generate_synthetic_habits, *arguments):
+            database.insert_rows_to_database(habit_rows, log_rows)
+    else:
+        with ProcessPoolExecutor(processes) as executor:
+            for habit_rows, log_rows in executor.map(generate_synthetic_habits, *arguments):
+                database.insert_rows_to_database(habit_rows, log_rows)
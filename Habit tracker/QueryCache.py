@@ -0,0 +1,187 @@
+from collections import OrderedDict
+import functools
+import threading
+
+
+
+# Tables of the database. A write that doesn't specify its tables is considered to change all of them.
+TABLES = ("habits", "habits_log")
+
+
+
+class QueryCache:
+    """
+    A class to represent a bounded cache of query results of DatabaseAnalyzer.
+    A result is kept until a write changes the data it has been computed from: writes of the application
+    are reported by Database (see Database.return_query_cache) together with the habits and tables
+    they changed, and changes made by other connections, e.g., by another process, are detected
+    through the version of the database file (\'PRAGMA data_version\') that is checked on every lookup.
+    The least recently used results are evicted once the cache is full.
+
+    Cached results are shared between callers and must not be modified.
+
+    Attributes:
+        data_version: callable
+            Function that returns the version of the database file. The version must change
+            whenever the file is changed by a connection that doesn't report its writes to the cache.
+        capacity: int
+            The maximal number of cached results.
+        entries: OrderedDict[tuple, tuple]
+            Cached results with the habit and the tables they depend on, from the least to the most recently used.
+        keys_by_habit: dict[str, set]
+            Keys of cached results by the habit they depend on. Results that depend on all habits are under None.
+        version: int
+            The version of the database file the cached results have been computed from.
+        generation: int
+            Number of invalidations. A result computed while an invalidation happened is not cached.
+        hits: int
+            Number of lookups answered from the cache.
+        misses: int
+            Number of lookups that queried the database.
+        invalidations: int
+            Number of results dropped because their data have changed.
+        evictions: int
+            Number of results dropped because the cache was full."""
+    def __init__(self, data_version, capacity: int = 256) -> None:
+        """
+        Parameters:
+            data_version: callable
+                Function that returns the version of the database file.
+            capacity: int, optional
+                The maximal number of cached results. Defaults to 256."""
+        self.data_version = data_version
+        self.capacity = capacity
+        self.entries: OrderedDict[tuple, tuple] = OrderedDict()
+        self.keys_by_habit: dict[str, set] = {}
+        self.version = None
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def return_result(self, key: tuple, habit_name: str, tables: tuple, query):
+        """
+        Returns the cached result of a query or runs the query and caches its result.
+
+        Parameters:
+            key: tuple
+                Hashable key of the query, e.g., the method name and its arguments.
+            habit_name: str
+                Name of the habit the result depends on or None if it depends on all habits.
+            tables: tuple
+                Tables the result is computed from.
+            query: callable
+                Function without parameters that computes the result."""
+        version = self.data_version()
+        with self.lock:
+            if version != self.version:
+                self.drop_entries(list(self.entries))
+                self.version = version
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+            generation = self.generation
+
+        result = query()
+        with self.lock:
+            if generation == self.generation and version == self.version:
+                self.entries[key] = (result, habit_name, tables)
+                self.keys_by_habit.setdefault(habit_name, set()).add(key)
+                while len(self.entries) > self.capacity:
+                    self.evictions += 1
+                    self.drop_entries([next(iter(self.entries))])
+        return result
+
+    def invalidate(self, habit_names: list = None, tables: tuple = TABLES) -> None:
+        """
+        Drops cached results that depend on changed data. Results that depend on all habits are dropped
+        whenever one of their tables changes.
+
+        Parameters:
+            habit_names: list, optional
+                Names of the changed habits. Defaults to all habits.
+            tables: tuple, optional
+                Changed tables. Defaults to all tables."""
+        with self.lock:
+            self.generation += 1
+            if habit_names is None:
+                keys = list(self.entries)
+            else:
+                keys = list(self.keys_by_habit.get(None, ()))
+                for habit_name in habit_names:
+                    keys.extend(self.keys_by_habit.get(habit_name, ()))
+            keys = [key for key in keys if not set(self.entries[key][2]).isdisjoint(tables)]
+            self.invalidations += len(keys)
+            self.drop_entries(keys)
+
+    def drop_entries(self, keys: list) -> None:
+        """
+        Removes results from the cache. Must be called under the lock.
+
+        Parameters:
+            keys: list
+                Keys of the results to be removed."""
+        for key in keys:
+            _, habit_name, _ = self.entries.pop(key)
+            habit_keys = self.keys_by_habit[habit_name]
+            habit_keys.discard(key)
+            if not habit_keys:
+                del self.keys_by_habit[habit_name]
+
+    def clear(self) -> None:
+        """
+        Drops all cached results. Counters are not reset.
+
+        No parameters."""
+        with self.lock:
+            self.generation += 1
+            self.drop_entries(list(self.entries))
+
+    def return_statistics(self) -> dict:
+        """
+        Returns counters of the cache: size, capacity, hits, misses, hit rate, invalidations and evictions.
+
+        No parameters."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions
+            }
+
+
+
+def cached_query(tables: tuple = TABLES, per_habit: bool = False):
+    """
+    Decorator of DatabaseAnalyzer methods that answers them from the analyzer cache if it is set.
+    Calls with unhashable arguments bypass the cache.
+
+    Parameters:
+        tables: tuple, optional
+            Tables the result of the method is computed from. Defaults to all tables.
+        per_habit: bool, optional
+            Whether the result depends only on the habit passed as the first argument (habit_name).
+            Defaults to False, i.e., the result depends on all habits."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.cache is None:
+                return method(self, *args, **kwargs)
+            key = (method.__name__, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                return method(self, *args, **kwargs)
+            habit_name = (args[0] if args else kwargs.get("habit_name")) if per_habit else None
+            return self.cache.return_result(key, habit_name, tables, lambda: method(self, *args, **kwargs))
+        return wrapper
+    return decorator
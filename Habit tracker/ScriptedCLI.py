@@ -0,0 +1,315 @@
+from HabitService import HabitService, QUERIES, UPDATABLE_CHARACTERISTICS
+from PeriodIndex import RANGE_CODES
+
+from collections import OrderedDict
+from sqlite3 import IntegrityError
+import argparse
+import shlex
+import json
+import sys
+
+"""
+This module runs operations of the application without prompts, as subcommands of HabitTrackingApp.py.
+Every command prints its result as a line of JSON. The batch command reads many commands (one per line,
+in the same syntax) from a file or from the standard input and runs them in one process: every database
+is opened once and writes are committed in groups instead of one by one.
+
+Example:
+    python HabitTrackingApp.py add "Read books" Day 30
+    python HabitTrackingApp.py checkoff "Read books"
+    python HabitTrackingApp.py analyze longest-streak
+    python HabitTrackingApp.py health
+    python HabitTrackingApp.py archive --days 365
+    python HabitTrackingApp.py verify --repair
+    python HabitTrackingApp.py batch commands.txt
+
+The scripted mode doesn't import the interactive interface, so a command starts in tens of milliseconds
+(see benchmark_startup.py)."""
+
+
+
+# Short names of frequent analysis queries. Other queries are named as DatabaseAnalyzer methods
+# without the \'return_\' prefix, with underscores or hyphens, e.g., \'habits-with-the-same-periodicity\'.
+QUERY_ALIASES = {
+    "tracked": ("currently_tracked_habits", ()),
+    "developed": ("developed_habits", ()),
+    "periodicity": ("habits_with_the_same_periodicity", ("periodicity",)),
+    "longest-streak": ("longest_streak_of_all_habits", ()),
+    "habit-longest-streak": ("longest_streaks_of_given_habit", ("habit_name",)),
+    "top": ("top_habits_by_streak", ()),
+    "info": ("detailed_information_about_habit", ("habit_name",)),
+    "due": ("due_habits", ()),
+    "overdue": ("overdue_habits", ()),
+    "at-risk": ("habits_at_risk", ("hours_amount",))
+}
+
+# Number of open databases kept by a batch that works with many users
+OPEN_DATABASES_LIMIT = 64
+
+# The maximal number of seconds writes of a batch wait for their commit
+BATCH_COMMIT_LATENCY = 1.0
+
+
+
+class CommandError(Exception):
+    """
+    Raised instead of exiting the program when a command of a batch can\'t be parsed."""
+
+
+
+class CommandParser(argparse.ArgumentParser):
+    """
+    Argument parser that raises CommandError on invalid commands instead of exiting the program."""
+    def error(self, message: str) -> None:
+        raise CommandError(message)
+
+
+
+def add_command_parsers(parser: argparse.ArgumentParser, batch: bool = True) -> None:
+    """
+    Adds the options and subcommands of the scripted mode to a parser.
+
+    Parameters:
+        parser: argparse.ArgumentParser
+            Parser of the command line or of a batch line.
+        batch: bool, optional
+            Whether to add the batch command. Defaults to True."""
+    parser.add_argument("--user", help="id of the user whose habits to work with")
+    parser.add_argument("--database", help="database to work with (defaults to AppDatabase.db)")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+
+    add = subparsers.add_parser("add", help="add a habit")
+    add.add_argument("name")
+    add.add_argument("periodicity", choices=list(RANGE_CODES))
+    add.add_argument("time_span", type=int)
+
+    update = subparsers.add_parser("update", help="change the periodicity or the time span of a habit")
+    update.add_argument("name")
+    update.add_argument("characteristic", choices=UPDATABLE_CHARACTERISTICS)
+    update.add_argument("value")
+
+    delete = subparsers.add_parser("delete", help="delete a habit with its history")
+    delete.add_argument("name")
+
+    check_off = subparsers.add_parser("checkoff", help="check off habits in order (a missing habit stops the command)")
+    check_off.add_argument("names", nargs="+", metavar="name")
+
+    history = subparsers.add_parser("history", help="show a page of the history of a habit")
+    history.add_argument("name")
+    history.add_argument("--rows", type=int, default=10, help="number of events on the page")
+    history.add_argument("--page-token", help="token of the page returned by an earlier command")
+    history.add_argument("--direction", choices=["next", "previous"], default="next")
+
+    analyze = subparsers.add_parser("analyze", help="run an analysis query",
+                                    description="Queries: " + ", ".join(list(QUERY_ALIASES) + sorted(QUERIES)))
+    analyze.add_argument("query")
+    analyze.add_argument("arguments", nargs="*",
+                         help="arguments of the query: values of its required parameters or name=value pairs")
+
+    subparsers.add_parser("health", help="check that the database can be opened and print its schema version")
+
+    archive = subparsers.add_parser("archive", help="move old check-offs to the archive of the database")
+    archive.add_argument("--days", type=int, default=365, help="number of recent days whose check-offs stay")
+
+    verify = subparsers.add_parser("verify", help="compare habits with the history of their check-offs")
+    verify.add_argument("--repair", action="store_true", help="overwrite inconsistent habits with replayed values")
+    verify.add_argument("--processes", type=int, help="number of processes replaying habits in parallel")
+
+    if batch:
+        batch_parser = subparsers.add_parser("batch", help="run commands from a file, one per line")
+        batch_parser.add_argument("file", nargs="?", default="-", help="file with commands, - for the standard input")
+        batch_parser.add_argument("--commit-every", type=int, default=1000,
+                                  help="the maximal number of writes committed together")
+        batch_parser.add_argument("--stop-on-error", action="store_true", help="stop at the first failed command")
+
+def return_parser() -> argparse.ArgumentParser:
+    """
+    Returns the parser of the command line of HabitTrackingApp.py. Without a command
+    the interactive application is started.
+
+    No parameters."""
+    parser = argparse.ArgumentParser(description="Habit tracker. Run without a command for the interactive mode.")
+    add_command_parsers(parser)
+    return parser
+
+def return_batch_line_parser() -> CommandParser:
+    """
+    Returns the parser of a line of a batch.
+
+    No parameters."""
+    parser = CommandParser(prog="batch line", add_help=False)
+    add_command_parsers(parser, batch=False)
+    return parser
+
+def return_database_name(args: argparse.Namespace) -> str:
+    """
+    Returns the name of the database a command works with.
+
+    Parameters:
+        args: argparse.Namespace
+            Parsed command."""
+    if args.user is not None:
+        # Only commands of users need the router module
+        from ShardRouter import return_shard_name
+        return return_shard_name(args.user)
+    return args.database or "AppDatabase.db"
+
+
+
+def return_query_arguments(query: str, arguments: list) -> tuple:
+    """
+    Returns the query name and its arguments by parameter name for the analyze command.
+
+    Parameters:
+        query: str
+            Alias or name of the query.
+        arguments: list
+            Values of the positional parameters of the alias and name=value pairs."""
+    query_name, positional = QUERY_ALIASES.get(query, (query.replace("-", "_"), ()))
+    values = {}
+    for argument in arguments:
+        if "=" in argument:
+            name, value = argument.split("=", 1)
+            values[name.replace("-", "_")] = value
+        elif len(values) < len(positional):
+            values[positional[len(values)]] = argument
+        else:
+            raise ValueError(f"Unexpected argument {argument!r} of the query {query}.")
+    return query_name, values
+
+def run_command(service: HabitService, args: argparse.Namespace):
+    """
+    Runs a parsed command (except batch) and returns its result.
+
+    Parameters:
+        service: HabitService
+            Service of the database the command works with.
+        args: argparse.Namespace
+            Parsed command."""
+    if args.command == "add":
+        return vars(service.add_habit(args.name, args.periodicity, args.time_span))
+    if args.command == "update":
+        value = args.value if args.characteristic == "periodicity" else int(args.value)
+        return vars(service.update_habit(args.name, args.characteristic, value))
+    if args.command == "delete":
+        service.delete_habit(args.name)
+        return {"deleted": args.name}
+    if args.command == "checkoff":
+        habits = [service.check_off_habit(name) for name in args.names]
+        return [dict(vars(habit), completed=habit.state == "Completed") for habit in habits]
+
+    if args.command == "archive":
+        return {"archived": service.archive_history(args.days)}
+    if args.command == "verify":
+        return service.verify_habits(args.repair, args.processes)
+
+    if args.command == "health":
+        from DatabaseMigrations import return_schema_version
+        return {"status": "ok", "database": service.database.name,
+                "schema_version": return_schema_version(service.database.database)}
+
+    # Queries read through other connections, so earlier writes of a batch are committed first
+    service.database.commit_pending_writes()
+    if args.command == "history":
+        history, next_token, previous_token = service.run_query("habit_history_page", {
+            "habit_name": args.name, "rows_amount": args.rows, "page_token": args.page_token,
+            "direction": args.direction})
+        return {"history": history, "next_page_token": next_token, "previous_page_token": previous_token}
+    query_name, arguments = return_query_arguments(args.query, args.arguments)
+    return service.run_query(query_name, arguments)
+
+def return_error_message(error: Exception) -> str:
+    """
+    Returns the message about a failed command.
+
+    Parameters:
+        error: Exception
+            Error raised by the command."""
+    if isinstance(error, KeyError):
+        return f"Not found: {error.args[0]}"
+    if isinstance(error, IntegrityError):
+        return "The habit already exists."
+    if isinstance(error, (CommandError, ValueError)):
+        return str(error)
+    # Unexpected errors, e.g., of a query, are reported with their type, since their message alone may be unclear
+    return f"{type(error).__name__}: {error}"
+
+
+
+def run_batch(lines, default_args: argparse.Namespace, commit_every: int = 1000,
+              stop_on_error: bool = False, output=sys.stdout) -> int:
+    """
+    Runs commands, one per line, and prints the result of every command as a line of JSON.
+    Empty lines and lines starting with # are skipped. Databases are opened once per batch,
+    and writes are committed in groups of up to commit_every writes (at least once a second). Returns the number of failed commands.
+
+    Parameters:
+        lines: iterable
+            Lines with commands, e.g., an open file.
+        default_args: argparse.Namespace
+            Parsed batch command whose --user and --database apply to lines without their own.
+        commit_every: int, optional
+            The maximal number of writes committed together. Defaults to 1000.
+        stop_on_error: bool, optional
+            Whether to stop at the first failed command. Defaults to False.
+        output: file, optional
+            File to print results to. Defaults to the standard output."""
+    parser = return_batch_line_parser()
+    services: OrderedDict[str, HabitService] = OrderedDict()
+    errors = 0
+    try:
+        for line_number, line in enumerate(lines, 1):
+            line = line.strip()
+            if line == "" or line.startswith("#"):
+                continue
+            try:
+                args = parser.parse_args(shlex.split(line))
+                if args.command is None:
+                    raise CommandError("a command is required")
+                if args.user is None and args.database is None:
+                    args.user, args.database = default_args.user, default_args.database
+                database_name = return_database_name(args)
+                if database_name not in services:
+                    services[database_name] = HabitService(database_name, BATCH_COMMIT_LATENCY,
+                                                           group_commit_size=commit_every)
+                    if len(services) > OPEN_DATABASES_LIMIT:
+                        services.popitem(last=False)[1].close()
+                services.move_to_end(database_name)
+                result = run_command(services[database_name], args)
+            # Any error fails only its own line, the rest of the batch still runs
+            except Exception as error:
+                errors += 1
+                print(json.dumps({"line": line_number, "error": return_error_message(error)}), file=sys.stderr)
+                if stop_on_error:
+                    break
+                continue
+            print(json.dumps({"line": line_number, "result": result}), file=output)
+    finally:
+        for service in services.values():
+            service.close()
+    return errors
+
+def run_scripted(args: argparse.Namespace) -> int:
+    """
+    Runs the command of the command line and returns the exit status of the program.
+
+    Parameters:
+        args: argparse.Namespace
+            Parsed command line."""
+    if args.command == "batch":
+        if args.file == "-":
+            errors = run_batch(sys.stdin, args, args.commit_every, args.stop_on_error)
+        else:
+            with open(args.file) as file:
+                errors = run_batch(file, args, args.commit_every, args.stop_on_error)
+        return 1 if errors else 0
+
+    service = HabitService(return_database_name(args))
+    try:
+        print(json.dumps(run_command(service, args)))
+    except Exception as error:
+        print(json.dumps({"error": return_error_message(error)}), file=sys.stderr)
+        return 1
+    finally:
+        service.close()
+    return 0
@@ -0,0 +1,300 @@
+from DatabaseAnalyzer import DatabaseAnalyzer
+from Database import Database
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import islice
+import threading
+import re
+import os
+
+"""
+This module hosts habits of many users. Every user has a database file of their own (a shard),
+so users don't compete for the write lock of one big file and a shard never grows beyond the history of one user.
+The router maps user ids to shard files, opens shards on first use and keeps only a bounded number of them open,
+closing the least recently used ones. Shards are opened and closed outside the lock of the router, so opening
+the database of one user (and running its migrations) doesn't hold up users whose shards are open.
+
+Example:
+    router = ShardRouter("user_databases", capacity=256)
+    with router.shard("alice") as shard:
+        shard.database.insert_habit_to_database(habit)
+        habits = shard.analyzer.return_currently_tracked_habits()"""
+
+
+
+# User ids are used in file names, so only these characters are allowed
+USER_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+# Default directory with shard files
+SHARD_DIRECTORY = "user_databases"
+
+
+
+def return_shard_name(user_id: str, directory: str = SHARD_DIRECTORY) -> str:
+    """
+    Returns the name of the shard file of a user. Neither the directory nor the file is created.
+
+    Parameters:
+        user_id: str
+            Id of the user: up to 64 Latin letters, digits, underscores and hyphens.
+        directory: str, optional
+            Directory with shard files. Defaults to SHARD_DIRECTORY."""
+    if not isinstance(user_id, str) or USER_ID_PATTERN.fullmatch(user_id) is None:
+        raise ValueError(f"Invalid user id {user_id!r}.")
+    return os.path.join(directory, f"{user_id}.db")
+
+
+
+class Shard:
+    """
+    A class to represent a shard: the database of one user and its analyzer. The router puts a shard into its map
+    before opening it, so other threads that want the same shard wait for it to be opened.
+
+    Attributes:
+        user_id: str
+            Id of the user who owns the shard.
+        database_name: str
+            Name of the shard file.
+        database: Database
+            Database of the user or None until the shard is opened.
+        analyzer: DatabaseAnalyzer
+            Analyzer of the database that shares its read-only connections or None until the shard is opened.
+        users: int
+            Number of threads currently using the shard. A shard in use is never closed by the router.
+        opened: threading.Event
+            Event set once the shard has been opened or has failed to open.
+        closed: threading.Event
+            Event set once the shard has been closed.
+        error: Exception
+            Error raised while opening the shard or None."""
+    def __init__(self, user_id: str, database_name: str, group_commit_latency: float = None,
+                 cache_capacity: int = None) -> None:
+        """
+        Parameters:
+            user_id: str
+                Id of the user who owns the shard.
+            database_name: str
+                Name of the shard file.
+            group_commit_latency: float, optional
+                See Database. Defaults to committing every write at once.
+            cache_capacity: int, optional
+                Capacity of the query result cache of the analyzer. Defaults to no cache."""
+        self.user_id = user_id
+        self.database_name = database_name
+        self.group_commit_latency = group_commit_latency
+        self.cache_capacity = cache_capacity
+        self.database = None
+        self.analyzer = None
+        self.users = 0
+        self.opened = threading.Event()
+        self.closed = threading.Event()
+        self.error = None
+
+    def open(self) -> None:
+        """
+        Opens the database of the shard (and creates its file) and its analyzer.
+
+        No parameters."""
+        try:
+            self.database = Database(self.database_name, self.group_commit_latency)
+            cache = None if self.cache_capacity is None else self.database.return_query_cache(self.cache_capacity)
+            self.analyzer = DatabaseAnalyzer(self.database_name, self.database.return_read_pool(), cache,
+                                             self.database.clock)
+        except Exception as error:
+            self.error = error
+            raise
+        finally:
+            self.opened.set()
+
+    def close(self) -> None:
+        """
+        Commits pending writes and closes all connections of the shard.
+
+        No parameters."""
+        try:
+            if self.database is not None:
+                self.database.disconnect_database()
+        finally:
+            self.closed.set()
+
+
+
+class ShardRouter:
+    """
+    A class to represent the router of users to their shards.
+
+    Attributes:
+        directory: str
+            Directory with shard files.
+        capacity: int
+            The maximal number of open shards. Shards in use are not closed, so the limit may be exceeded
+            while more shards than that are used at once.
+        group_commit_latency: float
+            Group commit latency of shard databases, see Database.
+        cache_capacity: int
+            Capacity of query result caches of shard analyzers or None for no cache.
+        shards: OrderedDict[str, Shard]
+            Open shards (and shards being opened) by user id, from the least to the most recently used.
+        closing_shards: dict[str, Shard]
+            Shards being closed by user id. A shard of the same user is opened only after they are closed.
+        lock: threading.Lock
+            Lock of the maps of shards and of the numbers of their users."""
+    def __init__(self, directory: str = SHARD_DIRECTORY, capacity: int = 64,
+                 group_commit_latency: float = None, cache_capacity: int = None) -> None:
+        """
+        Parameters:
+            directory: str, optional
+                Directory with shard files. It is created if needed. Defaults to \'user_databases\'.
+            capacity: int, optional
+                The maximal number of open shards. Defaults to 64.
+            group_commit_latency: float, optional
+                Group commit latency of shard databases, see Database. Defaults to committing every write at once.
+            cache_capacity: int, optional
+                Capacity of query result caches of shard analyzers. Defaults to no cache."""
+        self.directory = directory
+        self.capacity = capacity
+        self.group_commit_latency = group_commit_latency
+        self.cache_capacity = cache_capacity
+        self.shards: OrderedDict[str, Shard] = OrderedDict()
+        self.closing_shards: dict[str, Shard] = {}
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def return_shard_name(self, user_id: str) -> str:
+        """
+        Returns the name of the shard file of a user in the directory of the router, see return_shard_name.
+
+        Parameters:
+            user_id: str
+                Id of the user: up to 64 Latin letters, digits, underscores and hyphens."""
+        return return_shard_name(user_id, self.directory)
+
+    def acquire_shard(self, user_id: str) -> Shard:
+        """
+        Returns the shard of a user and marks it as used. Opens the shard (and creates its file) if needed
+        and closes the least recently used shards that are not in use if too many shards are open.
+        Shards are opened and closed outside the lock; threads that want a shard being opened wait for it.
+        Every acquired shard must be released with release_shard.
+
+        Parameters:
+            user_id: str
+                Id of the user."""
+        database_name = self.return_shard_name(user_id)
+        with self.lock:
+            shard = self.shards.get(user_id)
+            opening = shard is None
+            if opening:
+                shard = Shard(user_id, database_name, self.group_commit_latency, self.cache_capacity)
+                self.shards[user_id] = shard
+                closing_shard = self.closing_shards.get(user_id)
+            self.shards.move_to_end(user_id)
+            shard.users += 1
+            evicted_shards = self.evict_shards()
+        self.close_shards(evicted_shards)
+
+        if opening:
+            # The previous shard of the user commits its pending writes before the file is opened again
+            if closing_shard is not None:
+                closing_shard.closed.wait()
+            try:
+                shard.open()
+            except Exception:
+                with self.lock:
+                    if self.shards.get(user_id) is shard:
+                        del self.shards[user_id]
+                    shard.users -= 1
+                raise
+        else:
+            shard.opened.wait()
+            if shard.error is not None:
+                with self.lock:
+                    shard.users -= 1
+                raise shard.error
+        return shard
+
+    def release_shard(self, shard: Shard) -> None:
+        """
+        Marks a shard taken by acquire_shard as no longer used by the caller.
+
+        Parameters:
+            shard: Shard
+                Shard to be released."""
+        with self.lock:
+            shard.users -= 1
+            evicted_shards = self.evict_shards()
+        self.close_shards(evicted_shards)
+
+    @contextmanager
+    def shard(self, user_id: str):
+        """
+        Context manager that acquires the shard of a user and releases it afterwards.
+        Example: with router.shard(user_id) as shard: shard.database.insert_habit_to_database(habit)
+
+        Parameters:
+            user_id: str
+                Id of the user."""
+        shard = self.acquire_shard(user_id)
+        try:
+            yield shard
+        finally:
+            self.release_shard(shard)
+
+    def evict_shards(self) -> list:
+        """
+        Removes the least recently used shards that are not in use until no more than capacity shards are open
+        and returns them. They must be closed with close_shards after the lock is released.
+        Must be called under the lock.
+
+        No parameters."""
+        excess = len(self.shards) - self.capacity
+        if excess <= 0:
+            return []
+        idle_user_ids = islice((user_id for user_id, shard in self.shards.items() if shard.users == 0), excess)
+        evicted_shards = [self.shards.pop(user_id) for user_id in list(idle_user_ids)]
+        for shard in evicted_shards:
+            self.closing_shards[shard.user_id] = shard
+        return evicted_shards
+
+    def close_shards(self, shards: list) -> None:
+        """
+        Closes shards removed by evict_shards. Must be called without the lock.
+
+        Parameters:
+            shards: list[Shard]
+                Shards to be closed."""
+        for shard in shards:
+            # The router may be closed while a shard is still being opened
+            shard.opened.wait()
+            try:
+                shard.close()
+            finally:
+                with self.lock:
+                    if self.closing_shards.get(shard.user_id) is shard:
+                        del self.closing_shards[shard.user_id]
+
+    def return_user_ids(self) -> list:
+        """
+        Returns ids of all users who have a shard, including users whose shards are closed.
+
+        No parameters."""
+        return sorted(os.path.splitext(file_name)[0] for file_name in os.listdir(self.directory)
+                      if file_name.endswith(".db"))
+
+    def close(self) -> None:
+        """
+        Closes all open shards.
+
+        No parameters."""
+        with self.lock:
+            shards = list(self.shards.values())
+            self.shards.clear()
+            for shard in shards:
+                self.closing_shards[shard.user_id] = shard
+        self.close_shards(shards)
+
+    def __enter__(self) -> "ShardRouter":
+        return self
+
+    def __exit__(self, *exception_info) -> None:
+        self.close()
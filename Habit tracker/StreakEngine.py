@@ -0,0 +1,180 @@
+from DatabaseAnalyzer import DatabaseAnalyzer
+from PeriodIndex import RANGE_CODES
+
+import numpy as np
+
+
+
+def return_calendar_fields(moments: np.ndarray) -> np.ndarray:
+    """
+    Returns the calendar fields of every moment as an array with the shape (n, 5). Columns are
+    hour, day of month, ISO week number, month and year, i.e., the same values and order
+    as PeriodIndex.return_calendar_fields returns.
+
+    Parameters:
+        moments: np.ndarray
+            Check-off moments, any array convertible to \'datetime64[s]\'."""
+    moments = np.asarray(moments).astype("datetime64[s]")
+    days = moments.astype("datetime64[D]")
+    months = moments.astype("datetime64[M]")
+    years = moments.astype("datetime64[Y]")
+
+    hours = (moments - days).astype(np.int64) // 3600
+    days_of_month = (days - months).astype(np.int64) + 1
+    months_of_year = months.astype(np.int64) % 12 + 1
+    years = years.astype(np.int64) + 1970
+
+    # ISO week number is the number of the week containing the Thursday of the same (Monday-based) week.
+    # 1970-01-01 was a Thursday, so the weekday of a day number d is (d + 3) % 7 with Monday = 0.
+    day_numbers = days.astype(np.int64)
+    thursdays = day_numbers - (day_numbers + 3) % 7 + 3
+    iso_year_starts = thursdays.astype("datetime64[D]").astype("datetime64[Y]").astype("datetime64[D]")
+    weeks = (thursdays - iso_year_starts.astype(np.int64)) // 7 + 1
+    return np.stack([hours, days_of_month, weeks, months_of_year, years], axis=1)
+
+def return_period_indices_of_many(timestamps: np.ndarray) -> np.ndarray:
+    """
+    Returns period indices of every timestamp as an array with the shape (n, 5). 
+    Columns are the same values as PeriodIndex.return_period_indices returns: ordinals of the hour, day, 
+    ISO week and month, and the year.
+
+    Parameters:
+        timestamps: np.ndarray
+            Timestamps as integers (see PeriodIndex.py)."""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    moments = timestamps.astype("datetime64[s]")
+    days = timestamps // 86400
+    return np.stack([timestamps // 3600,
+                     days,
+                     (days + 3) // 7,
+                     moments.astype("datetime64[M]").astype(np.int64),
+                     moments.astype("datetime64[Y]").astype(np.int64) + 1970], axis=1)
+
+
+
+def compute_streaks_of_many(habit_indices: np.ndarray, moments: np.ndarray,
+                            periodicities: list, time_spans: np.ndarray) -> dict:
+    """
+    Computes streaks of many habits in one vectorized pass. Each check-off follows the rules of
+    Habit.check_off_habit: if the time difference between two consecutive check-offs exceeds the habit
+    periodicity, the streak is reset and then increased by 1. A habit is completed once its longest streak
+    reaches its time span.
+
+    Returns a dictionary with per check-off arrays \'streaks\', \'longest_streaks\', \'break_points\'
+    (True where the streak has been reset) and per habit arrays \'current_streak\', \'longest_streak\',
+    \'breaks\' (number of resets), \'completed\' and \'completed_at\' (index of the completing check-off or -1).
+
+    Parameters:
+        habit_indices: np.ndarray
+            Index of the habit (0..number of habits - 1) each check-off belongs to. Check-offs of the same
+            habit have to be contiguous and ordered by time, e.g., \'ORDER BY name, end_timestamp\'.
+        moments: np.ndarray
+            Check-off moments, any array convertible to \'datetime64[s]\'.
+        periodicities: list
+            Periodicity (\'Hour\'/\'Day\'/etc.) of every habit.
+        time_spans: np.ndarray
+            Time span of every habit."""
+    habit_indices = np.asarray(habit_indices, dtype=np.int64)
+    codes = np.array([RANGE_CODES[periodicity] for periodicity in periodicities], dtype=np.int64)
+    time_spans = np.asarray(time_spans, dtype=np.int64)
+    habits_amount = len(codes)
+    events_amount = len(habit_indices)
+
+    summary = {
+        "current_streak": np.zeros(habits_amount, dtype=np.int64),
+        "longest_streak": np.zeros(habits_amount, dtype=np.int64),
+        "breaks": np.zeros(habits_amount, dtype=np.int64),
+        "completed": np.zeros(habits_amount, dtype=bool),
+        "completed_at": np.full(habits_amount, -1, dtype=np.int64)
+    }
+    if events_amount == 0:
+        summary.update(streaks=np.zeros(0, dtype=np.int64), longest_streaks=np.zeros(0, dtype=np.int64),
+                       break_points=np.zeros(0, dtype=bool))
+        return summary
+
+    # A field takes part in the comparison if it is not finer than the habit periodicity
+    fields = return_calendar_fields(moments)
+    compared_fields = np.arange(5)[None, :] >= (5 - codes[habit_indices[1:]])[:, None]
+    exceeded = ((np.abs(np.diff(fields, axis=0)) > 1) & compared_fields).any(axis=1)
+
+    new_habit = np.concatenate(([True], habit_indices[1:] != habit_indices[:-1]))
+    break_points = np.concatenate(([False], exceeded)) & ~new_habit
+    streak_starts = new_habit | break_points
+
+    positions = np.arange(events_amount)
+    streaks = positions - np.maximum.accumulate(np.where(streak_starts, positions, 0)) + 1
+
+    # Running maximum inside each habit: shifting every habit by a value greater than any streak
+    # makes a single accumulate over the whole array never cross the border between habits.
+    offsets = (np.cumsum(new_habit) - 1) * (events_amount + 1)
+    longest_streaks = np.maximum.accumulate(streaks + offsets) - offsets
+
+    last_events = np.concatenate((new_habit[1:], [True]))
+    habits = habit_indices[last_events]
+    summary["current_streak"][habits] = streaks[last_events]
+    summary["longest_streak"][habits] = longest_streaks[last_events]
+    summary["breaks"] += np.bincount(habit_indices[break_points], minlength=habits_amount)
+
+    # Habit.complete_habit marks the habit completed when the longest streak is equal to the time span
+    completions = np.flatnonzero(longest_streaks == time_spans[habit_indices])
+    completed_habits, first_completions = np.unique(habit_indices[completions], return_index=True)
+    summary["completed"][completed_habits] = True
+    summary["completed_at"][completed_habits] = completions[first_completions]
+
+    summary.update(streaks=streaks, longest_streaks=longest_streaks, break_points=break_points)
+    return summary
+
+def compute_streaks(moments: np.ndarray, periodicity: str, time_span: int) -> dict:
+    """
+    Computes streaks of a single habit. Returns the same dictionary as compute_streaks_of_many
+    but with per habit values as plain numbers and the habit \'state\'.
+
+    Parameters:
+        moments: np.ndarray
+            Check-off moments of the habit ordered by time.
+        periodicity: str
+            Periodicity of the habit.
+        time_span: int
+            Time span of the habit."""
+    moments = np.asarray(moments)
+    summary = compute_streaks_of_many(np.zeros(len(moments), dtype=np.int64), moments,
+                                      [periodicity], [time_span])
+    for key in ("current_streak", "longest_streak", "breaks", "completed", "completed_at"):
+        summary[key] = summary[key][0].item()
+    summary["state"] = "Completed" if summary["completed"] else "In progress"
+    return summary
+
+
+
+def compute_streaks_from_database(analyzer: DatabaseAnalyzer, habit_names: list = None) -> dict:
+    """
+    Recomputes streaks of habits from their check-off history stored in \'habits_log\'.
+    Returns a dictionary that maps habit name to its current streak, longest streak, number of breaks and state.
+    Habits that have never been checked off are omitted.
+
+    Parameters:
+        analyzer: DatabaseAnalyzer
+            Analyzer that retrieves check-off history from the database.
+        habit_names: list, optional
+            Names of habits to be processed. Defaults to all habits."""
+    log = analyzer.return_check_off_log(habit_names)
+    if log == []:
+        return {}
+    names, periodicities, time_spans, end_timestamps = zip(*log)
+    names = np.array(names)
+    moments = np.array(end_timestamps, dtype=np.int64).astype("datetime64[s]")
+
+    new_habit = np.concatenate(([True], names[1:] != names[:-1]))
+    first_events = np.flatnonzero(new_habit)
+    habit_indices = np.cumsum(new_habit) - 1
+    summary = compute_streaks_of_many(habit_indices, moments,
+                                      [periodicities[i] for i in first_events],
+                                      [time_spans[i] for i in first_events])
+    return {
+        str(names[event]): {
+            "current_streak": int(summary["current_streak"][habit]),
+            "longest_streak": int(summary["longest_streak"][habit]),
+            "breaks": int(summary["breaks"][habit]),
+            "state": "Completed" if summary["completed"][habit] else "In progress"
+        } for habit, event in enumerate(first_events)
+    }
@@ -0,0 +1,218 @@
+from PeriodIndex import RANGE_CODES, return_next_period_start, return_timestamp, return_datetime
+from PredefinedHabits import BREAK_PROBABILITIES
+from DeadlineScheduler import DeadlineScheduler
+from HistoryReplay import replay_habits
+from HabitService import HabitService
+from Clock import SimulatedClock
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+import tempfile
+import argparse
+import random
+import heapq
+import time
+import json
+import sys
+import os
+
+"""
+This module soak-tests the application with virtual users who check off their habits for months of simulated time.
+Habits are added and checked off through HabitService, the streaks of abandoned habits are reset by
+DeadlineScheduler, all on a simulated clock (see Clock.py), so the simulation runs the same code as real users
+as fast as the database allows. Every user performs each habit once in a period at a random moment,
+except for periods the user misses (see PredefinedHabits.BREAK_PROBABILITIES), until the habit is completed.
+In the end the habits are replayed from their history (see HistoryReplay.py), and any discrepancy
+means that streaks of the real check-off path are wrong.
+
+Users are split among processes, and each process simulates its users in a database of its own.
+
+Example:
+    python TimeSimulator.py --users 1000 --habits-per-user 5 --days 90 --processes 4"""
+
+
+
+# Simulated time starts at the beginning of an hour, a day, a week (Monday), a month and a year
+START_DATETIME = datetime(2024, 1, 1)
+
+# Seconds between runs of the scheduler in simulated time
+SCHEDULER_INTERVAL = 3600
+
+
+
+def return_first_check_off(generator: random.Random, period_start: int, periodicity: str,
+                           break_probability: float) -> tuple:
+    """
+    Returns the timestamp of the first check-off at or after the beginning of a period and the beginning
+    of the period it is made in. Every period is missed with the given probability.
+
+    Parameters:
+        generator: random.Random
+            Random generator of the user.
+        period_start: int
+            Timestamp of the beginning of the first period the habit may be checked off in.
+        periodicity: str
+            Periodicity of the habit.
+        break_probability: float
+            Probability to miss a period."""
+    while generator.random() < break_probability:
+        period_start = return_next_period_start(period_start, periodicity)
+    period_end = return_next_period_start(period_start, periodicity)
+    return generator.randrange(period_start, period_end), period_start
+
+def simulate_users(database_name: str, user_numbers: range, habits_per_user: int, days: int, seed: int = 0,
+                   break_probabilities: dict = None) -> dict:
+    """
+    Simulates the users in a new database and returns the numbers of check-offs, resets and discrepancies
+    and the duration of the simulation in seconds.
+
+    Parameters:
+        database_name: str
+            Name of the database. It must not exist.
+        user_numbers: range
+            Numbers of simulated users. Habit i of user u is called 'user-u habit i'.
+        habits_per_user: int
+            Number of habits of every user.
+        days: int
+            Number of simulated days.
+        seed: int, optional
+            Seed of the random generator. Every user gets a generator of its own, so the history of a user
+            doesn't depend on the split among processes. Defaults to 0.
+        break_probabilities: dict, optional
+            Probability to miss a period for every periodicity. Defaults to BREAK_PROBABILITIES."""
+    if break_probabilities is None:
+        break_probabilities = BREAK_PROBABILITIES
+    start = time.perf_counter()
+    clock = SimulatedClock(START_DATETIME)
+    # Groups are committed when they are full or before the scheduler runs, not after a latency of real time,
+    # so the simulation is repeatable
+    service = HabitService(database_name, clock=clock, manual_commit=True)
+    scheduler = DeadlineScheduler(service.database)
+    start_timestamp = return_timestamp(START_DATETIME)
+    end_timestamp = start_timestamp + days * 86400
+
+    # Min-heap of (timestamp, habit name, beginning of its period, periodicity, random generator of the user)
+    check_offs = []
+    for user in user_numbers:
+        generator = random.Random(f"{seed} {user}")
+        for i in range(habits_per_user):
+            periodicity = generator.choice(list(RANGE_CODES))
+            habit = service.add_habit(f"user-{user} habit {i}", periodicity, generator.randint(1, 60))
+            timestamp, period_start = return_first_check_off(generator, start_timestamp, periodicity,
+                                                             break_probabilities[periodicity])
+            check_offs.append((timestamp, habit.name, period_start, periodicity, generator))
+    heapq.heapify(check_offs)
+
+    check_offs_amount, resets_amount = 0, 0
+    next_run = start_timestamp + SCHEDULER_INTERVAL
+    # Habit.check_time_excess prints a message about every broken streak
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        while check_offs and check_offs[0][0] < end_timestamp:
+            timestamp, name, period_start, periodicity, generator = heapq.heappop(check_offs)
+            while next_run <= timestamp:
+                clock.move_to(return_datetime(next_run))
+                service.database.commit_pending_writes()
+                reset = scheduler.reset_broken_streaks()
+                with service.lock:
+                    for reset_name in reset:
+                        service.habit_container.discard(reset_name)
+                resets_amount += len(reset)
+                next_run += SCHEDULER_INTERVAL
+
+            clock.move_to(return_datetime(timestamp))
+            habit = service.check_off_habit(name)
+            check_offs_amount += 1
+            if habit.state != "Completed":
+                next_timestamp, next_period_start = return_first_check_off(
+                    generator, return_next_period_start(period_start, periodicity), periodicity,
+                    break_probabilities[periodicity])
+                heapq.heappush(check_offs, (next_timestamp, name, next_period_start, periodicity, generator))
+
+        clock.move_to(return_datetime(end_timestamp))
+        service.database.commit_pending_writes()
+        resets_amount += len(scheduler.reset_broken_streaks())
+    duration = time.perf_counter() - start
+
+    discrepancies = replay_habits(service.database)
+    service.close()
+    return {"users": len(user_numbers), "habits": len(user_numbers) * habits_per_user,
+            "check_offs": check_offs_amount, "resets": resets_amount,
+            "discrepancies": [discrepancy._asdict() for discrepancy in discrepancies], "duration": duration}
+
+def run_simulation(users_amount: int, habits_per_user: int, days: int, directory: str, processes: int = None,
+                   seed: int = 0, break_probabilities: dict = None) -> dict:
+    """
+    Simulates the users in groups, one database per group, and returns the total numbers of check-offs,
+    resets and discrepancies, the wall time in seconds and the throughput in check-offs per second.
+
+    Parameters:
+        users_amount: int
+            Number of simulated users.
+        habits_per_user: int
+            Number of habits of every user.
+        days: int
+            Number of simulated days.
+        directory: str
+            Directory for the databases of the groups.
+        processes: int, optional
+            Number of processes simulating groups in parallel. Defaults to simulating all users
+            in the current process.
+        seed: int, optional
+            Seed of the random generator. Defaults to 0.
+        break_probabilities: dict, optional
+            Probability to miss a period for every periodicity. Defaults to BREAK_PROBABILITIES."""
+    groups_amount = 1 if processes is None else max(min(processes, users_amount), 1)
+    bounds = [users_amount * group // groups_amount for group in range(groups_amount + 1)]
+    groups = [range(bounds[group], bounds[group + 1]) for group in range(groups_amount)]
+    arguments = ([os.path.join(directory, f"SimulatedDatabase{group}.db") for group in range(groups_amount)],
+                 groups, [habits_per_user] * groups_amount, [days] * groups_amount, [seed] * groups_amount,
+                 [break_probabilities] * groups_amount)
+
+    start = time.perf_counter()
+    if processes is None:
+        results = list(map(simulate_users, *arguments))
+    else:
+        with ProcessPoolExecutor(processes) as executor:
+            results = list(executor.map(simulate_users, *arguments))
+    wall_time = time.perf_counter() - start
+
+    check_offs_amount = sum(result["check_offs"] for result in results)
+    return {"users": users_amount, "habits": users_amount * habits_per_user, "days": days,
+            "check_offs": check_offs_amount, "resets": sum(result["resets"] for result in results),
+            "discrepancies": [discrepancy for result in results for discrepancy in result["discrepancies"]],
+            "wall_time": wall_time, "check_offs_per_second": check_offs_amount / wall_time if wall_time else 0.0}
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulates users of the Habit tracker in fast-forwarded time.")
+    parser.add_argument("--users", type=int, default=1000, help="number of simulated users")
+    parser.add_argument("--habits-per-user", type=int, default=5, help="number of habits of every user")
+    parser.add_argument("--days", type=int, default=90, help="number of simulated days")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(),
+                        help="number of processes simulating users (defaults to the number of CPUs)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random generator")
+    parser.add_argument("--directory", help="directory to keep the databases in (defaults to a temporary one)")
+    parser.add_argument("--output", help="file to write results to as JSON")
+    args = parser.parse_args()
+
+    if args.directory is None:
+        with tempfile.TemporaryDirectory() as directory:
+            results = run_simulation(args.users, args.habits_per_user, args.days, directory, args.processes,
+                                     args.seed)
+    else:
+        os.makedirs(args.directory, exist_ok=True)
+        results = run_simulation(args.users, args.habits_per_user, args.days, args.directory, args.processes,
+                                 args.seed)
+
+    print(f"{results['users']} users with {results['habits']} habits over {results['days']} days: "
+          f"{results['check_offs']} check-offs and {results['resets']} reset streaks in {results['wall_time']:.1f} s "
+          f"({results['check_offs_per_second']:.0f} check-offs per second).")
+    for discrepancy in results["discrepancies"]:
+        print(f"{discrepancy['name']}: stored {discrepancy['stored']}, replayed {discrepancy['replayed']}")
+    print(f"{len(results['discrepancies'])} habits differ from their history.")
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+    sys.exit(1 if results["discrepancies"] else 0)
@@ -0,0 +1,277 @@
+from HabitAnalytics import return_check_off_columns, compute_completion_rates, compute_heatmaps, compute_streak_lengths
+from PredefinedHabits import load_synthetic_history
+from DatabaseAnalyzer import DatabaseAnalyzer
+from Clock import SimulatedClock
+from Database import Database
+from Habit import Habit
+
+from datetime import datetime
+import statistics
+import argparse
+import platform
+import inspect
+import sqlite3
+import time
+import json
+import sys
+import os
+
+"""
+This module measures performance of Database, DatabaseAnalyzer and the check-off path on synthetic databases
+of several sizes. Results are written to a JSON file that can be compared with results of an earlier run
+(the baseline) to find regressions.
+
+Example:
+    python benchmark_application.py --scales 1e3 1e5 --output new.json --baseline old.json"""
+
+
+
+# Number of periods every synthetic habit is tracked for. The number of habits is derived from the scale.
+PERIODS_AMOUNT = 200
+
+def return_benchmark_arguments(habit_name: str) -> dict:
+    """
+    Returns values for parameters of the benchmarked methods, by parameter name.
+
+    Parameters:
+        habit_name: str
+            Name of an existing habit with history."""
+    return {
+        "habit_name": habit_name,
+        "habit_names": [habit_name],
+        "periodicity": "Day",
+        "state": "In progress"
+    }
+
+
+
+def prepare_database(directory: str, rows_amount: int) -> str:
+    """
+    Creates a synthetic database with approximately the given number of \'habits_log\' rows
+    or reuses the one created by an earlier run. Returns its name.
+
+    Parameters:
+        directory: str
+            Directory for benchmark databases.
+        rows_amount: int
+            Approximate number of rows in \'habits_log\'."""
+    os.makedirs(directory, exist_ok=True)
+    database_name = os.path.join(directory, f"BenchmarkDatabase_{rows_amount}.db")
+    if os.path.exists(database_name):
+        return database_name
+    database = Database(database_name)
+    habits_amount = max(1, rows_amount // PERIODS_AMOUNT)
+    load_synthetic_history(database, habits_amount, PERIODS_AMOUNT, seed=0,
+                           processes=os.cpu_count() if habits_amount >= 10000 else None)
+    database.disconnect_database()
+    return database_name
+
+def measure(function, repeat: int, setup=None) -> dict:
+    """
+    Calls the function several times and returns the minimal and the median duration of a call in seconds.
+
+    Parameters:
+        function: callable
+            Function without parameters to be measured.
+        repeat: int
+            Number of calls.
+        setup: callable, optional
+            Function called before every call, not measured."""
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return {"min": min(durations), "median": statistics.median(durations)}
+
+
+
+def benchmark_analyzer(analyzer: DatabaseAnalyzer, habit_name: str, repeat: int) -> dict:
+    """
+    Measures every DatabaseAnalyzer.return_* method. Methods with required parameters
+    that return_benchmark_arguments doesn't know are skipped.
+
+    Parameters:
+        analyzer: DatabaseAnalyzer
+            Analyzer of the benchmark database.
+        habit_name: str
+            Name of an existing habit with history.
+        repeat: int
+            Number of calls of every method."""
+    arguments = return_benchmark_arguments(habit_name)
+    results = {}
+    for name, method in inspect.getmembers(analyzer, inspect.ismethod):
+        if not name.startswith("return_"):
+            continue
+        parameters = [parameter for parameter in inspect.signature(method).parameters.values()
+                      if parameter.default is inspect.Parameter.empty]
+        if any(parameter.name not in arguments for parameter in parameters):
+            print(f"Skipping DatabaseAnalyzer.{name}: unknown parameters.", file=sys.stderr)
+            continue
+        values = {parameter.name: arguments[parameter.name] for parameter in parameters}
+        results[f"DatabaseAnalyzer.{name}"] = measure(lambda: method(**values), repeat)
+    return results
+
+def benchmark_database(database: Database, habit_name: str, repeat: int) -> dict:
+    """
+    Measures writing methods of the Database class. Habits created by the benchmark are deleted afterwards.
+
+    Parameters:
+        database: Database
+            Benchmark database.
+        habit_name: str
+            Name of an existing habit with history.
+        repeat: int
+            Number of calls of every method."""
+    results = {}
+    counter = iter(range(10**9))
+    habits = []
+
+    def insert_habit() -> None:
+        habits.append(Habit(f"Benchmark habit {next(counter)}", "Day", 10))
+        database.insert_habit_to_database(habits[-1])
+    results["Database.insert_habit_to_database"] = measure(insert_habit, repeat)
+
+    habit_obj = habits[0]
+    habit_obj.check_off_habit()
+    results["Database.update_habit_logs"] = measure(lambda: database.update_habit_logs(habit_obj), repeat)
+    results["Database.check_off_habit_in_database"] = measure(
+        lambda: database.check_off_habit_in_database(habit_obj), repeat)
+
+    # Every deletion removes a habit with as many log rows as the existing habit has
+    history_length = len(database.database.execute("SELECT 1 FROM habits_log WHERE name = ?",
+                                                   (habit_name,)).fetchall())
+    def insert_habit_with_history() -> None:
+        insert_habit()
+        database.insert_rows_to_database([], [(habits[-1].name, 1, 1, 0, 0, 0, 0, 0, 1970)] * history_length)
+    def delete_habit() -> None:
+        database.delete_habit_from_database(habits.pop().name)
+    results["Database.delete_habit_from_database"] = measure(delete_habit, repeat, setup=insert_habit_with_history)
+
+    for habit in habits:
+        database.delete_habit_from_database(habit.name)
+    return results
+
+def benchmark_analytics(analyzer: DatabaseAnalyzer, repeat: int) -> dict:
+    """
+    Measures trends of HabitAnalytics over the whole history, each together with reading the history.
+
+    Parameters:
+        analyzer: DatabaseAnalyzer
+            Analyzer of the benchmark database without a query cache.
+        repeat: int
+            Number of calls of every function."""
+    def read_columns() -> dict:
+        return return_check_off_columns(analyzer)
+    return {
+        "HabitAnalytics.return_check_off_columns": measure(read_columns, repeat),
+        "HabitAnalytics.compute_completion_rates": measure(
+            lambda: compute_completion_rates(read_columns(), "Month"), repeat),
+        "HabitAnalytics.compute_heatmaps": measure(lambda: compute_heatmaps(read_columns()), repeat),
+        "HabitAnalytics.compute_streak_lengths": measure(
+            lambda: compute_streak_lengths(read_columns()), repeat)
+    }
+
+def benchmark_check_off(repeat: int) -> dict:
+    """
+    Measures Habit.check_off_habit for a habit checked off once a day.
+
+    Parameters:
+        repeat: int
+            Number of calls."""
+    habit_obj = Habit("Benchmark habit", "Day", 10**9)
+    clock = SimulatedClock(datetime(2024, 1, 1, 12))
+
+    def check_off() -> None:
+        clock.advance(days=1)
+        habit_obj.check_off_habit(clock)
+    return {"Habit.check_off_habit": measure(check_off, repeat)}
+
+def run_benchmarks(scales: list, directory: str, repeat: int) -> dict:
+    """
+    Runs all benchmarks for every scale and returns the results.
+
+    Parameters:
+        scales: list
+            Approximate numbers of rows in \'habits_log\' of benchmark databases.
+        directory: str
+            Directory for benchmark databases.
+        repeat: int
+            Number of calls of every measured function."""
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform()
+        },
+        "results": {}
+    }
+    for rows_amount in scales:
+        database_name = prepare_database(directory, rows_amount)
+        database = Database(database_name)
+        analyzer = DatabaseAnalyzer(database_name, database.return_read_pool())
+        habit_name = database.database.execute("SELECT name FROM habits_log ORDER BY log_id DESC LIMIT 1").fetchone()[0]
+
+        scale_results = {}
+        scale_results.update(benchmark_analyzer(analyzer, habit_name, repeat))
+        scale_results.update(benchmark_analytics(analyzer, max(1, repeat // 10)))
+        scale_results.update(benchmark_database(database, habit_name, repeat))
+        scale_results.update(benchmark_check_off(repeat))
+        results["results"][str(rows_amount)] = scale_results
+        database.disconnect_database()
+        print(f"Scale {rows_amount}: done.", file=sys.stderr)
+    return results
+
+def compare_with_baseline(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Compares median durations with the baseline and returns regressions as (scale, name, ratio) tuples.
+    Measurements missing in one of the runs are ignored.
+
+    Parameters:
+        results: dict
+            Results of the current run.
+        baseline: dict
+            Results of an earlier run.
+        threshold: float
+            A measurement is a regression if it is this many times slower than in the baseline."""
+    regressions = []
+    for scale, scale_results in results["results"].items():
+        for name, measurement in scale_results.items():
+            baseline_measurement = baseline["results"].get(scale, {}).get(name)
+            if baseline_measurement is None or baseline_measurement["median"] == 0:
+                continue
+            ratio = measurement["median"] / baseline_measurement["median"]
+            if ratio > threshold:
+                regressions.append((scale, name, ratio))
+    return regressions
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks of the Habit tracker.")
+    parser.add_argument("--scales", nargs="+", type=float, default=[1e3, 1e4, 1e5],
+                        help="approximate numbers of habits_log rows, up to 1e7")
+    parser.add_argument("--repeat", type=int, default=50, help="number of calls of every measured function")
+    parser.add_argument("--directory", default="benchmark_databases", help="directory for benchmark databases")
+    parser.add_argument("--output", default="benchmark_results.json", help="file to write results to")
+    parser.add_argument("--baseline", help="results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown relative to the baseline that counts as a regression")
+    args = parser.parse_args()
+
+    results = run_benchmarks([int(scale) for scale in args.scales], args.directory, args.repeat)
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=4)
+
+    for scale, scale_results in results["results"].items():
+        for name, measurement in scale_results.items():
+            print(f"{scale:>10} {name:<60} {measurement['median'] * 1000:10.3f} ms")
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            regressions = compare_with_baseline(results, json.load(file), args.threshold)
+        for scale, name, ratio in regressions:
+            print(f"Regression at scale {scale}: {name} is {ratio:.2f} times slower.")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,149 @@
+from collections import namedtuple
+import statistics
+import subprocess
+import argparse
+import tempfile
+import time
+import json
+import sys
+import os
+
+"""
+This module measures how long entry points of the application take to start and checks them against
+an import-time budget. Every entry point is started in a new interpreter with '-X importtime', so the measured
+time is the import time of the modules it loads (without the startup of the interpreter itself). The run fails
+if an entry point exceeds its budget or loads a module that only the interactive interface needs.
+
+Example:
+    python benchmark_startup.py --repeat 10 --output startup.json"""
+
+
+
+# Modules imported only by the interactive interface (and by predefined habits). Scripted commands must not load them.
+HEAVY_MODULES = ("questionary", "prompt_toolkit", "tabulate", "numpy", "dateutil")
+
+EntryPoint = namedtuple("EntryPoint", ["arguments", "budget", "light"])
+
+# Measured entry points: arguments of the interpreter, the maximal import time in milliseconds
+# (None for no budget) and whether the entry point must not load HEAVY_MODULES.
+# {database} is replaced by a temporary database.
+ENTRY_POINTS = {
+    "help": EntryPoint(["HabitTrackingApp.py", "--help"], 50, True),
+    "health": EntryPoint(["HabitTrackingApp.py", "--database", "{database}", "health"], 50, True),
+    "analyze": EntryPoint(["HabitTrackingApp.py", "--database", "{database}", "analyze", "tracked"], 50, True),
+    "interactive interface": EntryPoint(["-c", "import CLI"], None, False)
+}
+
+# Directory with the modules of the application
+APPLICATION_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+
+def parse_import_times(report: str) -> tuple:
+    """
+    Returns the total import time in milliseconds and the names of imported modules from the '-X importtime' report.
+
+    Parameters:
+        report: str
+            Standard error of an interpreter started with '-X importtime'."""
+    total = 0
+    modules = set()
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.add(name.strip())
+        # Only top-level imports, nested ones are included in their cumulative time
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return total / 1000, modules
+
+def run_entry_point(arguments: list) -> tuple:
+    """
+    Starts the interpreter with the given arguments in the directory of the application and returns
+    the wall time in milliseconds, the import time in milliseconds and the names of imported modules.
+
+    Parameters:
+        arguments: list
+            Arguments of the interpreter, e.g., ['HabitTrackingApp.py', 'health']."""
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", *arguments], cwd=APPLICATION_DIRECTORY,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall_time = (time.perf_counter() - start) * 1000
+    if process.returncode != 0:
+        errors = [line for line in process.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"{' '.join(arguments)} failed: {' '.join(errors)}")
+    import_time, modules = parse_import_times(process.stderr)
+    return wall_time, import_time, modules
+
+def measure_startup(entry_points: dict, repeat: int, database_name: str) -> dict:
+    """
+    Returns median wall and import times of every entry point, its budget and the heavy modules it loads.
+
+    Parameters:
+        entry_points: dict
+            Entry points by name, see ENTRY_POINTS.
+        repeat: int
+            Number of starts of every entry point.
+        database_name: str
+            Absolute name of the database used by entry points."""
+    interpreter_import_time = statistics.median(run_entry_point(["-c", "pass"])[1] for _ in range(repeat))
+    results = {}
+    for name, entry_point in entry_points.items():
+        arguments = [argument.format(database=database_name) for argument in entry_point.arguments]
+        # The first start also creates the database and fills the bytecode cache
+        run_entry_point(arguments)
+        wall_times, import_times, modules = [], [], set()
+        for _ in range(repeat):
+            wall_time, import_time, modules = run_entry_point(arguments)
+            wall_times.append(wall_time)
+            import_times.append(import_time - interpreter_import_time)
+        results[name] = {
+            "wall_time": statistics.median(wall_times),
+            "import_time": statistics.median(import_times),
+            "budget": entry_point.budget,
+            "heavy_modules": sorted(module for module in modules if module.split(".")[0] in HEAVY_MODULES)
+        }
+    return results
+
+def return_violations(results: dict, entry_points: dict) -> list:
+    """
+    Returns descriptions of entry points that exceed their budget or load heavy modules they must not load.
+
+    Parameters:
+        results: dict
+            Results of measure_startup.
+        entry_points: dict
+            Measured entry points, see ENTRY_POINTS."""
+    violations = []
+    for name, result in results.items():
+        if result["budget"] is not None and result["import_time"] > result["budget"]:
+            violations.append(f"{name} imports modules for {result['import_time']:.1f} ms, "
+                              f"the budget is {result['budget']} ms.")
+        if entry_points[name].light and result["heavy_modules"]:
+            violations.append(f"{name} imports {', '.join(result['heavy_modules'])}.")
+    return violations
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Startup benchmark of the Habit tracker.")
+    parser.add_argument("--repeat", type=int, default=10, help="number of starts of every entry point")
+    parser.add_argument("--output", help="file to write results to as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = measure_startup(ENTRY_POINTS, args.repeat, os.path.join(directory, "StartupDatabase.db"))
+
+    print(f"{'Entry point':<25} {'Wall, ms':>10} {'Imports, ms':>12} {'Budget, ms':>12}")
+    for name, result in results.items():
+        budget = "-" if result["budget"] is None else result["budget"]
+        print(f"{name:<25} {result['wall_time']:>10.1f} {result['import_time']:>12.1f} {budget:>12}")
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+    violations = return_violations(results, ENTRY_POINTS)
+    for violation in violations:
+        print(violation)
+    sys.exit(1 if violations else 0)
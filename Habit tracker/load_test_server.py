@@ -0,0 +1,232 @@
+from HabitServer import return_server
+from HabitService import HabitService
+
+from urllib.parse import urlsplit, quote
+import http.client
+import statistics
+import threading
+import argparse
+import tempfile
+import random
+import time
+import json
+import sys
+import os
+
+"""
+This module generates mixed check-off and analytics traffic against the HTTP API (HabitServer.py)
+and reports throughput and latency percentiles of every kind of request.
+
+By default the server runs in this process on a temporary database. Client threads then share the interpreter
+with the server, so for exact numbers start the server separately and pass its address with --url.
+
+Example:
+    python load_test_server.py --clients 8 --duration 10 --check-off-ratio 0.7
+    python load_test_server.py --url http://127.0.0.1:8000 --habits 1000"""
+
+
+
+# Analytics requests of the generated traffic. {name} is replaced by the name of a random habit.
+ANALYTICS_REQUESTS = {
+    "currently_tracked_habits": "/queries/currently_tracked_habits",
+    "longest_streak_of_all_habits": "/queries/longest_streak_of_all_habits",
+    "top_habits_by_streak": "/queries/top_habits_by_streak?habits_amount=10",
+    "habit_history": "/habits/{name}/history?rows_amount=10",
+    "habit_information": "/habits/{name}"
+}
+
+
+
+def send_request(connection: http.client.HTTPConnection, method: str, path: str, body: dict = None) -> tuple:
+    """
+    Sends a request over a kept-alive connection and returns the HTTP status and the decoded response.
+
+    Parameters:
+        connection: http.client.HTTPConnection
+            Connection to the server.
+        method: str
+            HTTP method.
+        path: str
+            Path of the request.
+        body: dict, optional
+            Object to be sent as JSON. Defaults to no body."""
+    data = None if body is None else json.dumps(body).encode()
+    headers = {} if data is None else {"Content-Type": "application/json"}
+    connection.request(method, path, data, headers)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+def prepare_habits(host: str, port: int, habits_amount: int) -> list:
+    """
+    Adds habits for the load test (or reuses habits added by an earlier run) and returns their names.
+
+    Parameters:
+        host: str
+            Address of the server.
+        port: int
+            Port of the server.
+        habits_amount: int
+            Number of habits."""
+    connection = http.client.HTTPConnection(host, port)
+    names = [f"Load test habit {number}" for number in range(habits_amount)]
+    for name in names:
+        status, result = send_request(connection, "POST", "/habits",
+                                      {"name": name, "periodicity": "Hour", "time_span": 10**9})
+        if status not in (201, 409):
+            raise RuntimeError(f"Can't add a habit: {result}")
+    connection.close()
+    return names
+
+def run_client(host: str, port: int, names: list, check_off_ratio: float, deadline: float,
+               seed: int, latencies: dict, errors: list) -> None:
+    """
+    Sends random requests until the deadline and records their latencies by kind of request.
+
+    Parameters:
+        host: str
+            Address of the server.
+        port: int
+            Port of the server.
+        names: list
+            Names of habits to be checked off and analyzed.
+        check_off_ratio: float
+            Share of check-offs among requests.
+        deadline: float
+            Moment (time.perf_counter) to stop at.
+        seed: int
+            Seed of the random generator of the client.
+        latencies: dict
+            Lists of latencies in seconds by kind of request, filled by the client.
+        errors: list
+            Failed requests, filled by the client."""
+    generator = random.Random(seed)
+    connection = http.client.HTTPConnection(host, port)
+    kinds = list(ANALYTICS_REQUESTS)
+    while time.perf_counter() < deadline:
+        name = quote(generator.choice(names))
+        if generator.random() < check_off_ratio:
+            kind, method, path = "check_off", "POST", f"/habits/{name}/check-off"
+        else:
+            kind = generator.choice(kinds)
+            method, path = "GET", ANALYTICS_REQUESTS[kind].format(name=name)
+        start = time.perf_counter()
+        try:
+            status, result = send_request(connection, method, path)
+        except (OSError, http.client.HTTPException) as error:
+            errors.append((kind, repr(error)))
+            connection.close()
+            connection = http.client.HTTPConnection(host, port)
+            continue
+        latency = time.perf_counter() - start
+        if status >= 400:
+            errors.append((kind, result))
+        else:
+            latencies.setdefault(kind, []).append(latency)
+    connection.close()
+
+def summarize(latencies: list, duration: float) -> dict:
+    """
+    Returns the number of requests, throughput and latency percentiles (in milliseconds) of a kind of request.
+
+    Parameters:
+        latencies: list
+            Latencies of requests in seconds.
+        duration: float
+            Duration of the test in seconds."""
+    if len(latencies) < 2:
+        p50 = p99 = latencies[0] * 1000 if latencies else None
+    else:
+        percentiles = statistics.quantiles(latencies, n=100)
+        p50, p99 = percentiles[49] * 1000, percentiles[98] * 1000
+    return {
+        "requests": len(latencies),
+        "throughput": len(latencies) / duration,
+        "p50": p50,
+        "p99": p99
+    }
+
+def run_load_test(host: str, port: int, habits_amount: int, clients: int, duration: float,
+                  check_off_ratio: float, seed: int = 0) -> dict:
+    """
+    Runs the load test against a running server and returns the summary by kind of request and in total.
+
+    Parameters:
+        host: str
+            Address of the server.
+        port: int
+            Port of the server.
+        habits_amount: int
+            Number of habits.
+        clients: int
+            Number of concurrent clients, each with its own connection.
+        duration: float
+            Duration of the test in seconds.
+        check_off_ratio: float
+            Share of check-offs among requests.
+        seed: int, optional
+            Seed of the random generators of clients. Defaults to 0."""
+    names = prepare_habits(host, port, habits_amount)
+    latencies = [{} for _ in range(clients)]
+    errors = []
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=run_client, args=(host, port, names, check_off_ratio, deadline,
+                                                         seed * clients + client, latencies[client], errors))
+               for client in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    kinds = {}
+    for client_latencies in latencies:
+        for kind, values in client_latencies.items():
+            kinds.setdefault(kind, []).extend(values)
+    summary = {kind: summarize(values, duration) for kind, values in sorted(kinds.items())}
+    summary["total"] = summarize([value for values in kinds.values() for value in values], duration)
+    summary["errors"] = len(errors)
+    return summary
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load generator for the HTTP API of the Habit tracker.")
+    parser.add_argument("--url", help="address of a running server, e.g., http://127.0.0.1:8000; "
+                                      "defaults to a server in this process on a temporary database")
+    parser.add_argument("--habits", type=int, default=100, help="number of habits")
+    parser.add_argument("--clients", type=int, default=8, help="number of concurrent clients")
+    parser.add_argument("--duration", type=float, default=10, help="duration of the test in seconds")
+    parser.add_argument("--check-off-ratio", type=float, default=0.5, help="share of check-offs among requests")
+    parser.add_argument("--group-commit-latency", type=float,
+                        help="group commit latency of the server in this process")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random generators")
+    parser.add_argument("--output", help="file to write the summary to as JSON")
+    args = parser.parse_args()
+
+    server = service = directory = None
+    if args.url is None:
+        directory = tempfile.TemporaryDirectory()
+        service = HabitService(os.path.join(directory.name, "LoadTestDatabase.db"), args.group_commit_latency)
+        server = return_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[:2]
+    else:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+
+    summary = run_load_test(host, port, args.habits, args.clients, args.duration, args.check_off_ratio, args.seed)
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+        service.close()
+        directory.cleanup()
+
+    print(f"{'Request':<30} {'Requests':>10} {'Per second':>12} {'p50, ms':>10} {'p99, ms':>10}")
+    for kind, result in summary.items():
+        if kind != "errors" and result["requests"] > 0:
+            print(f"{kind:<30} {result['requests']:>10} {result['throughput']:>12.1f} "
+                  f"{result['p50']:>10.2f} {result['p99']:>10.2f}")
+    print(f"Failed requests: {summary['errors']}")
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(summary, file, indent=4)
+    sys.exit(1 if summary["errors"] else 0)
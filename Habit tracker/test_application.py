@@ -1,11 +1,47 @@
-from Habit import Habit
+from Habit import Habit, HabitTable
 from Database import Database
 from DatabaseAnalyzer import DatabaseAnalyzer
+from StreakEngine import compute_streaks, compute_streaks_from_database
+from PeriodIndex import (return_timestamp, return_datetime, return_period_indices, return_covering_periods,
+                         return_deadline, is_time_exceeded)
+from DatabaseMigrations import MIGRATIONS, return_schema_version, return_habit_schedule, update_habit_schedules
+from PredefinedHabits import (generate_synthetic_habits, load_synthetic_history, predefine_habits,
+                              generate_habit_history)
+from HabitContainer import HabitContainer
+from ConnectionPool import ConnectionPool
+from DataTransfer import export_table, import_table
+from AsyncDatabase import AsyncDatabase, AsyncDatabaseAnalyzer
+from ShardRouter import ShardRouter, Shard
+from HabitService import HabitService
+from LogArchive import return_archive_name
+from HistoryReplay import replay_habits, repair_habits
+from DeadlineScheduler import DeadlineScheduler
+from TimeSimulator import run_simulation
+from Clock import SimulatedClock
+from HabitServer import return_server
+from load_test_server import send_request, run_load_test
+from ScriptedCLI import return_parser, return_database_name, run_batch
+from benchmark_startup import run_entry_point, HEAVY_MODULES
+from HabitAnalytics import (return_check_off_columns, compute_completion_rates, compute_heatmaps,
+                            compute_streak_lengths, compute_streak_histogram, compute_time_to_break)
 
 from dateutil.relativedelta import relativedelta 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from unittest import mock
 
+import numpy as np
 import unittest
+import asyncio
+import shutil
+import threading
+import http.client
+import json
+import io
+import sqlite3
+import random
+import time
+import os
 
 """
 This module test critical points in Habit tracking application, namely,
@@ -27,6 +63,20 @@ class TestHabitClass(unittest.TestCase):
         habit_obj = Habit('name', 'Day', 0)
         self.assertIsInstance(habit_obj, Habit)
 
+    def test_habit_from_row(self) -> None:
+        """
+        Creates habits from a row with the constructor, with the fast constructor and through a habit table.
+        
+        Assertions:
+        - Assert that all habits have the same attributes."""
+        row = ('name', 'Week', 4, 'In progress', 2, 3, '10:00:00', '2024-01-01', '11:00:00', '2024-01-15')
+        habit_obj = Habit(*row)
+        self.assertEqual(vars(Habit.from_row(row)), vars(habit_obj))
+        table = HabitTable([row, ('name2',) + row[1:]])
+        self.assertEqual(len(table), 2)
+        self.assertEqual(vars(table.return_habit(0)), vars(habit_obj))
+        self.assertEqual(table.return_rows(['name', 'longest_streak']), [('name', 3), ('name2', 3)])
+
     def test_habit_update(self) -> None:
         """
         Creates a habit instance, updates its characteristic and then 
@@ -296,6 +346,1393 @@ class TestDatabaseAndDatabaseAnalyzer(unittest.TestCase):
 
 
 
+class TestStreakEngine(unittest.TestCase):
+    """
+    This class tests that the vectorized streak engine gives the same results as checking habits off one by one."""
+    @staticmethod
+    def generate_moments(periodicity: str, amount: int, seed: int) -> list[datetime]:
+        """
+        Generates check-off moments with random gaps between 0 and 3 periods.
+
+        Parameters:
+            periodicity: str
+                Periodicity of the habit.
+            amount: int
+                Number of moments to be generated.
+            seed: int
+                Seed of the random generator."""
+        generator = random.Random(seed)
+        units = {"Hour": "hours", "Day": "days", "Week": "weeks", "Month": "months", "Year": "years"}
+        moment = datetime(2023, 12, 30, 22, 15, 0)
+        moments = []
+        for _ in range(amount):
+            moment = moment + relativedelta(**{units[periodicity]: generator.randint(0, 3)}, 
+                                            minutes=generator.randint(0, 59))
+            moments.append(moment)
+        return moments
+
+    def check_off_one_by_one(self, habit_obj: Habit, moments: list[datetime]) -> list[int]:
+        """
+        Checks the habit off at the given moments with Habit.check_off_habit and returns streaks after every check-off.
+
+        Parameters:
+            habit_obj: Habit
+                Habit to be checked-off.
+            moments: list[datetime]
+                Moments of check-offs."""
+        streaks = []
+        for moment in moments:
+            with mock.patch("Habit.return_current_datetime", return_value=moment), \
+                 mock.patch("builtins.print"):
+                habit_obj.check_off_habit()
+            habit_obj.complete_habit()
+            streaks.append(habit_obj.current_streak)
+        return streaks
+
+    def test_engine_matches_check_off_habit(self) -> None:
+        """
+        Checks habits of every periodicity off one by one and compares streaks, longest streak 
+        and state with the result of the vectorized engine.
+        
+        Assertions:
+        - Assert that per check-off streaks, current streak, longest streak and state are equal."""
+        for seed, periodicity in enumerate(["Hour", "Day", "Week", "Month", "Year"]):
+            moments = self.generate_moments(periodicity, 200, seed)
+            habit_obj = Habit("name", periodicity, 6)
+            streaks = self.check_off_one_by_one(habit_obj, moments)
+
+            summary = compute_streaks(np.array(moments, dtype="datetime64[s]"), periodicity, 6)
+            self.assertEqual(streaks, summary["streaks"].tolist())
+            self.assertEqual(habit_obj.current_streak, summary["current_streak"])
+            self.assertEqual(habit_obj.longest_streak, summary["longest_streak"])
+            self.assertEqual(habit_obj.state, summary["state"])
+
+    def test_engine_over_database(self) -> None:
+        """
+        Stores check-offs of several habits in the TestDatabase.db and recomputes their streaks from \'habits_log\'.
+        
+        Assertions:
+        - Assert that recomputed streaks match the habit objects."""
+        database = Database(name='TestDatabase.db')
+        database.clean_tables_in_database()
+        analyzer = DatabaseAnalyzer(database.name)
+        habits = [Habit("name1", "Day", 3), Habit("name2", "Hour", 50), Habit("name3", "Week", 10)]
+        for seed, habit_obj in enumerate(habits):
+            database.insert_habit_to_database(habit_obj)
+            for moment in self.generate_moments(habit_obj.periodicity, 30, seed):
+                self.check_off_one_by_one(habit_obj, [moment])
+                database.update_habit_logs(habit_obj)
+
+        recomputed = compute_streaks_from_database(analyzer)
+        for habit_obj in habits:
+            self.assertEqual(recomputed[habit_obj.name]["current_streak"], habit_obj.current_streak)
+            self.assertEqual(recomputed[habit_obj.name]["longest_streak"], habit_obj.longest_streak)
+            self.assertEqual(recomputed[habit_obj.name]["state"], habit_obj.state)
+        database.clean_tables_in_database()
+        analyzer.close()
+        database.disconnect_database()
+
+
+
+class TestTimestampStorage(unittest.TestCase):
+    """
+    This class tests storing time and date as timestamps with period indices."""
+    def test_period_indices(self) -> None:
+        """
+        Computes period indices of several moments.
+        
+        Assertions:
+        - Assert that timestamps are converted back to the same moments.
+        - Assert that indices of moments in consecutive periods differ by 1."""
+        moment = datetime(2024, 12, 31, 23, 59, 59)
+        timestamp = return_timestamp(moment)
+        self.assertEqual(return_datetime(timestamp), moment)
+
+        indices = return_period_indices(timestamp)
+        next_indices = return_period_indices(timestamp + 1)
+        self.assertEqual([next_index - index for index, next_index in zip(indices, next_indices)], [1, 1, 0, 1, 1])
+        # 2024-12-30 is Monday
+        monday = return_period_indices(return_timestamp(datetime(2024, 12, 30)))
+        sunday = return_period_indices(return_timestamp(datetime(2024, 12, 29, 23)))
+        self.assertEqual(indices[2], monday[2])
+        self.assertEqual(monday[2] - sunday[2], 1)
+
+    def test_migration_from_text_columns(self) -> None:
+        """
+        Creates a database with time and date stored as text (as older versions of the application did) 
+        and opens it with the Database class.
+        
+        Assertions:
+        - Assert that habits and logs are converted without losing information.
+        - Assert that no archive file is created while nothing is archived."""
+        database_name = "TestMigrationDatabase.db"
+        if os.path.exists(database_name):
+            os.remove(database_name)
+        connection = sqlite3.connect(database_name)
+        connection.execute("""CREATE TABLE habits (name TEXT PRIMARY KEY, periodicity TEXT, time_span INTEGER, 
+                              state TEXT, current_streak INTEGER, longest_streak INTEGER, start_time TEXT, 
+                              start_date TEXT, end_time TEXT, end_date TEXT)""")
+        connection.execute("""CREATE TABLE habits_log (name TEXT, current_streak INTEGER, longest_streak INTEGER, 
+                              end_time TEXT, end_date TEXT)""")
+        connection.execute("""INSERT INTO habits VALUES('name', 'Day', 5, 'In progress', 2, 2, 
+                              '10:00:00', '2024-01-01', '08:30:15', '2024-01-03')""")
+        connection.executemany("INSERT INTO habits_log VALUES(?, ?, ?, ?, ?)", [
+            ('name', 0, 0, None, None), 
+            ('name', 1, 1, '09:00:00', '2024-01-02'), 
+            ('name', 2, 2, '08:30:15', '2024-01-03')])
+        connection.commit()
+        connection.close()
+
+        database = Database(database_name)
+        analyzer = DatabaseAnalyzer(database_name)
+        habit_obj = Habit(*analyzer.return_detailed_information_about_habit('name')[1])
+        self.assertEqual([habit_obj.start_time, habit_obj.start_date, habit_obj.end_time, habit_obj.end_date],
+                         ['10:00:00', '2024-01-01', '08:30:15', '2024-01-03'])
+        history = analyzer.return_habit_history('name')
+        self.assertEqual(history, [('name', 2, 2, '08:30:15', '2024-01-03'), 
+                                   ('name', 1, 1, '09:00:00', '2024-01-02'),
+                                   ('name', 0, 0, None, None)])
+        log = analyzer.return_check_off_log()
+        self.assertEqual(log[0][3], return_timestamp(datetime(2024, 1, 2, 9)))
+        analyzer.close()
+        database.disconnect_database()
+        self.assertFalse(os.path.exists(return_archive_name(database_name)))
+        os.remove(database_name)
+
+
+
+class TestDatabaseMigrations(unittest.TestCase):
+    """
+    This class tests upgrading the database structure."""
+    def test_schema_version_and_indexes(self) -> None:
+        """
+        Opens the TestDatabase.db twice and inspects its structure.
+        
+        Assertions:
+        - Assert that the database has the latest schema version.
+        - Assert that history of a habit is read from the covering index."""
+        database = Database(name='TestDatabase.db')
+        database.disconnect_database()
+        database = Database(name='TestDatabase.db')
+        self.assertEqual(return_schema_version(database.database), len(MIGRATIONS))
+
+        plan = database.database.execute("""EXPLAIN QUERY PLAN 
+                                            SELECT current_streak, longest_streak, end_timestamp FROM habits_log 
+                                            WHERE name = ? ORDER BY end_timestamp DESC""", ("name",)).fetchall()
+        self.assertIn("USING COVERING INDEX habits_log_by_name_and_end", plan[0][-1])
+        database.disconnect_database()
+
+
+
+class TestConnectionPool(unittest.TestCase):
+    """
+    This class tests the pool of read-only connections shared by Database and DatabaseAnalyzer."""
+    def test_connection_reuse(self) -> None:
+        """
+        Runs several queries through an analyzer that shares the pool of the database.
+        
+        Assertions:
+        - Assert that consecutive queries reuse the same connection.
+        - Assert that the pool doesn't open more connections than its size.
+        - Assert that connections of the pool can't change the database.
+        - Assert that a reader waiting for a connection gets one with an attached database
+          once the busy connection opened before the database was attached is released."""
+        database = Database(name='TestDatabase.db')
+        pool = database.return_read_pool(size=2)
+        analyzer = DatabaseAnalyzer(database.name, pool)
+        for _ in range(5):
+            analyzer.return_currently_tracked_habits()
+            analyzer.return_longest_streak_of_all_habits()
+        self.assertEqual(len(pool.connections), 1)
+
+        with pool.connection() as connection1, pool.connection() as connection2:
+            self.assertIsNot(connection1, connection2)
+            with self.assertRaises(TimeoutError):
+                pool.acquire_connection(timeout=0.01)
+            with self.assertRaises(sqlite3.OperationalError):
+                connection1.execute("DELETE FROM habits")
+        self.assertEqual(len(pool.connections), 2)
+
+        analyzer.close()
+        self.assertFalse(pool.closed)
+        database.disconnect_database()
+        self.assertTrue(pool.closed)
+
+        pool = ConnectionPool(database.name, size=1)
+        busy_connection = pool.acquire_connection()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            waiter = executor.submit(pool.acquire_connection, 5)
+            time.sleep(0.1)
+            pool.attach_database("attached", database.name)
+            pool.release_connection(busy_connection)
+            connection = waiter.result()
+        self.assertIn("attached", [row[1] for row in connection.execute("PRAGMA database_list")])
+        self.assertEqual(len(pool.retired_connections), 0)
+        pool.release_connection(connection)
+        pool.close()
+
+
+
+class TestCheckOffTransactions(unittest.TestCase):
+    """
+    This class tests writing check-offs in a single transaction and committing them in groups."""
+    def test_check_off_in_single_transaction(self) -> None:
+        """
+        Checks a habit off and stores the result with one call.
+        
+        Assertions:
+        - Assert that the habit and its log are updated together.
+        - Assert that a failed write doesn't leave any changes behind."""
+        database = Database(name='TestDatabase.db')
+        database.clean_tables_in_database()
+        analyzer = DatabaseAnalyzer(database.name, database.return_read_pool())
+        habit_obj = Habit('name', 'Day', 1)
+        database.insert_habit_to_database(habit_obj)
+        habit_obj.check_off_habit()
+        habit_obj.complete_habit()
+        database.check_off_habit_in_database(habit_obj)
+
+        extracted_habit = Habit(*analyzer.return_detailed_information_about_habit(habit_obj.name)[1])
+        self.assertEqual(list(vars(extracted_habit).values()), list(vars(habit_obj).values()))
+        self.assertEqual(analyzer.return_habit_history(habit_obj.name)[0], 
+                         (habit_obj.name, 1, 1, habit_obj.end_time, habit_obj.end_date))
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            with database.write_transaction() as cursor:
+                cursor.execute("DELETE FROM habits_log")
+                cursor.execute("INSERT INTO habits (name) VALUES (?)", (habit_obj.name,))
+        self.assertEqual(len(analyzer.return_habit_history(habit_obj.name)), 2)
+
+        database.clean_tables_in_database()
+        database.disconnect_database()
+
+    def test_group_commit(self) -> None:
+        """
+        Checks habits off with group commit enabled.
+        
+        Assertions:
+        - Assert that writes become visible to readers once the group is full.
+        - Assert that writes become visible to readers once the latency has passed.
+        - Assert that manual group commit never starts a timer and writes wait for commit_pending_writes."""
+        database = Database(name='TestDatabase.db', group_commit_latency=60, group_commit_size=3)
+        database.clean_tables_in_database()
+        analyzer = DatabaseAnalyzer(database.name)
+        habit_obj = Habit('name', 'Hour', 10)
+        database.insert_habit_to_database(habit_obj)
+        database.commit_pending_writes()
+        for _ in range(2):
+            habit_obj.check_off_habit()
+            database.check_off_habit_in_database(habit_obj)
+        self.assertEqual(analyzer.return_longest_streaks_of_given_habit(habit_obj.name), 0)
+        habit_obj.check_off_habit()
+        database.check_off_habit_in_database(habit_obj)
+        self.assertEqual(analyzer.return_longest_streaks_of_given_habit(habit_obj.name), 3)
+
+        database.group_commit_latency = 0.05
+        habit_obj.check_off_habit()
+        database.check_off_habit_in_database(habit_obj)
+        time.sleep(0.3)
+        self.assertEqual(analyzer.return_longest_streaks_of_given_habit(habit_obj.name), 4)
+
+        database.manual_commit = True
+        habit_obj.check_off_habit()
+        database.check_off_habit_in_database(habit_obj)
+        time.sleep(0.3)
+        self.assertIsNone(database.commit_timer)
+        self.assertEqual(analyzer.return_longest_streaks_of_given_habit(habit_obj.name), 4)
+        database.commit_pending_writes()
+        self.assertEqual(analyzer.return_longest_streaks_of_given_habit(habit_obj.name), 5)
+
+        database.clean_tables_in_database()
+        analyzer.close()
+        database.disconnect_database()
+
+
+
+class TestSyntheticHistory(unittest.TestCase):
+    """
+    This class tests generation and bulk loading of synthetic habit history."""
+    def test_generation_is_deterministic(self) -> None:
+        """
+        Generates the same habits twice, once in a single chunk and once habit by habit.
+        
+        Assertions:
+        - Assert that the results are equal."""
+        habit_rows, log_rows = generate_synthetic_habits(range(6), 40, seed=7)
+        for number in range(6):
+            self.assertEqual(generate_synthetic_habits(range(number, number + 1), 40, seed=7)[0][0], 
+                             habit_rows[number])
+        self.assertEqual(generate_synthetic_habits(range(6), 40, seed=7)[1], log_rows)
+        self.assertNotEqual(generate_synthetic_habits(range(6), 40, seed=8)[1], log_rows)
+
+    def test_loading_in_parallel(self) -> None:
+        """
+        Loads synthetic habits into the TestDatabase.db using a process pool and recomputes their streaks.
+        
+        Assertions:
+        - Assert that all habits and check-offs are loaded.
+        - Assert that streaks and states of habits are consistent with their history."""
+        database = Database(name='TestDatabase.db')
+        database.clean_tables_in_database()
+        analyzer = DatabaseAnalyzer(database.name)
+        load_synthetic_history(database, 30, 60, seed=3, processes=2, habits_per_transaction=7)
+        
+        habit_rows, log_rows = generate_synthetic_habits(range(30), 60, seed=3)
+        habits = analyzer.return_currently_tracked_habits() + analyzer.return_developed_habits()
+        self.assertEqual(len(habits), 30)
+        self.assertEqual(len(analyzer.return_check_off_log()), len(log_rows) - 30)
+
+        recomputed = compute_streaks_from_database(analyzer)
+        for habit in habits:
+            habit_obj = Habit(*habit)
+            self.assertEqual(recomputed[habit_obj.name]["current_streak"], habit_obj.current_streak)
+            self.assertEqual(recomputed[habit_obj.name]["longest_streak"], habit_obj.longest_streak)
+            self.assertEqual(recomputed[habit_obj.name]["state"], habit_obj.state)
+        database.clean_tables_in_database()
+        analyzer.close()
+        database.disconnect_database()
+
+
+
+class TestHabitContainer(unittest.TestCase):
+    """
+    This class tests the lazy container of habits used by the command line interface."""
+    def test_lazy_loading(self) -> None:
+        """
+        Loads synthetic habits into the TestDatabase.db and reads them through the container.
+        
+        Assertions:
+        - Assert that habits are listed by name without materializing them.
+        - Assert that no more habits than the capacity are kept in memory.
+        - Assert that missing habits raise KeyError.
+        - Assert that habits can't be deleted through the container and disappear from it once deleted
+          from the database."""
+        database = Database(name='TestDatabase.db')
+        database.clean_tables_in_database()
+        analyzer = DatabaseAnalyzer(database.name, database.return_read_pool())
+        load_synthetic_history(database, 25, 5, seed=1)
+        container = HabitContainer(analyzer, capacity=4, page_size=10)
+
+        names = list(container.keys())
+        self.assertEqual(names, [f"Synthetic habit {number}" for number in range(25)])
+        self.assertEqual(len(container), 25)
+        self.assertEqual(len(container.cache), 0)
+
+        for name in names:
+            habit_obj = container[name]
+            self.assertEqual(habit_obj.name, name)
+        self.assertEqual(list(container.cache), names[-4:])
+        self.assertIs(container[names[-1]], habit_obj)
+
+        habit_obj = Habit("name", "Day", 2)
+        database.insert_habit_to_database(habit_obj)
+        container[habit_obj.name] = habit_obj
+        self.assertIs(container["name"], habit_obj)
+        self.assertFalse(hasattr(container, "__delitem__"))
+        container.discard("name")
+        self.assertIn("name", container)
+        database.delete_habit_from_database("name")
+        self.assertNotIn("name", container)
+        with self.assertRaises(KeyError):
+            container["name"]
+        database.clean_tables_in_database()
+        database.disconnect_database()
+
+
+class TestHabitHistoryPagination(unittest.TestCase):
+    """
+    This class tests paging through the history of a habit."""
+    def test_history_pages(self) -> None:
+        """
+        Loads a synthetic habit with several check-offs at the same moment into the TestDatabase.db 
+        and pages through its history in both directions.
+        
+        Assertions:
+        - Assert that pages read forward cover the whole history, from the latest event to the creation.
+        - Assert that pages read backward are the same pages.
+        - Assert that the streamed history equals the paged one."""
+        database = Database(name='TestDatabase.db')
+        database.clean_tables_in_database()
+        analyzer = DatabaseAnalyzer(database.name, database.return_read_pool())
+        load_synthetic_history(database, 1, 20, seed=2)
+        name = "Synthetic habit 0"
+        end_timestamp = database.database.execute("SELECT MAX(end_timestamp) FROM habits_log").fetchone()[0]
+        database.insert_rows_to_database([], [(name, 0, 0, end_timestamp) + (0,) * 5] * 3)
+        expected = [tuple(row) for row in database.database.execute("""
+            SELECT name, current_streak, longest_streak,
+                   strftime('%H:%M:%S', end_timestamp, 'unixepoch'), strftime('%Y-%m-%d', end_timestamp, 'unixepoch')
+            FROM habits_log ORDER BY end_timestamp IS NULL, end_timestamp DESC, log_id DESC""")]
+        self.assertEqual(len(expected), 24)
+        self.assertEqual(expected[-1][3], None)
+
+        pages = []
+        history, next_token, previous_token = analyzer.return_habit_history_page(name, 5)
+        self.assertIsNone(previous_token)
+        pages.append(history)
+        while next_token is not None:
+            history, next_token, previous_token = analyzer.return_habit_history_page(name, 5, next_token)
+            pages.append(history)
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 4])
+        self.assertEqual([row for page in pages for row in page], expected)
+
+        for page in reversed(pages[:-1]):
+            history, next_token, previous_token = analyzer.return_habit_history_page(
+                name, 5, previous_token, "previous")
+            self.assertEqual(history, page)
+        self.assertIsNone(previous_token)
+
+        self.assertEqual(list(analyzer.stream_habit_history(name, chunk_size=7)), expected)
+        self.assertEqual(analyzer.return_habit_history(name, 3), expected[:3])
+        self.assertEqual(analyzer.return_habit_history_page("Missing habit"), [[], None, None])
+        database.clean_tables_in_database()
+        database.disconnect_database()
+
+
+
+class TestDataTransfer(unittest.TestCase):
+    """
+    This class tests export and import of the database tables."""
+    def test_export_and_import(self) -> None:
+        """
+        Exports synthetic habits from the TestDatabase.db to CSV and JSON Lines files 
+        and imports them back into the emptied database.
+        
+        Assertions:
+        - Assert that both tables are restored exactly for both formats.
+        - Assert that existing habits are rejected unless upsert mode is used.
+        - Assert that an invalid row is reported with its line number."""
+        database = Database(name='TestDatabase.db')
+        database.clean_tables_in_database()
+        analyzer = DatabaseAnalyzer(database.name, database.return_read_pool())
+        load_synthetic_history(database, 10, 15, seed=3)
+        select_habits = "SELECT * FROM habits ORDER BY rowid"
+        select_log = "SELECT * FROM habits_log ORDER BY log_id"
+        habits = database.database.execute(select_habits).fetchall()
+        log = database.database.execute(select_log).fetchall()
+
+        for file_format in ("csv", "jsonl"):
+            habits_file, log_file = f"TestHabits.{file_format}", f"TestHabitsLog.{file_format}"
+            self.assertEqual(export_table(analyzer, "habits", habits_file), len(habits))
+            self.assertEqual(export_table(analyzer, "habits_log", log_file, chunk_size=7), len(log))
+            database.clean_tables_in_database()
+            self.assertEqual(import_table(database, "habits", habits_file), len(habits))
+            self.assertEqual(import_table(database, "habits_log", log_file, rows_per_transaction=50), len(log))
+            self.assertEqual(database.database.execute(select_habits).fetchall(), habits)
+            self.assertEqual(database.database.execute(select_log).fetchall(), log)
+
+            with self.assertRaises(sqlite3.IntegrityError):
+                import_table(database, "habits", habits_file)
+            import_table(database, "habits", habits_file, upsert=True)
+            self.assertEqual(database.database.execute(select_habits).fetchall(), habits)
+            os.remove(habits_file)
+            os.remove(log_file)
+
+        with open("TestHabits.csv", "w") as file:
+            file.write("name,periodicity,time_span,state,current_streak,longest_streak,start_timestamp,end_timestamp\n")
+            file.write("Read,Day,10,In progress,0,0,1700000000,\n")
+            file.write("Run,Fortnight,10,In progress,0,0,1700000000,\n")
+        with self.assertRaisesRegex(ValueError, "line 3: 'periodicity'"):
+            import_table(database, "habits", "TestHabits.csv", upsert=True)
+        os.remove("TestHabits.csv")
+        database.clean_tables_in_database()
+        database.disconnect_database()
+
+
+
+class TestStreakLeaderboard(unittest.TestCase):
+    """
+    This class tests queries of the highest streaks."""
+    def test_top_habits(self) -> None:
+        """
+        Loads synthetic habits with known streaks into the TestDatabase.db and compares the leaderboard 
+        with habits sorted in Python, before and after check-offs and a rebuild.
+        
+        Assertions:
+        - Assert that the top habits by longest and current streaks are ordered by streak and name.
+        - Assert that ties with the last habit are included on request.
+        - Assert that the longest streak among all habits and its habits are found."""
+        database = Database(name='TestDatabase.db')
+        database.clean_tables_in_database()
+        analyzer = DatabaseAnalyzer(database.name, database.return_read_pool())
+        streaks = [(f"Habit {number}", number % 4, number % 7) for number in range(30)]
+        database.insert_rows_to_database([(name, "Day", 10, "In progress", min(current, longest), longest, 0, None)
+                                          for name, current, longest in streaks], [])
+
+        def expected(streak: int) -> list:
+            rows = database.database.execute("SELECT name, current_streak, longest_streak FROM habits").fetchall()
+            return sorted(rows, key=lambda row: (-row[streak], row[0]))
+
+        self.assertEqual(analyzer.return_top_habits_by_streak(5), expected(2)[:5])
+        self.assertEqual(analyzer.return_top_habits_by_streak(5, "current_streak"), expected(1)[:5])
+        self.assertEqual(analyzer.return_top_habits_by_streak(5, include_ties=True), expected(2)[:8])
+        names, longest_streak = analyzer.return_longest_streak_of_all_habits()
+        self.assertEqual(longest_streak, 6)
+        self.assertEqual(names, [(row[0],) for row in expected(2)[:4]])
+
+        habit_obj = Habit("Habit 0", "Day", 10)
+        for _ in range(8):
+            habit_obj.check_off_habit()
+        database.check_off_habit_in_database(habit_obj)
+        database.rebuild_streak_leaderboard()
+        self.assertEqual(analyzer.return_top_habits_by_streak(3), expected(2)[:3])
+        self.assertEqual(analyzer.return_longest_streak_of_all_habits(), [[("Habit 0",)], 8])
+        database.clean_tables_in_database()
+        self.assertEqual(analyzer.return_longest_streak_of_all_habits(), [[], None])
+        self.assertEqual(analyzer.return_top_habits_by_streak(3, include_ties=True), [])
+        database.disconnect_database()
+
+
+
+class TestCompletionRollups(unittest.TestCase):
+    """
+    This class tests rollups of check-offs per day, week, month and year."""
+    def expected_rollups(self, database: Database, habit_name: str = None) -> dict:
+        """
+        Counts check-offs per period directly in the log.
+
+        Parameters:
+            database: Database
+                Database to count check-offs in.
+            habit_name: str, optional
+                Name of the habit. Defaults to all habits together."""
+        condition = "end_timestamp IS NOT NULL" + ("" if habit_name is None else " AND name = ?")
+        parameters = () if habit_name is None else (habit_name,)
+        return {periodicity: database.database.execute(f"""SELECT {column}, COUNT(*) FROM habits_log
+                                                            WHERE {condition} GROUP BY {column}
+                                                            ORDER BY {column}""", parameters).fetchall()
+                for periodicity, column in (("Day", "day_index"), ("Week", "week_index"),
+                                            ("Month", "month_index"), ("Year", "year_index"))}
+
+    def test_covering_periods(self) -> None:
+        """
+        Covers random ranges of days with days, months and years.
+
+        Assertions:
+        - Assert that the periods cover every day of the range exactly once."""
+        generator = random.Random(5)
+        for _ in range(200):
+            first_day = generator.randrange(-1000, 20000)
+            last_day = first_day + generator.choice([0, 1, 40, 400, 4000])
+            covered = []
+            for periodicity, first_index, last_index in return_covering_periods(first_day, last_day):
+                column = ["Day", "Week", "Month", "Year"].index(periodicity) + 1
+                covered += [day for day in range(first_day - 400, last_day + 400)
+                            if first_index <= return_period_indices(day * 86400)[column] <= last_index]
+            self.assertEqual(sorted(covered), list(range(first_day, last_day + 1)))
+
+    def test_rollups_follow_the_log(self) -> None:
+        """
+        Loads synthetic habits into the TestDatabase.db, checks off and deletes habits
+        and compares rollups with check-offs counted in the log.
+
+        Assertions:
+        - Assert that rollups of all habits and of every habit match the log after a bulk load.
+        - Assert that check-offs and deleted habits update the rollups.
+        - Assert that numbers of check-offs over ranges of days match the log.
+        - Assert that rebuilt rollups equal the maintained ones."""
+        database = Database(name='TestDatabase.db')
+        database.clean_tables_in_database()
+        analyzer = DatabaseAnalyzer(database.name, database.return_read_pool())
+        habit_rows, log_rows = generate_synthetic_habits(range(12), 200, seed=11)
+        database.insert_rows_to_database(habit_rows, log_rows)
+
+        def assert_rollups() -> None:
+            for habit_name in [None, "Synthetic habit 3"]:
+                for periodicity, rows in self.expected_rollups(database, habit_name).items():
+                    self.assertEqual(analyzer.return_completion_series(habit_name, periodicity), rows)
+        assert_rollups()
+
+        habit_obj = Habit("Synthetic habit 3", "Day", 10)
+        habit_obj.check_off_habit()
+        database.check_off_habit_in_database(habit_obj)
+        database.delete_habit_from_database("Synthetic habit 5")
+        assert_rollups()
+        self.assertEqual(database.database.execute("SELECT COUNT(*) FROM habit_rollups WHERE name = ?",
+                                                   ("Synthetic habit 5",)).fetchone()[0], 0)
+
+        days = [row[0] for row in self.expected_rollups(database)["Day"]]
+        generator = random.Random(2)
+        for _ in range(30):
+            first_day, last_day = sorted(generator.randint(days[0] - 10, days[-1] + 10) for _ in range(2))
+            expected = database.database.execute("""SELECT COUNT(*) FROM habits_log 
+                                                    WHERE end_timestamp IS NOT NULL
+                                                    AND day_index BETWEEN ? AND ?""",
+                                                 (first_day, last_day)).fetchone()[0]
+            self.assertEqual(analyzer.return_number_of_completions(None, first_day, last_day), expected)
+        self.assertEqual(analyzer.return_number_of_completions(),
+                         sum(row[1] for row in self.expected_rollups(database)["Day"]))
+        self.assertEqual(analyzer.return_number_of_completions("Synthetic habit 3", days[0]),
+                         sum(row[1] for row in self.expected_rollups(database, "Synthetic habit 3")["Day"]))
+        self.assertEqual(analyzer.return_number_of_completions("Unknown habit", None, days[-1]), 0)
+
+        maintained = [database.database.execute(f"SELECT * FROM {table} ORDER BY 1, 2, 3").fetchall()
+                      for table in ("habit_rollups", "global_rollups")]
+        database.rebuild_rollups()
+        self.assertEqual([database.database.execute(f"SELECT * FROM {table} ORDER BY 1, 2, 3").fetchall()
+                          for table in ("habit_rollups", "global_rollups")], maintained)
+        database.clean_tables_in_database()
+        self.assertEqual(analyzer.return_number_of_completions(), 0)
+        database.disconnect_database()
+
+
+
+class TestLogArchive(unittest.TestCase):
+    """
+    This class tests moving old check-offs to the archive."""
+    def test_archived_history_is_still_read(self) -> None:
+        """
+        Loads synthetic habits into the TestDatabase.db, moves their old check-offs to the archive
+        and reads the history again.
+
+        Assertions:
+        - Assert that the archive file is created only when check-offs are archived for the first time.
+        - Assert that only check-offs older than the retention horizon are moved.
+        - Assert that histories, the check-off log, check-off columns, rollups and exports don't change.
+        - Assert that new check-offs get log ids that aren't used by archived rows, also after the rows with
+          the largest log ids are deleted and when an archive of an older version is attached.
+        - Assert that deleting a habit and cleaning the tables also delete its archived check-offs."""
+        if os.path.exists(return_archive_name('TestDatabase.db')):
+            os.remove(return_archive_name('TestDatabase.db'))
+        database = Database(name='TestDatabase.db')
+        database.clean_tables_in_database()
+        analyzer = DatabaseAnalyzer(database.name, database.return_read_pool())
+        habit_rows, log_rows = generate_synthetic_habits(range(10), 120, seed=4)
+        database.insert_rows_to_database(habit_rows, log_rows)
+        names = [row[0] for row in habit_rows]
+
+        def snapshot() -> list:
+            export_table(analyzer, "habits_log", "TestHabitsLog.jsonl", chunk_size=50)
+            with open("TestHabitsLog.jsonl") as file:
+                exported = file.read()
+            os.remove("TestHabitsLog.jsonl")
+            columns = return_check_off_columns(analyzer)
+            return [[list(analyzer.stream_habit_history(name, 17)) for name in names],
+                    analyzer.return_habit_history_page(names[0], 5, "1720000000:0"),
+                    analyzer.return_check_off_log(),
+                    [columns["names"], columns["habit_indices"].tolist(), columns["timestamps"].tolist()],
+                    database.database.execute("SELECT * FROM habit_rollups ORDER BY 1, 2, 3").fetchall(),
+                    exported]
+        before = snapshot()
+        self.assertEqual(database.archive_log_rows(30, now=datetime(2020, 1, 1)), 0)
+        self.assertFalse(os.path.exists(return_archive_name(database.name)))
+
+        moved_rows = database.archive_log_rows(30, habits_per_transaction=3, now=datetime(2024, 6, 15, 12))
+        self.assertTrue(os.path.exists(return_archive_name(database.name)))
+        horizon = return_timestamp(datetime(2024, 5, 16))
+        hot_rows, archived_rows = [database.database.execute(f"SELECT end_timestamp, log_id FROM {table}").fetchall()
+                                   for table in ("main.habits_log", "archive.archived_log")]
+        self.assertEqual(moved_rows, len(archived_rows))
+        self.assertGreater(moved_rows, 0)
+        self.assertTrue(all(row[0] < horizon for row in archived_rows))
+        self.assertEqual([row for row in hot_rows if row[0] is not None and row[0] < horizon], [])
+        self.assertEqual(snapshot(), before)
+        own_analyzer = DatabaseAnalyzer(database.name)
+        self.assertEqual(own_analyzer.return_check_off_log(), before[2])
+        own_analyzer.close()
+        database.rebuild_rollups()
+        self.assertEqual(snapshot(), before)
+
+        last_log_id = database.database.execute("""SELECT MAX(log_id) FROM (SELECT log_id FROM main.habits_log 
+                                                   UNION ALL SELECT log_id FROM archive.archived_log)""").fetchone()[0]
+        habit_obj = Habit(*analyzer.return_habit(names[1]))
+        habit_obj.check_off_habit()
+        database.check_off_habit_in_database(habit_obj)
+        self.assertEqual(database.database.execute("SELECT MAX(log_id) FROM habits_log").fetchone()[0],
+                         last_log_id + 1)
+        self.assertEqual(analyzer.return_habit_history(names[1], 200)[1:], before[0][1][:199])
+
+        def check_off_and_return_log_id(name: str) -> int:
+            habit_obj = Habit(*analyzer.return_habit(name))
+            habit_obj.check_off_habit()
+            database.check_off_habit_in_database(habit_obj)
+            return database.database.execute("SELECT MAX(log_id) FROM habits_log").fetchone()[0]
+        database.archive_log_rows(0, now=datetime(2030, 1, 1))
+        database.delete_habit_from_database(names[1])
+        self.assertEqual(check_off_and_return_log_id(names[3]), last_log_id + 2)
+        last_archived_log_id = database.database.execute("SELECT MAX(log_id) FROM archive.archived_log").fetchone()[0]
+        database.database.execute("UPDATE sqlite_sequence SET seq = 0 WHERE name = 'habits_log'")
+        database.database.execute("PRAGMA archive.user_version = 0")
+        database.database.commit()
+        database.disconnect_database()
+        database = Database(name='TestDatabase.db')
+        analyzer = DatabaseAnalyzer(database.name, database.return_read_pool())
+        self.assertGreater(check_off_and_return_log_id(names[4]), last_archived_log_id)
+
+        database.delete_habit_from_database(names[2])
+        self.assertEqual(analyzer.return_habit_history(names[2]), [])
+        self.assertEqual(database.database.execute("SELECT COUNT(*) FROM archive.archived_log WHERE name = ?",
+                                                   (names[2],)).fetchone()[0], 0)
+        database.clean_tables_in_database()
+        self.assertEqual(database.database.execute("SELECT COUNT(*) FROM archive.archived_log").fetchone()[0], 0)
+        database.disconnect_database()
+        os.remove(return_archive_name(database.name))
+
+
+
+class TestHistoryReplay(unittest.TestCase):
+    """
+    This class tests verifying and repairing habits by replaying their history."""
+    def test_replay_and_repair(self) -> None:
+        """
+        Loads synthetic habits into the TestDatabase.db, archives part of their history,
+        corrupts some habits and replays the history of all habits.
+
+        Assertions:
+        - Assert that the replay finds exactly the corrupted habits, in this process and in a pool of processes.
+        - Assert that dropped habits stay dropped.
+        - Assert that a habit changed after the replay isn't repaired.
+        - Assert that after the repair the replay finds only the skipped habit."""
+        database = Database(name='TestDatabase.db')
+        database.clean_tables_in_database()
+        habit_rows, log_rows = generate_synthetic_habits(range(12), 60, seed=6)
+        database.insert_rows_to_database(habit_rows, log_rows)
+        database.archive_log_rows(30, habits_per_transaction=5, now=datetime(2024, 6, 15, 12))
+        names = [row[0] for row in habit_rows]
+        self.assertEqual(replay_habits(database, habits_per_chunk=5), [])
+
+        database.database.execute("UPDATE habits SET state = 'Dropped' WHERE name = ?", (names[0],))
+        database.database.execute("UPDATE habits SET current_streak = current_streak + 3 WHERE name = ?",
+                                  (names[1],))
+        database.database.execute("UPDATE habits SET longest_streak = 0, state = 'Dropped' WHERE name = ?",
+                                  (names[4],))
+        database.database.execute("UPDATE habits SET end_timestamp = NULL WHERE name = ?", (names[7],))
+        database.database.commit()
+        analyzer = DatabaseAnalyzer(database.name, database.return_read_pool())
+        stored = {row[0]: row[1:] for row in analyzer.return_habit_streaks()}
+
+        discrepancies = replay_habits(database, habits_per_chunk=5)
+        self.assertEqual([discrepancy.name for discrepancy in discrepancies], [names[1], names[4], names[7]])
+        self.assertEqual(replay_habits(database, processes=2, habits_per_chunk=5), discrepancies)
+        self.assertEqual(discrepancies[1].replayed[0], "Dropped")
+        self.assertEqual(discrepancies[0].replayed[1:], (stored[names[1]][1] - 3, *stored[names[1]][2:]))
+
+        database.database.execute("UPDATE habits SET current_streak = 100 WHERE name = ?", (names[7],))
+        database.database.commit()
+        self.assertEqual(repair_habits(database, discrepancies, habits_per_transaction=2), 2)
+        self.assertEqual([discrepancy.name for discrepancy in replay_habits(database)], [names[7]])
+        self.assertEqual(database.database.execute("SELECT state FROM habits WHERE name = ?",
+                                                   (names[0],)).fetchone()[0], "Dropped")
+        database.disconnect_database()
+        os.remove(return_archive_name(database.name))
+
+
+
+class TestDeadlineScheduler(unittest.TestCase):
+    """
+    This class tests resetting streaks of broken habits by the deadline scheduler."""
+    def test_deadlines(self) -> None:
+        """
+        Computes deadlines of check-offs.
+
+        Assertions:
+        - Assert that the deadline is the first moment at which the streak is broken for every periodicity."""
+        check_off = return_timestamp(datetime(2024, 6, 10, 10, 30))
+        expected_deadlines = {
+            "Hour": datetime(2024, 6, 10, 12),
+            "Day": datetime(2024, 6, 12),
+            "Week": datetime(2024, 6, 24),
+            "Month": datetime(2024, 8, 1),
+            "Year": datetime(2026, 1, 1)
+        }
+        for periodicity, deadline in expected_deadlines.items():
+            self.assertEqual(return_deadline(check_off, periodicity), return_timestamp(deadline))
+            self.assertFalse(is_time_exceeded(return_datetime(check_off), deadline - relativedelta(seconds=1),
+                                              periodicity))
+
+    def test_reset_broken_streaks(self) -> None:
+        """
+        Adds habits to the TestDatabase.db and resets streaks at different moments.
+
+        Assertions:
+        - Assert that only habits in progress with a streak are scheduled.
+        - Assert that streaks are reset once their deadline has passed, and longest streaks stay.
+        - Assert that a habit checked off after it has been scheduled is reset at its new deadline.
+        - Assert that the thread of the scheduler resets habits loaded after it has started
+          and keeps the deadlines of the other ones.
+        - Assert that reset streaks agree with the history of habits."""
+        database = Database(name='TestDatabase.db')
+        database.clean_tables_in_database()
+        check_off = return_timestamp(datetime(2024, 6, 10, 12))
+        database.insert_rows_to_database([
+            ("Daily", "Day", 10, "In progress", 3, 3, check_off, check_off),
+            ("Weekly", "Week", 10, "In progress", 2, 4, check_off, check_off),
+            ("Completed", "Day", 3, "Completed", 3, 3, check_off, check_off),
+            ("Dropped", "Day", 10, "Dropped", 3, 3, check_off, check_off),
+            ("New", "Day", 10, "In progress", 0, 0, check_off, None)], [])
+        scheduler = DeadlineScheduler(database)
+        self.assertEqual(scheduler.return_next_deadline(), return_timestamp(datetime(2024, 6, 12)))
+        self.assertEqual(scheduler.reset_broken_streaks(return_timestamp(datetime(2024, 6, 11, 23, 59))), [])
+        self.assertEqual(scheduler.reset_broken_streaks(return_timestamp(datetime(2024, 6, 12))), ["Daily"])
+        self.assertEqual(database.return_habit_from_database("Daily")[4:6], (0, 3))
+
+        weekly = Habit.from_row(database.return_habit_from_database("Weekly"))
+        weekly.current_streak, weekly.end_time, weekly.end_date = 3, "12:00:00", "2024-06-20"
+        database.check_off_habit_in_database(weekly)
+        self.assertEqual(scheduler.reset_broken_streaks(return_timestamp(datetime(2024, 6, 24))), [])
+        self.assertEqual(scheduler.reset_broken_streaks(return_timestamp(datetime(2024, 7, 1))), ["Weekly"])
+        self.assertIsNone(scheduler.return_next_deadline())
+
+        reset_habits = []
+        scheduler.on_reset = reset_habits.extend
+        scheduler.start()
+        habit_rows, log_rows = generate_synthetic_habits(range(20), 30, seed=8)
+        now = return_timestamp(datetime.now())
+        broken_habits = sorted(row[0] for row in habit_rows if row[3] == "In progress" and row[4] > 0
+                               and return_deadline(row[7], row[1]) <= now)
+        database.insert_rows_to_database(habit_rows, log_rows)
+        deadline = time.time() + 5
+        while len(reset_habits) < len(broken_habits) and time.time() < deadline:
+            time.sleep(0.01)
+        scheduler.stop()
+        self.assertGreater(len(broken_habits), 0)
+        self.assertEqual(sorted(reset_habits), broken_habits)
+        self.assertEqual(scheduler.return_next_deadline(), min((return_deadline(row[7], row[1]) for row in habit_rows
+                                                                if row[3] == "In progress" and row[4] > 0
+                                                                and row[0] not in broken_habits), default=None))
+        # Streaks reset after their deadline agree with the history. Habits added above have no history.
+        synthetic_names = {row[0] for row in habit_rows}
+        self.assertEqual([discrepancy for discrepancy in replay_habits(database)
+                          if discrepancy.name in synthetic_names], [])
+        database.disconnect_database()
+
+
+
+class TestHabitSchedule(unittest.TestCase):
+    """
+    This class tests the schedule of habits and the queries of due, overdue and at-risk habits."""
+    def test_schedule_follows_habits(self) -> None:
+        """
+        Loads synthetic habits into the TestDatabase.db and changes some of them.
+
+        Assertions:
+        - Assert that next_due is the beginning of the period after the last check-off and breaks_at is its deadline.
+        - Assert that the schedule stored by every write equals the schedule recomputed from the habits."""
+        database = Database(name='TestDatabase.db')
+        database.clean_tables_in_database()
+        habit_rows, log_rows = generate_synthetic_habits(range(30), 40, seed=9)
+        database.insert_rows_to_database(habit_rows, log_rows)
+        check_off = return_timestamp(datetime(2024, 6, 13, 10, 30))
+        self.assertEqual(return_habit_schedule("Week", "In progress", 0, check_off),
+                         (return_timestamp(datetime(2024, 6, 17)), return_timestamp(datetime(2024, 6, 24))))
+        self.assertEqual(return_habit_schedule("Month", "In progress", 0, check_off),
+                         (return_timestamp(datetime(2024, 7, 1)), return_timestamp(datetime(2024, 8, 1))))
+        self.assertEqual(return_habit_schedule("Day", "In progress", 5, None), (5, None))
+        self.assertEqual(return_habit_schedule("Day", "Completed", 5, check_off), (None, None))
+
+        habit_obj = Habit("Schedule habit", "Day", 10)
+        database.insert_habit_to_database(habit_obj)
+        habit_obj.check_off_habit()
+        database.check_off_habit_in_database(habit_obj)
+        in_progress = [row[0] for row in habit_rows if row[3] == "In progress"]
+        habit_obj = Habit.from_row(database.return_habit_from_database(in_progress[0]))
+        database.update_habit_characteristic_in_database(habit_obj, ["periodicity"], ["Year"])
+        database.update_habit_characteristic_in_database(habit_obj, ["state"], ["Dropped"])
+        habit_obj = Habit.from_row(database.return_habit_from_database(in_progress[1]))
+        database.update_habit_characteristic_in_database(habit_obj, ["periodicity"], ["Hour"])
+
+        select_schedule = "SELECT name, next_due, breaks_at FROM habits ORDER BY name"
+        maintained = database.database.execute(select_schedule).fetchall()
+        expected = database.database.execute("""SELECT name, periodicity, state, start_timestamp, end_timestamp
+                                                FROM habits ORDER BY name""").fetchall()
+        self.assertEqual(maintained, [(row[0], *return_habit_schedule(*row[1:])) for row in expected])
+        with database.write_transaction(tables=()) as cursor:
+            update_habit_schedules(cursor)
+        self.assertEqual(database.database.execute(select_schedule).fetchall(), maintained)
+        database.disconnect_database()
+
+    def test_due_overdue_and_at_risk_habits(self) -> None:
+        """
+        Loads synthetic habits into the TestDatabase.db and asks for due, overdue and at-risk habits.
+
+        Assertions:
+        - Assert that the queries return the same habits as checking every habit, in time order.
+        - Assert that the queries read a range of the schedule indexes."""
+        database = Database(name='TestDatabase.db')
+        database.clean_tables_in_database()
+        habit_rows, log_rows = generate_synthetic_habits(range(200), 20, seed=10)
+        database.insert_rows_to_database(habit_rows, log_rows)
+        analyzer = DatabaseAnalyzer(database.name, database.return_read_pool())
+        habits = [(row[0], row[1], row[4], *return_habit_schedule(row[1], row[3], row[6], row[7]))
+                  for row in habit_rows]
+
+        for now in (return_timestamp(datetime(2024, 1, 2)), return_timestamp(datetime(2024, 3, 1, 12)),
+                    return_timestamp(datetime(2025, 1, 1))):
+            due = sorted((habit for habit in habits if habit[3] is not None and habit[3] <= now),
+                         key=lambda habit: (habit[3], habit[0]))
+            overdue = sorted((habit for habit in habits if habit[4] is not None and habit[4] <= now),
+                             key=lambda habit: (habit[4], habit[0]))
+            at_risk = sorted((habit for habit in due if habit[4] is not None and now < habit[4] <= now + 48 * 3600),
+                             key=lambda habit: (habit[4], habit[0]))
+            self.assertEqual(analyzer.return_due_habits(now), due)
+            self.assertEqual(analyzer.return_due_habits(now, 5), due[:5])
+            self.assertEqual(analyzer.return_overdue_habits(now), overdue)
+            self.assertEqual(analyzer.return_habits_at_risk(48, now), at_risk)
+        self.assertGreater(len(due), 0)
+        self.assertGreater(len(overdue), 0)
+
+        for query, index in (("next_due <= 0 ORDER BY next_due, name", "habits_by_next_due"),
+                             ("breaks_at > 0 AND breaks_at <= 1 ORDER BY breaks_at, name", "habits_by_breaks_at")):
+            plan = database.database.execute(f"""EXPLAIN QUERY PLAN SELECT name, periodicity, current_streak,
+                                                 next_due, breaks_at FROM habits WHERE {query}""").fetchall()
+            self.assertEqual(len(plan), 1)
+            self.assertIn(f"INDEX {index}", plan[0][-1])
+        database.disconnect_database()
+
+
+
+class TestClockAndSimulator(unittest.TestCase):
+    """
+    This class tests the simulated clock and the simulation of users in fast-forwarded time."""
+    def test_simulated_clock(self) -> None:
+        """
+        Adds a habit through a service with a simulated clock and checks it off over simulated days.
+
+        Assertions:
+        - Assert that the simulated time only moves when it is set and never goes back.
+        - Assert that the habit is started and checked off at the simulated time.
+        - Assert that the scheduler resets the streak at the simulated deadline and the next check-off starts
+          a new streak.
+        - Assert that queries of the service take the current moment from the simulated clock."""
+        clock = SimulatedClock(datetime(2024, 1, 1, 8, 0, 0, 500))
+        clock.advance(hours=2)
+        self.assertEqual(clock.return_current_datetime(), datetime(2024, 1, 1, 10))
+        self.assertEqual(clock.return_current_timestamp(), return_timestamp(datetime(2024, 1, 1, 10)))
+        with self.assertRaises(ValueError):
+            clock.move_to(datetime(2024, 1, 1, 9))
+
+        database = Database(name='TestDatabase.db')
+        database.clean_tables_in_database()
+        database.disconnect_database()
+        service = HabitService('TestDatabase.db', clock=clock)
+        scheduler = DeadlineScheduler(service.database)
+        habit_obj = service.add_habit("Clock habit", "Day", 5)
+        self.assertEqual((habit_obj.start_time, habit_obj.start_date), ("10:00:00", "2024-01-01"))
+        for _ in range(2):
+            clock.advance(days=1)
+            habit_obj = service.check_off_habit("Clock habit")
+        self.assertEqual((habit_obj.current_streak, habit_obj.end_date), (2, "2024-01-03"))
+
+        clock.move_to(datetime(2024, 1, 4, 23, 59, 59))
+        self.assertEqual(scheduler.reset_broken_streaks(), [])
+        clock.advance(seconds=1)
+        self.assertEqual(scheduler.reset_broken_streaks(), ["Clock habit"])
+        service.habit_container.discard("Clock habit")
+        clock.advance(days=1)
+        with mock.patch("builtins.print"):
+            habit_obj = service.check_off_habit("Clock habit")
+        self.assertEqual((habit_obj.current_streak, habit_obj.longest_streak), (1, 2))
+        self.assertEqual(service.database.return_habit_from_database("Clock habit")[8:], ("00:00:00", "2024-01-06"))
+
+        self.assertEqual(service.run_query("due_habits"), [])
+        clock.advance(days=1)
+        self.assertEqual([row[0] for row in service.run_query("due_habits")], ["Clock habit"])
+        self.assertEqual(return_check_off_columns(service.analyzer)["read_timestamp"], clock.return_current_timestamp())
+        service.close()
+
+    def test_predefined_habits_are_completed(self) -> None:
+        """
+        Uploads predefined habits with their generated history into the TestDatabase.db several times.
+
+        Assertions:
+        - Assert that every predefined habit is completed without a broken streak."""
+        database = Database(name='TestDatabase.db')
+        for seed in range(10):
+            random.seed(seed)
+            database.clean_tables_in_database()
+            for habit_obj in predefine_habits():
+                database.insert_habit_to_database(habit_obj)
+                with mock.patch("builtins.print") as printed:
+                    generate_habit_history(habit_obj, database)
+                printed.assert_not_called()
+                self.assertEqual(database.return_habit_from_database(habit_obj.name)[3:6],
+                                 ("Completed", habit_obj.time_span, habit_obj.time_span))
+        database.disconnect_database()
+
+    def test_simulation(self) -> None:
+        """
+        Simulates users for two weeks, in one process and split among two processes.
+
+        Assertions:
+        - Assert that habits are checked off and broken streaks are reset.
+        - Assert that every habit matches the history of its check-offs.
+        - Assert that the simulation doesn't depend on the split of users among processes."""
+        directory = "TestSimulatedDatabases"
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(os.path.join(directory, "1"))
+        os.makedirs(os.path.join(directory, "2"))
+        results = run_simulation(20, 3, 14, os.path.join(directory, "1"))
+        self.assertEqual(results["habits"], 60)
+        self.assertGreater(results["check_offs"], 60)
+        self.assertGreater(results["resets"], 0)
+        self.assertEqual(results["discrepancies"], [])
+
+        split_results = run_simulation(20, 3, 14, os.path.join(directory, "2"), processes=2)
+        self.assertEqual((split_results["check_offs"], split_results["resets"], split_results["discrepancies"]),
+                         (results["check_offs"], results["resets"], []))
+        shutil.rmtree(directory)
+
+
+
+class TestQueryCache(unittest.TestCase):
+    """
+    This class tests the cache of query results of the database analyzer."""
+    def test_invalidation(self) -> None:
+        """
+        Caches results of queries to the TestDatabase.db and changes the database 
+        through the same and through another connection.
+        
+        Assertions:
+        - Assert that repeated queries are answered from the cache and counted as hits.
+        - Assert that a check-off invalidates results of the checked-off habit and results over all habits only.
+        - Assert that changes of another connection invalidate all results.
+        - Assert that the least recently used results are evicted."""
+        database = Database(name='TestDatabase.db')
+        database.clean_tables_in_database()
+        cache = database.return_query_cache(capacity=4)
+        analyzer = DatabaseAnalyzer(database.name, database.return_read_pool(), cache)
+        habit_obj1, habit_obj2 = Habit("name1", "Day", 5), Habit("name2", "Day", 5)
+        database.insert_habit_to_database(habit_obj1)
+        database.insert_habit_to_database(habit_obj2)
+
+        history1 = analyzer.return_habit_history("name1")
+        history2 = analyzer.return_habit_history("name2")
+        tracked_habits = analyzer.return_currently_tracked_habits()
+        self.assertIs(analyzer.return_habit_history("name2"), history2)
+        self.assertIs(analyzer.return_currently_tracked_habits(), tracked_habits)
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+
+        habit_obj1.check_off_habit()
+        database.check_off_habit_in_database(habit_obj1)
+        self.assertIs(analyzer.return_habit_history("name2"), history2)
+        self.assertEqual(len(analyzer.return_habit_history("name1")), len(history1) + 1)
+        self.assertEqual(analyzer.return_currently_tracked_habits()[0][4], 1)
+        self.assertEqual(cache.return_statistics()["invalidations"], 2)
+
+        other_database = Database(name='TestDatabase.db')
+        other_database.delete_habit_from_database("name2")
+        self.assertEqual(analyzer.return_habit_history("name2"), [])
+        other_database.disconnect_database()
+
+        for state in ("Completed", "Dropped", "Paused", "In progress"):
+            analyzer.return_currently_tracked_habits(state)
+        self.assertEqual(len(cache.entries), 4)
+        self.assertEqual(cache.evictions, 1)
+        self.assertNotIn(("return_habit_history_page", ("name2", 10), ()), cache.entries)
+        database.clean_tables_in_database()
+        self.assertEqual(analyzer.return_currently_tracked_habits(), [])
+        database.disconnect_database()
+
+
+
+class TestAsyncDatabase(unittest.TestCase):
+    """
+    This class tests the asyncio interface to the database."""
+    def test_concurrent_check_offs(self) -> None:
+        """
+        Checks off habits of the TestDatabase.db from many concurrent coroutines while other coroutines
+        run queries.
+        
+        Assertions:
+        - Assert that every check-off is stored, in the order of check-offs of each habit.
+        - Assert that queries run concurrently with writes return consistent results.
+        - Assert that coroutine queries return the same results as the wrapped analyzer
+          and that every query of the analyzer has a coroutine counterpart.
+        - Assert that old check-offs are archived through the coroutine of the database.
+        - Assert that closing the analyzer doesn't block the event loop while a read is running."""
+        async def check_off(database: AsyncDatabase, habit_obj: Habit, times: int) -> None:
+            for _ in range(times):
+                await database.check_off_habit(habit_obj)
+
+        async def run() -> None:
+            async with AsyncDatabase('TestDatabase.db') as database:
+                await database.clean_tables_in_database()
+                habits = [Habit(f"name{number}", "Day", 100) for number in range(10)]
+                await asyncio.gather(*(database.insert_habit_to_database(habit_obj) for habit_obj in habits))
+                analyzer = database.return_analyzer(readers=3)
+                results = await asyncio.gather(
+                    *(check_off(database, habit_obj, 5) for habit_obj in habits),
+                    *(analyzer.return_currently_tracked_habits() for _ in range(20)))
+                for tracked_habits in results[len(habits):]:
+                    self.assertEqual(len(tracked_habits), len(habits))
+
+                for habit_obj in habits:
+                    streaks = [event[1] async for event in analyzer.stream_habit_history(habit_obj.name, 2)]
+                    self.assertEqual(streaks, [5, 4, 3, 2, 1, 0])
+                self.assertEqual(await analyzer.return_longest_streak_of_all_habits(),
+                                 [[(habit_obj.name,) for habit_obj in habits], 5])
+                now = return_timestamp(datetime.now()) + 86400
+                self.assertEqual([await analyzer.return_due_habits(now), await analyzer.return_overdue_habits(now),
+                                  await analyzer.return_habits_at_risk(48, now)],
+                                 [analyzer.analyzer.return_due_habits(now), analyzer.analyzer.return_overdue_habits(now),
+                                  analyzer.analyzer.return_habits_at_risk(48, now)])
+                self.assertEqual(len(await analyzer.return_due_habits(now)), len(habits))
+                await database.rebuild_rollups()
+                self.assertEqual(await analyzer.return_number_of_completions(), len(habits) * 5)
+                self.assertEqual(await analyzer.return_completion_series(habits[0].name, "Day"),
+                                 analyzer.analyzer.return_completion_series(habits[0].name, "Day"))
+                self.assertEqual([name for name in dir(DatabaseAnalyzer)
+                                  if name.startswith("return_") and not hasattr(AsyncDatabaseAnalyzer, name)], [])
+                self.assertEqual(await analyzer.return_habit_streaks(), analyzer.analyzer.return_habit_streaks())
+                self.assertEqual(await analyzer.return_check_off_columns([habits[0].name]),
+                                 analyzer.analyzer.return_check_off_columns([habits[0].name]))
+
+                slow_read = asyncio.create_task(analyzer.run_read(time.sleep, 0.3))
+                await asyncio.sleep(0)
+                closing = asyncio.create_task(analyzer.close())
+                ticks = 0
+                while not closing.done():
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+                await asyncio.gather(closing, slow_read)
+                self.assertGreater(ticks, 5)
+                self.assertEqual(await database.archive_log_rows(0, now=datetime(2100, 1, 1)), len(habits) * 5)
+                await database.clean_tables_in_database()
+        asyncio.run(run())
+        os.remove(return_archive_name('TestDatabase.db'))
+
+
+
+class TestShardRouter(unittest.TestCase):
+    """
+    This class tests the router of users to their own databases."""
+    def test_routing(self) -> None:
+        """
+        Adds habits with the same name for several users through a router that keeps two shards open.
+        
+        Assertions:
+        - Assert that every user sees only their own habits, also after their shard has been closed.
+        - Assert that no more shards than the capacity are kept open, except shards in use.
+        - Assert that shards are opened and closed without holding the lock of the router.
+        - Assert that threads acquiring the same shard at once share one opened shard.
+        - Assert that invalid user ids are rejected."""
+        directory = "TestUserDatabases"
+        shutil.rmtree(directory, ignore_errors=True)
+        with ShardRouter(directory, capacity=2) as router:
+            user_ids = ["user0", "user1", "user2", "user3"]
+            locked = []
+            shard_open, shard_close = Shard.open, Shard.close
+            with mock.patch.object(Shard, "open", lambda shard: (locked.append(router.lock.locked()),
+                                                                shard_open(shard))), \
+                 mock.patch.object(Shard, "close", lambda shard: (locked.append(router.lock.locked()),
+                                                                  shard_close(shard))):
+                for number, user_id in enumerate(user_ids):
+                    with router.shard(user_id) as shard:
+                        shard.database.insert_habit_to_database(Habit("name", "Day", number + 1))
+                    self.assertLessEqual(len(router.shards), 2)
+            self.assertEqual(locked, [False] * 6)
+            self.assertEqual(list(router.shards), ["user2", "user3"])
+            self.assertEqual(router.return_user_ids(), user_ids)
+
+            for number, user_id in enumerate(user_ids):
+                with router.shard(user_id) as shard:
+                    self.assertEqual(shard.analyzer.return_habit("name")[2], number + 1)
+                    self.assertEqual(shard.analyzer.return_number_of_habits(), 1)
+
+            shards = [router.acquire_shard(user_id) for user_id in user_ids[:3]]
+            self.assertEqual(len(router.shards), 3)
+            for shard in shards:
+                router.release_shard(shard)
+            self.assertEqual(list(router.shards), ["user1", "user2"])
+
+            router.close()
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                shards = list(executor.map(router.acquire_shard, ["user0"] * 8))
+            self.assertTrue(all(shard is shards[0] for shard in shards))
+            self.assertEqual(shards[0].users, 8)
+            self.assertEqual(shards[0].analyzer.return_number_of_habits(), 1)
+            for shard in shards:
+                router.release_shard(shard)
+
+            with self.assertRaises(ValueError):
+                router.acquire_shard("../user0")
+        self.assertEqual(len(router.shards), 0)
+        shutil.rmtree(directory)
+
+
+
+class TestHabitServer(unittest.TestCase):
+    """
+    This class tests the JSON HTTP API."""
+    def test_api(self) -> None:
+        """
+        Runs the server on the TestDatabase.db and sends requests of every route, then a short load test.
+        
+        Assertions:
+        - Assert that habits are added, updated, checked off, analyzed and deleted.
+        - Assert that comma-separated text is passed to list parameters of queries as a list.
+        - Assert that invalid requests are answered with the corresponding error status.
+        - Assert that the load test completes without failed requests."""
+        database = Database(name='TestDatabase.db')
+        database.clean_tables_in_database()
+        database.disconnect_database()
+        service = HabitService('TestDatabase.db')
+        server = return_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[:2]
+        connection = http.client.HTTPConnection(host, port)
+
+        habit = {"name": "Read books", "periodicity": "Day", "time_span": 2}
+        self.assertEqual(send_request(connection, "POST", "/habits", habit)[0], 201)
+        self.assertEqual(send_request(connection, "POST", "/habits", habit)[0], 409)
+        self.assertEqual(send_request(connection, "POST", "/habits", dict(habit, periodicity="Decade"))[0], 400)
+        status, result = send_request(connection, "PATCH", "/habits/Read%20books", 
+                                      {"characteristic": "time_span", "value": 1})
+        self.assertEqual((status, result["time_span"]), (200, 1))
+        status, result = send_request(connection, "POST", "/habits/Read%20books/check-off")
+        self.assertEqual((status, result["current_streak"], result["completed"]), (200, 1, True))
+        status, result = send_request(connection, "GET", "/habits/Read%20books")
+        self.assertEqual((status, result["State"]), (200, "Completed"))
+        status, result = send_request(connection, "GET", "/habits/Read%20books/history?rows_amount=1")
+        self.assertEqual((len(result["history"]), result["history"][0][1]), (1, 1))
+        self.assertIsNotNone(result["next_page_token"])
+        status, result = send_request(connection, "GET", "/queries/developed_habits")
+        self.assertEqual(result["result"][0][0], "Read books")
+        status, result = send_request(connection, "GET", "/queries/habit_streaks?habit_names=Read%20books,%20Missing")
+        self.assertEqual([row[0] for row in result["result"]], ["Read books"])
+        self.assertEqual(len(service.run_query("check_off_log", {"habit_names": "Read books"})), 1)
+        self.assertEqual(send_request(connection, "GET", "/queries/top_habits_by_streak?habits_amount=x")[0], 400)
+        self.assertEqual(send_request(connection, "GET", "/queries/longest_streaks_of_given_habit")[0], 400)
+        self.assertEqual(send_request(connection, "GET", "/queries/habit_streaks?unknown=1")[0], 400)
+        self.assertEqual(send_request(connection, "GET", "/queries/unknown_query")[0], 404)
+        self.assertEqual(send_request(connection, "DELETE", "/habits/Read%20books")[0], 200)
+        self.assertEqual(send_request(connection, "POST", "/habits/Read%20books/check-off")[0], 404)
+        connection.close()
+
+        summary = run_load_test(host, port, habits_amount=5, clients=2, duration=0.3, check_off_ratio=0.5)
+        self.assertEqual(summary["errors"], 0)
+        self.assertGreater(summary["total"]["requests"], 0)
+        server.shutdown()
+        server.server_close()
+        service.database.clean_tables_in_database()
+        service.close()
+
+
+
+class TestScriptedCLI(unittest.TestCase):
+    """
+    This class tests the non-interactive mode of the application."""
+    def test_batch(self) -> None:
+        """
+        Runs a batch of commands on the TestDatabase.db.
+        
+        Assertions:
+        - Assert that every command prints its result and failed commands are reported with their line.
+        - Assert that unexpected errors of a command don't stop the batch.
+        - Assert that queries see writes made earlier in the batch.
+        - Assert that all writes are stored once the batch is finished.
+        - Assert that the shard of a user is named without creating any directory."""
+        database = Database(name='TestDatabase.db')
+        database.clean_tables_in_database()
+        database.disconnect_database()
+        lines = ["add \"Read books\" Day 20", "# comment", "", "add Run Week 5"]
+        lines += ["checkoff \"Read books\" Run"] * 3
+        lines += ["checkoff Swim", "analyze habit-longest-streak \"Read books\"", "analyze top habits_amount=1",
+                  "update Run time_span 3", "add Run Day", "analyze longest-streak"]
+        lines += ["analyze habit-longest-streak Missing", "analyze number-of-habits", "analyze tracked"]
+        args = return_parser().parse_args(["--database", "TestDatabase.db", "batch"])
+        output = io.StringIO()
+        with mock.patch("sys.stderr", new_callable=io.StringIO) as errors, mock.patch.object(
+                DatabaseAnalyzer, "return_number_of_habits", side_effect=RuntimeError("disk failure")):
+            self.assertEqual(run_batch(lines, args, commit_every=100, output=output), 4)
+        reported = [json.loads(line) for line in errors.getvalue().splitlines()]
+        self.assertEqual([error["line"] for error in reported], [8, 12, 14, 15])
+        self.assertEqual(reported[2]["error"], "Not found: Missing")
+        self.assertEqual(reported[3]["error"], "RuntimeError: disk failure")
+        results = {result["line"]: result["result"] for result in map(json.loads, output.getvalue().splitlines())}
+        self.assertEqual(results[7][1]["current_streak"], 3)
+        self.assertEqual(results[9], 3)
+        self.assertEqual(results[10], [["Read books", 3, 3]])
+        self.assertEqual(results[11]["time_span"], 3)
+        self.assertEqual([row[0] for row in results[16]], ["Read books", "Run"])
+
+        database = Database(name='TestDatabase.db')
+        analyzer = DatabaseAnalyzer(database.name, database.return_read_pool())
+        self.assertEqual(analyzer.return_habit("Run")[2:5], (3, "In progress", 3))
+        self.assertEqual(len(analyzer.return_habit_history("Read books")), 4)
+        database.clean_tables_in_database()
+        database.disconnect_database()
+
+        with mock.patch("os.makedirs") as makedirs:
+            self.assertEqual(return_database_name(return_parser().parse_args(["--user", "alice", "health"])),
+                             os.path.join("user_databases", "alice.db"))
+            with self.assertRaises(ValueError):
+                return_database_name(return_parser().parse_args(["--user", "../alice", "health"]))
+        makedirs.assert_not_called()
+
+
+
+class TestHabitAnalytics(unittest.TestCase):
+    """
+    This class tests trends computed from the whole check-off history."""
+    def test_trends(self) -> None:
+        """
+        Loads habits with a known history into the TestDatabase.db and computes their trends.
+        
+        Assertions:
+        - Assert that completion rates count distinct periods from the creation of a habit up to now,
+        overall and per month, and that they aren't computed per month for yearly habits.
+        - Assert that heatmaps count check-offs by hour, weekday and month.
+        - Assert that streak lengths, the histogram and the time to break follow the check-off rules."""
+        database = Database(name='TestDatabase.db')
+        database.clean_tables_in_database()
+        analyzer = DatabaseAnalyzer(database.name, database.return_read_pool())
+        created = return_timestamp(datetime(2024, 1, 1))
+        database.insert_rows_to_database(
+            [(name, periodicity, 30, "In progress", 0, 0, created, None)
+             for name, periodicity in (("Read", "Day"), ("Gym", "Week"), ("Travel", "Year"))],
+            [(name, 0, 0, timestamp, *return_period_indices(timestamp)) for name, timestamp in
+             [("Read", return_timestamp(datetime(2024, 1, day, hour))) for day, hour in
+              ((1, 9), (1, 21), (2, 9), (5, 9), (6, 9))] + [("Read", return_timestamp(datetime(2024, 2, 1, 10)))] +
+             [("Gym", return_timestamp(datetime(2024, 1, day, 18))) for day in (3, 10)]])
+        columns = return_check_off_columns(analyzer)
+        self.assertEqual(columns["names"], ["Gym", "Read", "Travel"])
+
+        rates = compute_completion_rates(columns, "Month", now=return_timestamp(datetime(2024, 2, 3, 12)))
+        self.assertEqual(list(rates["checked"]), [2, 5, 0])
+        np.testing.assert_allclose(rates["overall"], [2 / 5, 5 / 34, 0])
+        self.assertEqual(list(rates["bucket_starts"]), [return_timestamp(datetime(2024, month, 1)) for month in (1, 2)])
+        np.testing.assert_allclose(rates["rates"], [[2 / 5, np.nan], [4 / 31, 1 / 3], [np.nan, np.nan]])
+
+        heatmaps = compute_heatmaps(columns)
+        self.assertEqual(heatmaps["hour"][9], 4)
+        self.assertEqual(heatmaps["hour"][18], 2)
+        self.assertEqual(list(heatmaps["weekday"]), [2, 1, 2, 1, 1, 1, 0])
+        self.assertEqual(list(heatmaps["month"][:3]), [7, 1, 0])
+        self.assertEqual(heatmaps["weekday_hour"].sum(), 8)
+
+        streaks = compute_streak_lengths(columns)
+        self.assertEqual(list(streaks["lengths"]), [2, 3, 2, 1])
+        self.assertEqual(list(streaks["broken"]), [False, True, True, False])
+        self.assertEqual(list(compute_streak_histogram(streaks)), [0, 1, 2, 1])
+        time_to_break = compute_time_to_break(streaks, (50,))
+        self.assertEqual(list(time_to_break["days"]), [1, 1])
+        self.assertEqual(time_to_break["percentiles"][50], 1)
+        database.clean_tables_in_database()
+        database.disconnect_database()
+
+
+
+class TestStartup(unittest.TestCase):
+    """
+    This class tests the imports of the entry points of the application."""
+    def test_scripted_commands_skip_heavy_modules(self) -> None:
+        """
+        Runs scripted commands on the TestDatabase.db in new interpreters.
+        
+        Assertions:
+        - Assert that the help and the health check don't import modules of the interactive interface.
+        - Assert that the interactive interface imports them."""
+        database_name = os.path.abspath('TestDatabase.db')
+        for arguments in (["HabitTrackingApp.py", "--help"], ["HabitTrackingApp.py", "--database", database_name, "health"]):
+            _, _, modules = run_entry_point(arguments)
+            self.assertFalse([module for module in modules if module.split(".")[0] in HEAVY_MODULES])
+        _, _, modules = run_entry_point(["-c", "import CLI"])
+        self.assertIn("questionary", modules)
+        self.assertIn("tabulate", modules)
+
+
+
+
 
 if __name__ == '__main__':
     unittest.main()